@@ -1,67 +1,508 @@
+import functools
+import hashlib
+import json
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import duckdb
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 from services.io_manager.io_handler import IOHandler
 from services.ingress.api_handler import ApiHandler
+from services.ingress.lease_coordinator import LeaseCoordinator
+from services.ingress.response_cache import ResponseCache
 from services.io_manager.parquet_io import ParquetIO
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+from services.io_manager.object_store_io import ObjectStoreIO
+from services.io_manager.parquet_profiles import WRITE_PROFILES
+from services.io_manager.snapshot_log import SnapshotLog
 from services.transform.batch_processor import BatchProcessor
 from services.egress.data_mart import DataMart
+from services.egress.mart_store import MartQueryService, MartStore
+from services.scheduler.daemon import PipelineDaemon
+from services.scheduler.task_graph import TaskGraph
+from services.cache.disk_cache import DiskCache
+
+# Storage formats that can be selected for the raw and intermediate layers.
+IO_HANDLERS = {
+    "parquet": ParquetIO,
+    "arrow": ArrowIPCIO,
+}
 
 
 class DataPipeline:
-    def __init__(self, root_dir, url, params, batch_size, total_records):
+    def __init__(self, root_dir, url, params, batch_size, total_records, max_workers=4,
+                 refresh_mart=False, mart_cache_max_age=24 * 3600,
+                 raw_format="parquet", intermediate_format="parquet",
+                 raw_profile="fast-raw", intermediate_profile="compact-intermediate", mart_profile="compact-mart",
+                 ingest_workers=1, lease_seconds=300,
+                 http_cache_mode=None, http_cache_ttl=None, http_cache_max_bytes=None,
+                 transform_engine="pandas", index_columns=("unique_id", "id"), write_behind=False,
+                 raw_location=None, intermediate_location=None, storage_options=None,
+                 snapshots=True, snapshot_retention=3600, autotune_batches=True,
+                 transform_memory_limit=512 * 1024 * 1024):
         self.root_dir = root_dir
         self.url = url
         self.params = params
         self.batch_size = batch_size
         self.total_records = total_records
+        self.max_workers = max_workers
+        self.refresh_mart = refresh_mart
+        self.ingest_workers = ingest_workers
 
-        self.raw_data_path = os.path.join(self.root_dir, "data/raw/")
-        self.intermediate_data_path = os.path.join(self.root_dir, "data/intermediate/")
+        # The raw and intermediate layers can live on an object store, e.g. "s3://bucket/pipeline/raw/".
+        self.raw_data_path = self._layer_path(raw_location) or os.path.join(self.root_dir, "data/raw/")
+        self.intermediate_data_path = (
+            self._layer_path(intermediate_location) or os.path.join(self.root_dir, "data/intermediate/")
+        )
         self.mart_data_path = os.path.join(self.root_dir, "data/mart/")
+        self.state_path = os.path.join(self.root_dir, "data/pipeline_state.json")
+        self.mart_cache_path = os.path.join(self.root_dir, "data/cache/mart/")
+        self.lease_db_path = os.path.join(self.root_dir, "data/ingest_leases.sqlite")
+        self.watermark_path = os.path.join(self.root_dir, "data/ingest_watermarks.json")
+        self.transform_state_path = os.path.join(self.root_dir, "data/transform_state.json")
+        self.run_report_path = os.path.join(self.root_dir, "data/run_report.json")
+        self.sketch_path = os.path.join(self.mart_data_path, "sketches.json")
+        self.http_cache_path = os.path.join(self.root_dir, "data/cache/http/")
+        self.dead_letter_path = os.path.join(self.root_dir, "data/dead_letter/")
+        self.mart_store_path = os.path.join(self.root_dir, "data/mart_store/")
+        self.block_cache_path = os.path.join(self.root_dir, "data/cache/blocks/")
+        self.storage_options = storage_options
+        # Local layers are committed as snapshot versions, so readers never see a half-written layer.
+        self.snapshots = snapshots
+        self.snapshot_retention = snapshot_retention
+
+        # A list of param sets fans out into one configuration per param set, all run concurrently by
+        # this pipeline. Each configuration ingests and transforms into its own config=<id>/ partition
+        # of the raw and intermediate layers, and the marts are computed for every configuration at once.
+        self.fan_out = isinstance(params, (list, tuple))
+        if self.fan_out:
+            self.configs = {self.config_id(param_set): param_set for param_set in params}
+            if len(self.configs) != len(params):
+                raise ValueError("The param sets of a fan-out must be distinct.")
+        else:
+            self.configs = {None: params}
 
         # Ensure all necessary directories exist
         self._ensure_directories_exist()
 
-        # Initialize components
-        self.parquet_io = ParquetIO()
-        self.api_handler = ApiHandler(
-            io_handler=self.parquet_io,
-            url=self.url,
-            params=self.params,
-            output_path=self.raw_data_path
+        # Initialize components. The mart stays in Parquet, the format its consumers read.
+        # Parquet layers maintain a point index on the key columns as they are written.
+        self.raw_io = self._create_io_handler(raw_format, raw_profile, index_columns, raw_location)
+        self.intermediate_io = self._create_io_handler(
+            intermediate_format, intermediate_profile, index_columns, intermediate_location
         )
-        self.batch_processor = BatchProcessor(
-            self.raw_data_path, self.intermediate_data_path, self.parquet_io
+        self.mart_io = ParquetIO(profile=mart_profile)
+        self.response_cache = None
+        if http_cache_mode is not None:
+            self.response_cache = ResponseCache(
+                self.http_cache_path, mode=http_cache_mode, ttl_seconds=http_cache_ttl, max_bytes=http_cache_max_bytes
+            )
+        # Configurations share the HTTP connection pool, the raw layer's background writers, the
+        # stage thread pool and one DuckDB database; each has its own handler, leases and sketches.
+        self.session = self._create_session() if self.fan_out else None
+        self.connection = duckdb.connect()
+        self.api_handlers, self.lease_coordinators, self.batch_processors = {}, {}, {}
+        # The pandas transform tunes its batch and row-group sizes, starting from the ones the previous run chose.
+        previous_tuning = self._load_run_report().get("transform", {})
+        for config_id, config_params in self.configs.items():
+            self.api_handlers[config_id] = ApiHandler(
+                io_handler=self.raw_io,
+                url=self.url,
+                params=dict(config_params),
+                output_path=self._partition(self.raw_data_path, config_id),
+                response_cache=self.response_cache,
+                dead_letter_path=self._partition(self.dead_letter_path, config_id),
+                write_behind=write_behind,
+                session=self.session,
+                snapshot_log=self._snapshot_log(self._partition(self.raw_data_path, config_id))
+            )
+            self.lease_coordinators[config_id] = LeaseCoordinator(
+                self._partition_file(self.lease_db_path, config_id), lease_seconds=lease_seconds
+            )
+            self.batch_processors[config_id] = BatchProcessor(
+                self._partition(self.raw_data_path, config_id), self._partition(self.intermediate_data_path, config_id),
+                self.raw_io, output_io_handler=self.intermediate_io,
+                sketch_path=self._partition_file(self.sketch_path, config_id), engine=transform_engine,
+                connection=self.connection, state_path=self._partition_file(self.transform_state_path, config_id),
+                snapshot_log=self._snapshot_log(self._partition(self.intermediate_data_path, config_id)),
+                autotune=autotune_batches, memory_limit_bytes=transform_memory_limit, input_snapshots=self.snapshots,
+                **self._tuned_sizes(previous_tuning.get(config_id or "default"))
+            )
+        if not self.fan_out:
+            self.api_handler = self.api_handlers[None]
+            self.lease_coordinator = self.lease_coordinators[None]
+            self.batch_processor = self.batch_processors[None]
+        self.mart_cache = DiskCache(
+            self.mart_cache_path, max_bytes=256 * 1024 * 1024, max_entries=1000,
+            max_age_seconds=mart_cache_max_age, suffix=".parquet"
         )
+        partitions = None
+        if self.fan_out:
+            partitions = {
+                self.config_label(config_params): self._partition(self.intermediate_data_path, config_id)
+                for config_id, config_params in self.configs.items()
+            }
         self.data_mart = DataMart(
-            self.intermediate_data_path, self.mart_data_path, self.parquet_io
+            self.intermediate_data_path, self.mart_data_path, self.intermediate_io, connection=self.connection,
+            cache=self.mart_cache, output_io_handler=self.mart_io,
+            sketch_path=[processor.sketch_path for processor in self.batch_processors.values()],
+            partitions=partitions, snapshots=self.snapshots
         )
+        self.mart_store = MartStore(self.mart_store_path)
+        self._watermark_lock = threading.Lock()
+        self.task_graph = self._build_task_graph()
+
+    @staticmethod
+    def config_label(params):
+        """
+        Return the query string of a param set, with sorted keys. It names the configuration in the marts.
+        """
+        return "&".join(f"{key}={value}" for key, value in sorted(params.items()))
+
+    @classmethod
+    def config_id(cls, params):
+        """
+        Return the short identifier of a param set, naming its config=<id>/ partitions.
+        """
+        return hashlib.sha256(cls.config_label(params).encode()).hexdigest()[:12]
+
+    @staticmethod
+    def _partition(path, config_id):
+        """
+        Return the directory of a configuration inside a layer directory; the layer itself without fan-out.
+        """
+        return path if config_id is None else f"{path}config={config_id}/"
+
+    @staticmethod
+    def _partition_file(path, config_id):
+        """
+        Return the file of a configuration next to a shared file, e.g. sketches-<id>.json for sketches.json.
+        """
+        if config_id is None:
+            return path
+        base, extension = os.path.splitext(path)
+        return f"{base}-{config_id}{extension}"
+
+    def _snapshot_log(self, path):
+        """
+        Return the commit log of a layer directory, or None when the layer is rewritten in place:
+        snapshots are disabled, or the layer is on an object store, which cannot rename atomically.
+        """
+        if not self.snapshots or self._is_remote(path):
+            return None
+        return SnapshotLog(path, retention_seconds=self.snapshot_retention)
+
+    def _pin(self, path):
+        """
+        Return the directory to read for a layer: its latest snapshot version, or the layer directory
+        itself when it is rewritten in place.
+        """
+        snapshot_log = self._snapshot_log(path)
+        return path if snapshot_log is None else snapshot_log.pin()
+
+    @staticmethod
+    def _task_name(stage, config_id):
+        return stage if config_id is None else f"{stage}[{config_id}]"
+
+    def _create_session(self):
+        """
+        Return the HTTP session shared by the configurations, with a connection pool large enough
+        for all of them to fetch at the same time.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max(self.max_workers, len(self.configs)))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def _layer_path(location):
+        if location is None:
+            return None
+        return location if location.endswith("/") else location + "/"
+
+    @staticmethod
+    def _is_remote(path):
+        return "://" in path
+
+    def _create_io_handler(self, storage_format, parquet_profile, index_columns=None, location=None):
+        if storage_format not in IO_HANDLERS:
+            raise ValueError(f"Unsupported storage format '{storage_format}'. Choose from: {', '.join(IO_HANDLERS)}")
+        if location is not None and self._is_remote(location):
+            if storage_format != "parquet":
+                raise ValueError("Layers on an object store are stored as Parquet.")
+            return ObjectStoreIO(
+                profile=parquet_profile, storage_options=self.storage_options, cache_dir=self.block_cache_path
+            )
+        if storage_format == "parquet":
+            return ParquetIO(profile=parquet_profile, index_columns=index_columns)
+        return IO_HANDLERS[storage_format]()
 
     def _ensure_directories_exist(self):
         """
         Ensure that all required directories for the pipeline exist.
         """
-        for path in [self.raw_data_path, self.intermediate_data_path, self.mart_data_path]:
+        paths = [self.mart_data_path]
+        for config_id in self.configs:
+            for layer_path in [self.raw_data_path, self.intermediate_data_path, self.dead_letter_path]:
+                paths.append(self._partition(layer_path, config_id))
+        for path in paths:
+            if self._is_remote(path):
+                continue
             os.makedirs(path, exist_ok=True)  # Create the directory if it doesn't exist
 
-    def run(self):
-        # Step 1: Fetch and store raw data
-        print("Fetching and storing raw data...")
-        self.api_handler.fetch_and_store_data(total_records=self.total_records, batch_size=self.batch_size)
+    def _build_task_graph(self, incremental=False, increment_records=None):
+        """
+        Declare the pipeline stages and their dependencies:
+        ingest -> transform -> one task per mart metric (run concurrently).
+        With a fan-out, every configuration has its own ingest[<id>] and transform[<id>] tasks,
+        run concurrently, and the metrics wait for all transforms.
+
+        The incremental graph fetches `increment_records` records after the last ingested ones,
+        transforms only the new raw files and recomputes the metrics. It keeps no state: each
+        of its runs runs every task.
+        """
+        graph = TaskGraph(
+            state_path=None if incremental else self.state_path, max_workers=self.max_workers,
+            storage_options=self.storage_options,
+        )
+
+        transforms, intermediate_paths = [], []
+        for config_id, config_params in self.configs.items():
+            ingest, transform = self._task_name("ingest", config_id), self._task_name("transform", config_id)
+            batch_processor = self.batch_processors[config_id]
+            graph.add_task(
+                ingest,
+                functools.partial(self._ingest_increment, config_id, increment_records or self.batch_size)
+                if incremental else functools.partial(self._ingest, config_id),
+                key=json.dumps([self.url, config_params, self.batch_size, self.total_records], sort_keys=True),
+                outputs=[batch_processor.input_path],
+            )
+            graph.add_task(
+                transform,
+                functools.partial(batch_processor.process, incremental=incremental),
+                key=batch_processor.engine,
+                depends_on=[ingest],
+                inputs=[batch_processor.input_path],
+                outputs=[batch_processor.output_path, batch_processor.sketch_path],
+            )
+            transforms.append(transform)
+            intermediate_paths.append(batch_processor.output_path)
+
+        for metric, file_name in DataMart.METRIC_FILES.items():
+            graph.add_task(
+                metric,
+                functools.partial(getattr(self.data_mart, f"calculate_{metric}"), refresh=self.refresh_mart),
+                depends_on=transforms,
+                inputs=intermediate_paths,
+                outputs=[os.path.join(self.mart_data_path, f"{file_name}.parquet")],
+            )
+        graph.add_task(
+            "publish",
+            functools.partial(self.data_mart.publish_to_store, self.mart_store),
+            depends_on=list(DataMart.METRIC_FILES),
+            inputs=[os.path.join(self.mart_data_path, f"{file_name}.parquet") for file_name in DataMart.METRIC_FILES.values()],
+            outputs=[os.path.join(self.mart_store_path, MartStore.POINTER_FILE)],
+        )
+
+        return graph
 
-        # Step 2: Process raw data into intermediate data
-        print("Processing raw data into intermediate data...")
-        self.batch_processor.process()
+    @staticmethod
+    def _tuned_sizes(tuning):
+        """
+        Return the BatchProcessor arguments restoring the batch and row-group sizes of a run report entry.
+        """
+        if not tuning:
+            return {}
+        return {key: tuning[key] for key in ("batch_size", "row_group_size") if tuning.get(key)}
+
+    def _load_run_report(self):
+        if not os.path.exists(self.run_report_path):
+            return {}
+        with open(self.run_report_path) as f:
+            return json.load(f)
+
+    def _save_run_report(self, mode, results):
+        """
+        Record the tasks of a run and the batch and row-group sizes chosen by each transform that ran.
+        Configurations whose transform did not run keep the sizes of the previous report.
+        """
+        tuning = self._load_run_report().get("transform", {})
+        for config_id, batch_processor in self.batch_processors.items():
+            if self._task_name("transform", config_id) in results and batch_processor.tuning is not None:
+                tuning[config_id or "default"] = batch_processor.tuning
+        report = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "mode": mode,
+            "tasks_run": sorted(results),
+            "transform": tuning,
+        }
+        tmp_path = f"{self.run_report_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        os.replace(tmp_path, self.run_report_path)
+
+    def _load_watermarks(self):
+        if not os.path.exists(self.watermark_path):
+            return {}
+        with open(self.watermark_path) as f:
+            return json.load(f)
+
+    def _set_watermark(self, config_id, offset):
+        """
+        Record the offset following the last ingested record of a configuration.
+        """
+        with self._watermark_lock:
+            watermarks = self._load_watermarks()
+            watermarks[config_id or "default"] = offset
+            tmp_path = f"{self.watermark_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(watermarks, f)
+            os.replace(tmp_path, self.watermark_path)
+
+    def needs_full_run(self):
+        """
+        Return True while some configuration has not been fully ingested once, so incremental
+        runs have no offset to continue from.
+        """
+        watermarks = self._load_watermarks()
+        return any((config_id or "default") not in watermarks for config_id in self.configs)
+
+    def _ingest(self, config_id=None):
+        api_handler, lease_coordinator = self.api_handlers[config_id], self.lease_coordinators[config_id]
+        # Pages are requested at multiples of batch_size; the next record follows the last page.
+        end_offset = len(range(0, self.total_records, self.batch_size)) * self.batch_size
+        if self.ingest_workers <= 1:
+            rows = api_handler.fetch_and_store_data(total_records=self.total_records, batch_size=self.batch_size)
+            self._set_watermark(config_id, end_offset)
+            return rows
+
+        # Sharded mode: split the offset space into leases, then let local worker processes claim them.
+        # Workers on other hosts sharing root_dir can join with `--join-ingest`.
+        # With snapshots, the workers write to the "shards" staging directory, committed once all leases are done.
+        snapshot_log = api_handler.snapshot_log
+        if snapshot_log is not None:
+            staging_path = snapshot_log.begin(name="shards")
+        else:
+            self.raw_io.clear(api_handler.output_path)
+        lease_coordinator.plan(self.total_records, self.batch_size)
+        try:
+            with ProcessPoolExecutor(max_workers=self.ingest_workers) as executor:
+                futures = [
+                    executor.submit(api_handler.fetch_and_store_shard, lease_coordinator)
+                    for _ in range(self.ingest_workers)
+                ]
+                # Pages stored by workers joining from other hosts are not counted.
+                rows = sum(future.result() for future in futures)
+        except Exception:
+            if snapshot_log is not None:
+                snapshot_log.abort(staging_path)
+            raise
+        if snapshot_log is not None:
+            snapshot_log.commit(staging_path)
+        self._set_watermark(config_id, end_offset)
+        return rows
+
+    def _ingest_increment(self, config_id, records):
+        """
+        Append the `records` records following the last ingested one to the raw layer.
+        """
+        start_offset = self._load_watermarks().get(config_id or "default", 0)
+        rows = self.api_handlers[config_id].fetch_and_store_data(
+            total_records=records, batch_size=self.batch_size, start_offset=start_offset, clear=False
+        )
+        self._set_watermark(config_id, start_offset + len(range(0, records, self.batch_size)) * self.batch_size)
+        return rows
+
+    def join_ingest(self):
+        """
+        Work on the leases of a sharded ingest started by another pipeline sharing root_dir,
+        until every lease is done. With a fan-out, the configurations are worked on one after the other.
+        """
+        for config_id, api_handler in self.api_handlers.items():
+            api_handler.fetch_and_store_shard(self.lease_coordinators[config_id])
+
+    def lookup(self, ids, column="unique_id"):
+        """
+        Find records in the raw and intermediate layers through their point indexes.
+
+        Args:
+            ids (iterable): Keys to look up.
+            column (str): Key column, e.g. "unique_id" or "id".
+
+        Returns:
+            dict: Layer name -> DataFrame of the matching rows with the _file and _row_group
+            columns, for the layers that are indexed. With a fan-out, a config column names the
+            configuration of each row.
+        """
+        layers = {"raw": (self.raw_io, self.raw_data_path), "intermediate": (self.intermediate_io, self.intermediate_data_path)}
+        results = {}
+        for layer, (io_handler, path) in layers.items():
+            if not isinstance(io_handler, ParquetIO):
+                continue
+            frames = []
+            for config_id, config_params in self.configs.items():
+                index = io_handler.point_index(self._pin(self._partition(path, config_id)))
+                if index is None:
+                    continue
+                rows = index.lookup(ids, column=column)
+                if self.fan_out:
+                    rows = rows.assign(**{DataMart.PARTITION_COLUMN: self.config_label(config_params)})
+                frames.append(rows)
+            if frames:
+                results[layer] = pd.concat(frames, ignore_index=True)
+        return results
 
-        # Step 3: Perform analytics on intermediate data
-        print("Calculating analytics...")
-        print("Percentage of Gmail users in Germany:")
-        print(self.data_mart.calculate_percentage_gmail_users_in_germany())
+    def run(self, force=False):
+        """
+        Run the pipeline stages. Stages whose inputs are unchanged since their last successful
+        run are skipped, unless `force` is set; failed stages are retried on the next run.
+
+        Args:
+            force (bool): Rerun every stage regardless of the saved state.
 
-        print("Top three countries using Gmail:")
-        print(self.data_mart.calculate_top_three_countries_using_gmail())
+        Returns:
+            dict: Task name -> value returned by the task, for the tasks that ran.
+        """
+        print("Running pipeline stages...")
+        results = self.task_graph.run(force=force)
+        self._save_run_report("full", results)
 
-        print("Number of Gmail users over age 60:")
-        print(self.data_mart.calculate_gmail_users_over_age_60())
+        print("Analytics:")
+        titles = {
+            "percentage_gmail_users_in_germany": "Percentage of Gmail users in Germany:",
+            "top_three_countries_using_gmail": "Top three countries using Gmail:",
+            "gmail_users_over_age_60": "Number of Gmail users over age 60:",
+        }
+        for metric, title in titles.items():
+            print(title)
+            if metric in results:
+                print(results[metric])
+            else:
+                # Skipped because unchanged: show the result saved by the previous run.
+                print(self.data_mart.load_metric(metric))
+        return results
+
+    def run_increment(self, records=None):
+        """
+        Ingest only new records and bring the intermediate layer and the marts up to date:
+        fetch `records` records (default: one page per configuration) after the last ingested ones,
+        transform only the raw files added since the last transform, then recompute and publish
+        the metrics. Requires a previous full run (see needs_full_run).
+
+        Args:
+            records (int): Number of records to fetch per configuration.
+
+        Returns:
+            dict: Task name -> value returned by the task: the number of rows of the ingest and
+            transform tasks, and the result of the metric tasks.
+        """
+        results = self._build_task_graph(incremental=True, increment_records=records).run()
+        self._save_run_report("incremental", results)
+        return results
 
 
 if __name__ == "__main__":
@@ -71,15 +512,105 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the data pipeline.")
     parser.add_argument("--root-dir", type=str, required=True, help="Root directory for the pipeline.")
     parser.add_argument("--url", type=str, default="https://fakerapi.it/api/v2/persons", help="API URL to fetch data from.")
-    parser.add_argument("--params", type=str, default="_gender=XXX&_birthday_start=1900-01-01", help="Query parameters for the API.")
+    parser.add_argument("--params", type=str, action="append", default=None, help="Query parameters for the API. Repeat to run several configurations concurrently, e.g. --params _gender=male --params _gender=female. Defaults to _gender=XXX&_birthday_start=1900-01-01.")
     parser.add_argument("--batch-size", type=int, default=10000, help="Number of records to process per batch.")
     parser.add_argument("--total-records", type=int, default=30000, help="Total number of records to fetch.")
+    parser.add_argument("--max-workers", type=int, default=4, help="Maximum number of stages running concurrently.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage even if its inputs are unchanged.")
+    parser.add_argument("--raw-format", choices=sorted(IO_HANDLERS), default="parquet", help="Storage format of the raw layer.")
+    parser.add_argument("--intermediate-format", choices=sorted(IO_HANDLERS), default="parquet", help="Storage format of the intermediate layer.")
+    parser.add_argument("--raw-profile", choices=sorted(WRITE_PROFILES), default="fast-raw", help="Parquet write profile of the raw layer.")
+    parser.add_argument("--intermediate-profile", choices=sorted(WRITE_PROFILES), default="compact-intermediate", help="Parquet write profile of the intermediate layer.")
+    parser.add_argument("--mart-profile", choices=sorted(WRITE_PROFILES), default="compact-mart", help="Parquet write profile of the mart layer.")
+    parser.add_argument("--transform-engine", choices=BatchProcessor.ENGINES, default="pandas", help="Run the transform file by file in pandas, or as one DuckDB query over the raw layer.")
+    parser.add_argument("--raw-location", default=None, help="Object store URL of the raw layer, e.g. s3://bucket/pipeline/raw/. Defaults to <root-dir>/data/raw/.")
+    parser.add_argument("--intermediate-location", default=None, help="Object store URL of the intermediate layer. Defaults to <root-dir>/data/intermediate/.")
+    parser.add_argument("--storage-options", type=json.loads, default=None, help="JSON options of the object store filesystem, e.g. '{\"endpoint_url\": \"http://localhost:9000\"}'.")
+    parser.add_argument("--ingest-workers", type=int, default=1, help="Number of worker processes fetching API pages in parallel.")
+    parser.add_argument("--write-behind", action="store_true", help="Write raw pages in background threads while the next page is fetched.")
+    parser.add_argument("--lease-seconds", type=float, default=300, help="Time an ingest worker may hold a page lease without renewing it.")
+    parser.add_argument("--join-ingest", action="store_true", help="Only fetch pages for a sharded ingest started by another process sharing --root-dir.")
+    parser.add_argument("--http-cache", choices=ResponseCache.MODES, default=None, help="Record API responses to disk, or replay recorded ones without network access.")
+    parser.add_argument("--http-cache-ttl", type=float, default=None, help="Maximum age of recorded API responses, in seconds.")
+    parser.add_argument("--http-cache-max-bytes", type=int, default=None, help="Maximum total size of recorded API responses.")
+    parser.add_argument("--replay-dead-letters", action="store_true", help="Revalidate quarantined records and append the valid ones to the raw layer.")
+    parser.add_argument("--lookup", nargs="+", default=None, help="Find the files and row groups holding these keys instead of running the pipeline.")
+    parser.add_argument("--lookup-column", default="unique_id", help="Key column used by --lookup, e.g. unique_id or id.")
+    parser.add_argument("--sample", type=float, default=None, help="Print estimates of the metrics from this fraction of the intermediate rows, with 95%% confidence intervals, instead of running the pipeline.")
+    parser.add_argument("--bbox", type=float, nargs=4, default=None, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"), help="Print the intermediate rows located in this bounding box instead of running the pipeline.")
+    parser.add_argument("--nearest", type=float, nargs=2, default=None, metavar=("LAT", "LON"), help="Print the intermediate rows nearest to this point instead of running the pipeline.")
+    parser.add_argument("--nearest-k", type=int, default=10, help="Number of rows printed by --nearest.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and run incremental cycles on --interval, --trigger-dir files or POST /trigger.")
+    parser.add_argument("--interval", type=float, default=None, help="Seconds between scheduled daemon cycles.")
+    parser.add_argument("--trigger-dir", default=None, help="Directory where dropping any file triggers a daemon cycle.")
+    parser.add_argument("--increment-records", type=int, default=None, help="Records fetched per configuration by incremental daemon cycles. Defaults to --batch-size.")
+    parser.add_argument("--daemon-port", type=int, default=8766, help="Port of the daemon's /health, /stats and /trigger endpoints.")
+    parser.add_argument("--no-autotune", action="store_true", help="Transform in fixed batches instead of tuning the batch and row-group sizes during the run.")
+    parser.add_argument("--transform-memory-limit", type=int, default=512, help="Memory, in MB, a transform batch may need when the batch size is tuned.")
+    parser.add_argument("--snapshot-retention", type=float, default=3600, help="Seconds a superseded snapshot of a local layer is kept for the readers still using it.")
+    parser.add_argument("--no-snapshots", action="store_true", help="Clear and rewrite local layers in place instead of committing snapshot versions.")
+    parser.add_argument("--serve", action="store_true", help="Serve the published mart metrics over HTTP instead of running the pipeline.")
+    parser.add_argument("--serve-port", type=int, default=8765, help="Port of the mart HTTP service.")
+    parser.add_argument("--refresh-mart", action="store_true", help="Bypass the mart result cache.")
+    parser.add_argument("--mart-cache-max-age", type=float, default=24 * 3600, help="Maximum age of cached mart results, in seconds.")
 
     args = parser.parse_args()
 
-    # Parse the query parameters into a dictionary
-    params = dict(param.split('=') for param in args.params.split('&'))
+    # Parse the query parameters into a dictionary, or one per configuration
+    param_sets = [
+        dict(param.split('=') for param in query.split('&'))
+        for query in (args.params or ["_gender=XXX&_birthday_start=1900-01-01"])
+    ]
+    params = param_sets[0] if len(param_sets) == 1 else param_sets
 
     # Create and run the workflow
-    workflow = DataPipeline(args.root_dir, args.url, params, args.batch_size, args.total_records)
-    workflow.run()
+    workflow = DataPipeline(
+        args.root_dir, args.url, params, args.batch_size, args.total_records, max_workers=args.max_workers,
+        refresh_mart=args.refresh_mart, mart_cache_max_age=args.mart_cache_max_age,
+        raw_format=args.raw_format, intermediate_format=args.intermediate_format,
+        raw_profile=args.raw_profile, intermediate_profile=args.intermediate_profile, mart_profile=args.mart_profile,
+        ingest_workers=args.ingest_workers, lease_seconds=args.lease_seconds,
+        http_cache_mode=args.http_cache, http_cache_ttl=args.http_cache_ttl, http_cache_max_bytes=args.http_cache_max_bytes,
+        transform_engine=args.transform_engine, write_behind=args.write_behind,
+        raw_location=args.raw_location, intermediate_location=args.intermediate_location,
+        storage_options=args.storage_options,
+        snapshots=not args.no_snapshots, snapshot_retention=args.snapshot_retention,
+        autotune_batches=not args.no_autotune, transform_memory_limit=args.transform_memory_limit * 1024 * 1024
+    )
+    if args.daemon:
+        daemon = PipelineDaemon(
+            workflow, interval=args.interval, trigger_dir=args.trigger_dir, increment_records=args.increment_records
+        )
+        server = daemon.serve(port=args.daemon_port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Daemon health and stats on http://127.0.0.1:{args.daemon_port}/health and /stats")
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            daemon.stop()
+        finally:
+            server.shutdown()
+    elif args.serve:
+        server = MartQueryService(workflow.mart_store).serve(port=args.serve_port)
+        print(f"Serving mart metrics on http://127.0.0.1:{args.serve_port}/metrics")
+        server.serve_forever()
+    elif args.sample is not None:
+        for metric in DataMart.METRIC_FILES:
+            print(f"{metric} (sample of {args.sample:.2%}):")
+            print(getattr(workflow.data_mart, f"calculate_{metric}")(approximate=True, sample=args.sample))
+    elif args.bbox is not None:
+        print(workflow.data_mart.users_in_bounding_box(*args.bbox))
+    elif args.nearest is not None:
+        print(workflow.data_mart.nearest_users(*args.nearest, k=args.nearest_k))
+    elif args.lookup:
+        for layer, rows in workflow.lookup(args.lookup, column=args.lookup_column).items():
+            print(f"{layer}:")
+            print(rows if not rows.empty else "not found")
+    elif args.join_ingest:
+        workflow.join_ingest()
+    elif args.replay_dead_letters:
+        for api_handler in workflow.api_handlers.values():
+            replayed, rejected = api_handler.replay_dead_letters()
+            print(f"Replayed {replayed} record(s); {rejected} record(s) remain quarantined.")
+    else:
+        workflow.run(force=args.force)
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+
+class DiskCache:
+    """
+    Simple file-per-entry cache stored in a local directory.
+
+    Entries are addressed by a string key and evicted when they are older than `max_age_seconds`,
+    or in least-recently-used order when the cache holds more than `max_entries` entries or
+    `max_bytes` bytes. Writes are atomic, so concurrent readers never see a partial entry.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = None, max_entries: int = None,
+                 max_age_seconds: float = None, suffix: str = ""):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory where the entries are stored. Created if it does not exist.
+            max_bytes (int): Maximum total size of the entries. Unlimited when None.
+            max_entries (int): Maximum number of entries. Unlimited when None.
+            max_age_seconds (float): Entries older than this are treated as missing and evicted.
+                Entries never expire when None.
+            suffix (str): File extension of the entries (e.g. ".parquet").
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Locks cannot be pickled; a copy sent to another process gets its own lock.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Build a cache key from arbitrary values (e.g. query text and an input fingerprint).
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def get_path(self, key: str):
+        """
+        Return the path of a valid entry, or None on a miss. A hit refreshes the entry's recency.
+        """
+        path = self.path_for(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        if self._is_expired(stat.st_mtime):
+            self._remove(path)
+            return None
+
+        # The access time drives LRU eviction; the modification time records when the entry was stored.
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+
+    def get(self, key: str):
+        """
+        Return the content of a valid entry as bytes, or None on a miss.
+        """
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        """
+        Store an entry and evict old entries if the cache exceeds its limits.
+
+        Returns:
+            str: The path of the stored entry.
+        """
+        path = self.path_for(key)
+        tmp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def invalidate(self, key: str):
+        self._remove(self.path_for(key))
+
+    def clear(self):
+        for entry in self._entries():
+            self._remove(entry[0])
+
+    def evict(self):
+        """
+        Remove expired entries, then least recently used entries until the cache is within its limits.
+        """
+        with self._lock:
+            entries = []
+            for path, stat in self._entries():
+                if self._is_expired(stat.st_mtime):
+                    self._remove(path)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            while entries and (
+                (self.max_entries is not None and len(entries) > self.max_entries)
+                or (self.max_bytes is not None and total_bytes > self.max_bytes)
+            ):
+                _, size, path = entries.pop(0)
+                self._remove(path)
+                total_bytes -= size
+
+    def _entries(self):
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(".") or not file_name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                yield path, os.stat(path)
+            except FileNotFoundError:
+                continue
+
+    def _is_expired(self, stored_at):
+        return self.max_age_seconds is not None and time.time() - stored_at > self.max_age_seconds
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
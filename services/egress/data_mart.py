@@ -1,31 +1,172 @@
+import hashlib
+import io
+import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
+import pyarrow as pa
 import duckdb
+from services.cache.disk_cache import DiskCache
+from services.io_manager.snapshot_log import SnapshotLog
+from services.transform.geo import CELL_COLUMN, EARTH_RADIUS_KM, bounding_box, cell_ranges, haversine_km
+from services.transform.sketches import PersonSketches
 
 class DataMart:
-    def __init__(self, input_dir, output_dir, io_handler):
+    # Metric name -> mart file name (the io_handler adds the extension).
+    # Each metric is computed by the `calculate_<metric name>` method.
+    METRIC_FILES = {
+        "percentage_gmail_users_in_germany": "percentage_gmail_users_in_germany",
+        "top_three_countries_using_gmail": "top_three_countries_using_gmail",
+        "gmail_users_over_age_60": "gmail_users_over_age_60",
+    }
+
+    # Normal quantile of the two-sided 95% confidence intervals of the sampled metrics.
+    CONFIDENCE_Z = 1.96
+
+    # Column naming the partition of each row when the input is partitioned.
+    PARTITION_COLUMN = "config"
+
+    def __init__(self, input_dir, output_dir, io_handler, connection=None, cache=None, output_io_handler=None,
+                 sketch_path=None, partitions=None, snapshots=True):
         """
         Initialize the DataMartCreator class.
 
         :param io_handler: An instance of IOHandler (e.g., ParquetIO) for reading and writing data.
+        :param output_io_handler: IOHandler used to write the mart tables. Defaults to io_handler.
         :param input_dir: Directory path where transformed data is stored.
         :param output_dir: Directory path where the resulting data mart tables will be saved.
+        :param connection: DuckDB connection shared by all metrics. An in-memory database is used if omitted.
+        :param cache: Optional DiskCache of metric results, keyed by query text and input fingerprint.
+        :param sketch_path: Path of the sketches saved by BatchProcessor, used by the approximate metrics.
+            A list of paths is merged into one set of sketches.
+        :param partitions: Optional mapping of partition name -> directory, e.g. one per pipeline
+            configuration. The partitions are read as one table with a `config` column naming the
+            partition of each row, and every metric is computed per partition in a single query.
+        :param snapshots: Read the latest snapshot version of the input directories (see SnapshotLog).
+            Disable it when the input is rewritten in place, so versions left over from earlier runs
+            with snapshots are not read instead of the current files.
         """
         self.io_handler = io_handler
+        self.output_io_handler = output_io_handler if output_io_handler is not None else io_handler
         self.input_dir = input_dir
         self.output_dir = output_dir
+        self.connection = connection if connection is not None else duckdb.connect()
+        self.cache = cache
+        self.sketch_path = sketch_path
+        self.partitions = dict(partitions) if partitions is not None else None
+        self.snapshots = snapshots
         self.data = None
+        self._data_fingerprint = None
+        self._data_lock = threading.Lock()
+        self._local = threading.local()
 
-    def read_data(self):
+    def read_data(self, columns=None, filters=None):
         """
-        Load all data files from the input directory into a single DataFrame using the io_handler.
+        Load all data files from the input directory into a single Arrow table using the io_handler.
+        DuckDB scans the table in place, so handlers returning memory-mapped tables hand over
+        the data without copying it.
+
+        :param columns: Columns to read. Defaults to all columns.
+        :param filters: Row filters in PyArrow's DNF format, pushed down to the io_handler.
         """
-        data = self.io_handler.read_all(self.input_dir)
-        if data is None or data.empty:
+        if self.partitions is not None:
+            data = self._read_partitions(columns=columns, filters=filters)
+        else:
+            data = self.io_handler.read_table(self._pin(self.input_dir), columns=columns, filters=filters)
+        # A filter may legitimately match no rows; only an empty input is an error.
+        if data is None or (data.num_rows == 0 and not filters):
             raise ValueError("No data found in the input directory or data is empty.")
         
         return data
 
+    def _read_partitions(self, columns=None, filters=None):
+        """
+        Read every partition and combine them into one table, adding the partition column.
+        Partitions without any file are skipped.
+        """
+        tables = []
+        for name, path in self._input_dirs().items():
+            try:
+                table = self.io_handler.read_table(path, columns=columns, filters=filters)
+            except FileNotFoundError:
+                continue
+            partition = pa.array([name] * table.num_rows, pa.string()).dictionary_encode()
+            tables.append(table.append_column(self.PARTITION_COLUMN, partition))
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options="default")
+
+    def _input_dirs(self):
+        """
+        Return the pinned snapshot directory of every partition, or of the input directory
+        under the None key when the input is not partitioned.
+        """
+        directories = self.partitions if self.partitions is not None else {None: self.input_dir}
+        return {name: self._pin(path) for name, path in directories.items()}
+
+    def _pin(self, path):
+        """
+        Return the directory to read for an input directory: its latest snapshot version, or the
+        directory itself when snapshots are disabled.
+        """
+        return SnapshotLog(path).pin() if self.snapshots else path
+
+    def _input_fingerprint(self):
+        """
+        Return the fingerprint of the input directory, or of every partition.
+        """
+        if self.partitions is None:
+            return self.io_handler.fingerprint(self._pin(self.input_dir))
+        digest = hashlib.sha256()
+        for name, path in sorted(self._input_dirs().items()):
+            digest.update(f"|{name}|{self.io_handler.fingerprint(path)}".encode())
+        return digest.hexdigest()
+
+    def _grouping(self):
+        """
+        Return the SQL fragments computing a metric per partition: `keys` to prefix select and
+        group-by lists with, `group_by` and `order_by` to end an aggregate query with, and
+        `partition_by` to start window specifications with. They are empty when the input is
+        not partitioned.
+        """
+        if self.partitions is None:
+            return {"keys": "", "group_by": "", "order_by": "", "partition_by": ""}
+        column = self.PARTITION_COLUMN
+        return {
+            "keys": f"{column}, ",
+            "group_by": f"GROUP BY {column}",
+            "order_by": f"ORDER BY {column}",
+            "partition_by": f"PARTITION BY {column} ",
+        }
+
+    def _partition_of(self, record):
+        """
+        Return the partition column of a result record as a dict, empty when the input is not partitioned.
+        """
+        if self.partitions is None:
+            return {}
+        return {self.PARTITION_COLUMN: record[self.PARTITION_COLUMN]}
+
+    def load_data(self, columns=None, filters=None):
+        """
+        Return the input data, reading it through the io_handler only when the input
+        directory changed since the last load of the same columns and filters.
+        Safe to call from several threads.
+
+        :param columns: Columns to read. Defaults to all columns.
+        :param filters: Row filters in PyArrow's DNF format.
+        """
+        fingerprint = self._input_fingerprint()
+        key = (tuple(columns) if columns is not None else None, repr(filters))
+        with self._data_lock:
+            if self.data is None or fingerprint != self._data_fingerprint:
+                self.data = {}
+                self._data_fingerprint = fingerprint
+            if key not in self.data:
+                self.data[key] = self.read_data(columns=columns, filters=filters)
+            return self.data[key]
+
     def save_to_mart(self, df, filename):
         """
         Save the resulting DataFrame to the output directory as a Parquet file.
@@ -35,107 +176,486 @@ class DataMart:
         """
         # output_path = os.path.join(self.output_dir, filename)
         os.makedirs(self.output_dir, exist_ok=True)
-        self.io_handler.write(self.output_dir, df, filename)
+        self.output_io_handler.write(self.output_dir, df, filename)
+
+    def load_metric(self, metric):
+        """
+        Read a metric previously saved to the mart.
+
+        :param metric: Name of the metric (key of METRIC_FILES).
+        :return: The saved metric as a DataFrame.
+        """
+        return pd.read_parquet(os.path.join(self.output_dir, f"{self.METRIC_FILES[metric]}.parquet"))
+
+    def publish_to_store(self, mart_store, metrics=None):
+        """
+        Publish the saved metrics as tables of a new MartStore version, replacing the served
+        version atomically.
+
+        :param mart_store: The MartStore to publish to.
+        :param metrics: Names of the metrics to publish. Defaults to all metrics.
+        :return: The published version.
+        """
+        metrics = list(self.METRIC_FILES) if metrics is None else list(metrics)
+        return mart_store.publish({metric: self.load_metric(metric) for metric in metrics})
+
+    def _cursor(self):
+        """
+        Return the calling thread's cursor on the shared DuckDB connection.
+        DuckDB connections must not be used from several threads at once, cursors can.
+        """
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self.connection.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def _execute(self, query, data):
+        """
+        Run a DuckDB query against `data`, exposed to the query as the `data` table.
+
+        :param query: SQL query to execute.
+        :param data: Arrow table or DataFrame the query reads from.
+        :return: The query result as a DataFrame.
+        """
+        cursor = self._cursor()
+        cursor.register("data", data)
+        try:
+            return cursor.execute(query).df()
+        finally:
+            cursor.unregister("data")
+
+    def _run_metric(self, metric, query, refresh=False, columns=None, filters=None):
+        """
+        Calculate a metric and save it to the mart, serving it from the result cache when
+        the query and the input data are unchanged.
+
+        :param metric: Name of the metric (key of METRIC_FILES).
+        :param query: SQL query computing the metric from the `data` table.
+        :param refresh: Ignore any cached result and recompute the metric.
+        :param columns: Columns the query uses; only these are read from the input.
+        :param filters: Row filters in PyArrow's DNF format applied while reading. They must not
+            remove rows the query needs.
+        :return: The metric as a DataFrame.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = DiskCache.make_key(
+                query, columns, filters, self._input_fingerprint()
+            )
+            # Read the bytes in one go: a path could be evicted before it is opened.
+            cached = None if refresh else self.cache.get(cache_key)
+            if cached is not None:
+                result_df = pd.read_parquet(io.BytesIO(cached))
+                self.save_to_mart(result_df, self.METRIC_FILES[metric])
+                return result_df
+
+        data = self.load_data(columns=columns, filters=filters)
+
+        try:
+            result_df = self._execute(query, data)
+            self.save_to_mart(result_df, self.METRIC_FILES[metric])
+        except Exception as e:
+            raise RuntimeError(f"Error while executing DuckDB query: {str(e)}")
+
+        if cache_key is not None:
+            self.cache.put(cache_key, result_df.to_parquet())
+        return result_df
+
+    def _run_sampled(self, query, columns, sample, seed=None, filters=None):
+        """
+        Run a query over a Bernoulli sample of the input, in which every row is kept with
+        probability `sample`. The sample is exposed to the query as the `data` table.
+        Each input directory is opened through the io_handler's duckdb_source, which takes the
+        sample while reading: Parquet files are scanned by DuckDB in place, with the filters in
+        the scan, and only a sample of their row groups is read. Other formats are read through the
+        handler and sampled in DuckDB (partitioned inputs add the partition column).
+        Sampled results are neither cached nor saved to the mart.
+
+        :param query: SQL query reading from `data`.
+        :param columns: Columns the query uses.
+        :param sample: Sampling fraction, between 0 (excluded) and 1.
+        :param seed: Seed making the sample repeatable.
+        :param filters: Row filters in PyArrow's DNF format applied while reading the input.
+        :return: The query result as a DataFrame.
+        """
+        if not 0 < sample <= 1:
+            raise ValueError("sample must be a fraction between 0 (excluded) and 1.")
+
+        cursor = self._cursor()
+        projection = ", ".join(f'"{column}"' for column in columns)
+
+        if self.partitions is not None:
+            projection = f'"{self.PARTITION_COLUMN}", {projection}'
+
+        names = []
+        scans = []
+        try:
+            for name, directory in self._input_dirs().items():
+                names.append(f"sample_source_{len(names)}")
+                relation = self.io_handler.duckdb_source(
+                    cursor, directory, names[-1], columns=columns, filters=filters, sample=sample, seed=seed
+                )
+                if relation is None:
+                    continue
+                partition = "" if name is None else "'" + name.replace("'", "''") + f"' AS \"{self.PARTITION_COLUMN}\", "
+                scans.append(f"SELECT {partition}* FROM {relation}")
+            if not scans:
+                raise ValueError("No data found in the input directory or data is empty.")
+            source = "(" + " UNION ALL BY NAME ".join(scans) + ")"
+
+            try:
+                return cursor.execute(
+                    f"WITH data AS (SELECT {projection} FROM {source}) {query}"
+                ).df()
+            except Exception as e:
+                raise RuntimeError(f"Error while executing DuckDB query: {str(e)}")
+        finally:
+            for name in names:
+                cursor.unregister(name)
+
+    @classmethod
+    def _proportion_interval(cls, matches, sample_rows):
+        """
+        Return the Wilson score interval of a proportion observed in a sample, as (lower, upper).
+        """
+        if sample_rows == 0:
+            return None, None
+        z = cls.CONFIDENCE_Z
+        p = matches / sample_rows
+        center = (p + z * z / (2 * sample_rows)) / (1 + z * z / sample_rows)
+        margin = z * math.sqrt(p * (1 - p) / sample_rows + z * z / (4 * sample_rows ** 2)) / (1 + z * z / sample_rows)
+        return max(0.0, center - margin), min(1.0, center + margin)
+
+    @classmethod
+    def _scaled_count(cls, sample_count, sample):
+        """
+        Scale a count observed in a Bernoulli sample to the whole input and return
+        (estimate, lower bound, upper bound). Each row is kept independently with probability
+        `sample`, so the sampled count has variance N * sample * (1 - sample).
+        """
+        estimate = sample_count / sample
+        margin = cls.CONFIDENCE_Z * math.sqrt(sample_count * (1 - sample)) / sample
+        return round(estimate), max(sample_count, round(estimate - margin)), round(estimate + margin)
+
+    def run_all(self, metrics=None, max_workers=None, refresh=False):
+        """
+        Calculate several metrics concurrently and save each one to the mart as soon as it is ready.
+
+        Metrics read their input through load_data, which keeps one copy per (columns, filters)
+        and rereads it only when the input changed, so metrics needing the same columns and filters
+        share it; every metric runs on its own cursor of the shared DuckDB connection and writes its
+        Parquet output from its worker thread.
+
+        :param metrics: Names of the metrics to calculate (keys of METRIC_FILES). Defaults to all metrics.
+        :param max_workers: Maximum number of metrics calculated at the same time. Defaults to one per metric.
+        :param refresh: Bypass the result cache and recompute every metric.
+        :return: An iterator of (metric name, result DataFrame) tuples, in completion order.
+        :raises ValueError: If an unknown metric is requested.
+        """
+        metrics = list(self.METRIC_FILES) if metrics is None else list(metrics)
+        unknown = [metric for metric in metrics if metric not in self.METRIC_FILES]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        if not metrics:
+            return iter(())
+
+        executor = ThreadPoolExecutor(max_workers=max_workers or len(metrics))
+        futures = {
+            executor.submit(getattr(self, f"calculate_{metric}"), refresh=refresh): metric
+            for metric in metrics
+        }
+        # Already submitted work keeps running; the pool's threads exit once it is done.
+        executor.shutdown(wait=False)
 
+        return self._iter_completed(futures)
 
-    def calculate_percentage_gmail_users_in_germany(self):
+    @staticmethod
+    def _iter_completed(futures):
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def calculate_percentage_gmail_users_in_germany(self, refresh=False, approximate=False, sample=0.01, seed=None):
         """
         Load all data files from the input directory into a single DataFrame using the io_handler
         and calculate the percentage of Gmail users in Germany, returning the result in a DataFrame.
+        Set `refresh` to bypass the result cache. Partitioned inputs give one row per partition.
+
+        With `approximate`, the percentage is estimated from a `sample` fraction of the rows and
+        returned with the bounds of its 95% confidence interval and the number of sampled rows.
         """
-        # Load all data files
-        data = self.io_handler.read_all(self.input_dir)
-        if data is None or data.empty:
-            raise ValueError("No data found in the input directory or data is empty.")
-        
+        grouping = self._grouping()
+        if approximate:
+            counts = self._run_sampled(
+                f"""
+                SELECT
+                    {grouping['keys']}COALESCE(SUM(CASE WHEN country = 'Germany' AND email_provider = 'gmail.com' THEN 1 ELSE 0 END), 0) AS matches,
+                    COUNT(*) AS sample_rows
+                FROM data
+                {grouping['group_by']}
+                {grouping['order_by']};
+                """,
+                columns=["country", "email_provider"], sample=sample, seed=seed,
+            )
+            rows = []
+            for record in counts.to_dict("records"):
+                matches, sample_rows = int(record["matches"]), int(record["sample_rows"])
+                lower, upper = self._proportion_interval(matches, sample_rows)
+                rows.append({
+                    **self._partition_of(record),
+                    "percentage": round(100 * matches / sample_rows, 2) if sample_rows else None,
+                    "lower_bound": None if lower is None else round(100 * lower, 2),
+                    "upper_bound": None if upper is None else round(100 * upper, 2),
+                    "sample_rows": sample_rows,
+                })
+            return pd.DataFrame(rows)
+
         # Query using DuckDB
-        query = """
+        query = f"""
         SELECT 
-            ROUND((CAST(SUM(CASE WHEN country = 'Germany' AND email_provider = 'gmail.com' THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*)) * 100, 2) AS percentage
+            {grouping['keys']}ROUND((CAST(SUM(CASE WHEN country = 'Germany' AND email_provider = 'gmail.com' THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*)) * 100, 2) AS percentage
         FROM 
-            data;
+            data
+        {grouping['group_by']}
+        {grouping['order_by']};
         """
         
-        try:
-            # Execute the query
-            result_df = duckdb.query(query).df()
-            self.save_to_mart(result_df, 'percentage_gmail_users_in_germany.parquet')
-            return result_df
-        except Exception as e:
-            raise RuntimeError(f"Error while executing DuckDB query: {str(e)}")
+        # Every row counts towards the denominator, so no rows are filtered out while reading.
+        return self._run_metric(
+            "percentage_gmail_users_in_germany", query, refresh=refresh,
+            columns=["country", "email_provider"],
+        )
 
 
-    def calculate_top_three_countries_using_gmail(self):
+    def calculate_top_three_countries_using_gmail(self, refresh=False, approximate=False, sample=0.01, seed=None):
         """
         Query to retrieve the top three countries with the highest number of Gmail users
-        and return the result as a DataFrame.
+        and return the result as a DataFrame. Set `refresh` to bypass the result cache.
+        Partitioned inputs are ranked within each partition.
+
+        With `approximate`, the counts are estimated from a `sample` fraction of the rows, scaled
+        to the whole input and returned with the bounds of their 95% confidence intervals.
+        Countries are ranked by their estimated count.
         """
-        # Load all data files
-        data = self.io_handler.read_all(self.input_dir)
-        if data is None or data.empty:
-            raise ValueError("No data found in the input directory or data is empty.")
-        
+        grouping = self._grouping()
+        if approximate:
+            counts = self._run_sampled(
+                f"""
+                SELECT {grouping['keys']}country, COUNT(*) AS sample_count
+                FROM data
+                WHERE email_provider = 'gmail.com'
+                GROUP BY {grouping['keys']}country;
+                """,
+                columns=["country", "email_provider"], sample=sample, seed=seed,
+                filters=[("email_provider", "==", "gmail.com")],
+            )
+            keys = [] if self.partitions is None else [self.PARTITION_COLUMN]
+            rows = []
+            for record in counts.to_dict("records"):
+                estimate, lower, upper = self._scaled_count(int(record["sample_count"]), sample)
+                rows.append({
+                    **self._partition_of(record),
+                    "country": record["country"], "gmail_users": estimate, "lower_bound": lower, "upper_bound": upper,
+                })
+            result = pd.DataFrame(rows, columns=[*keys, "country", "gmail_users", "lower_bound", "upper_bound"])
+            estimates = result.groupby(keys)["gmail_users"] if keys else result["gmail_users"]
+            result["rank"] = estimates.rank(method="dense", ascending=False).astype(int)
+            return result[result["rank"] <= 3].sort_values([*keys, "rank", "country"], ignore_index=True)
+
         # Query to calculate the top three countries with Gmail users
-        query = """
+        query = f"""
         WITH ranked_countries AS (
             SELECT 
-                country, 
+                {grouping['keys']}country, 
                 COUNT(*) AS gmail_users,
-                DENSE_RANK() OVER (ORDER BY COUNT(*) DESC) AS rank
+                DENSE_RANK() OVER ({grouping['partition_by']}ORDER BY COUNT(*) DESC) AS rank
             FROM 
                 data
             WHERE 
                 email_provider = 'gmail.com'
             GROUP BY 
-                country
+                {grouping['keys']}country
         )
         SELECT 
-            country, 
+            {grouping['keys']}country, 
             gmail_users, 
             rank
         FROM 
             ranked_countries
         WHERE 
-            rank <= 3;
+            rank <= 3
+        {grouping['order_by']};
         """
         
-        try:
-            # Execute the query and return the result as a DataFrame
-            result_df = duckdb.query(query).df()
-            self.save_to_mart(result_df, 'top_three_countries_using_gmail.parquet')
-            return result_df
-        except Exception as e:
-            raise RuntimeError(f"Error while executing DuckDB query: {str(e)}")
+        return self._run_metric(
+            "top_three_countries_using_gmail", query, refresh=refresh,
+            columns=["country", "email_provider"], filters=[("email_provider", "==", "gmail.com")],
+        )
 
 
-    def calculate_gmail_users_over_age_60(self):
+    def calculate_gmail_users_over_age_60(self, refresh=False, approximate=False, sample=0.01, seed=None):
         """
         Query to retrieve the count of Gmail users grouped by age group where the 
-        age is greater than or equal to 60.
+        age is greater than or equal to 60. Set `refresh` to bypass the result cache.
+        With `approximate`, the count is estimated from a `sample` fraction of the rows.
         
         Returns:
         - pd.DataFrame: A DataFrame with the age groups and user counts for Gmail users aged 60 and above.
+          Approximate results add the bounds of the 95% confidence interval of the count.
+          Partitioned inputs give one row per partition with Gmail users.
         """
+        grouping = self._grouping()
+        if approximate:
+            counts = self._run_sampled(
+                f"""
+                SELECT {grouping['keys']}COUNT(*) AS sample_count
+                FROM data
+                WHERE
+                    email_provider = 'gmail.com'
+                    AND CAST(SPLIT_PART(age_group, '-', 2) AS INT) >= 60
+                {grouping['group_by']}
+                {grouping['order_by']}
+                """,
+                columns=["age_group", "email_provider"], sample=sample, seed=seed,
+                filters=[("email_provider", "==", "gmail.com")],
+            )
+            rows = []
+            for record in counts.to_dict("records"):
+                estimate, lower, upper = self._scaled_count(int(record["sample_count"]), sample)
+                rows.append({**self._partition_of(record), "users_count": estimate, "lower_bound": lower, "upper_bound": upper})
+            return pd.DataFrame(rows)
 
-        data = self.io_handler.read_all(self.input_dir)
 
-        if data is None or data.empty:
-            raise ValueError("No data provided or data is empty.")
-        
         # SQL query to filter and count Gmail users by age group >= 60
-        query = """
+        query = f"""
             SELECT 
-                COUNT(*) AS users_count
+                {grouping['keys']}COUNT(*) AS users_count
             FROM data
             WHERE 
                 email_provider = 'gmail.com'
                 AND CAST(SPLIT_PART(age_group, '-', 2) AS INT) >= 60
+            {grouping['group_by']}
+            {grouping['order_by']}
             """
         
-        try:
-            # Run the query using DuckDB
-            result_df = duckdb.query(query).df()
-            self.save_to_mart(result_df, 'gmail_users_over_age_60.parquet')
-            return result_df
-        except Exception as e:
-            raise RuntimeError(f"Error while executing DuckDB query: {str(e)}")
+        return self._run_metric(
+            "gmail_users_over_age_60", query, refresh=refresh,
+            columns=["age_group", "email_provider"], filters=[("email_provider", "==", "gmail.com")],
+        )
+
+    def _load_sketches(self):
+        paths = self.sketch_path if isinstance(self.sketch_path, (list, tuple)) else [self.sketch_path]
+        paths = [path for path in paths if path is not None and os.path.exists(path)]
+        if not paths:
+            raise ValueError("No sketches available. Enable sketches in the BatchProcessor and process the data first.")
+        sketches = PersonSketches.load(paths[0])
+        for path in paths[1:]:
+            sketches.merge(PersonSketches.load(path))
+        return sketches
+
+    def approximate_distinct_users(self):
+        """
+        Estimate the number of distinct users (unique_id) from the HyperLogLog sketch,
+        without scanning the data.
+
+        Returns:
+        - pd.DataFrame: The estimate with a ~95% confidence interval (two standard errors).
+        """
+        sketch = self._load_sketches().distinct_users
+        estimate = sketch.estimate()
+        margin = 2 * sketch.relative_error * estimate
+        return pd.DataFrame([{
+            "distinct_users": round(estimate),
+            "lower_bound": max(0, round(estimate - margin)),
+            "upper_bound": round(estimate + margin),
+            "relative_standard_error": sketch.relative_error,
+        }])
+
+    def approximate_top_countries_using_gmail(self, k=3):
+        """
+        Approximate the top k countries by number of Gmail users from the Space-Saving sketch,
+        without scanning the data.
+
+        Returns:
+        - pd.DataFrame: One row per country with the estimated count, which is an upper bound,
+          the guaranteed lower bound and the rank.
+        """
+        sketch = self._load_sketches().gmail_countries
+        rows = [
+            {"country": country, "gmail_users": count, "min_gmail_users": count - error, "rank": rank}
+            for rank, (country, count, error) in enumerate(sketch.top(k), start=1)
+        ]
+        return pd.DataFrame(rows, columns=["country", "gmail_users", "min_gmail_users", "rank"])
+
+    def approximate_age_quantiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        Approximate age quantiles from the DDSketch, without scanning the data.
+
+        Returns:
+        - pd.DataFrame: One row per quantile with the estimated age and the interval
+          guaranteed to contain the true value.
+        """
+        sketch = self._load_sketches().age
+        accuracy = sketch.relative_accuracy
+        rows = []
+        for q in quantiles:
+            age = sketch.quantile(q)
+            rows.append({
+                "quantile": q,
+                "age": age,
+                "lower_bound": None if age is None else age / (1 + accuracy),
+                "upper_bound": None if age is None else age / (1 - accuracy),
+            })
+        return pd.DataFrame(rows)
+
+    def _read_region(self, min_latitude, min_longitude, max_latitude, max_longitude, columns=None):
+        """
+        Read the rows whose coordinates lie in a bounding box. The ranges of grid cells covering
+        the box are pushed down with the coordinates, so the io_handler skips the row groups of
+        the clustered intermediate layer that cover other regions.
+        """
+        box = [
+            ("latitude", ">=", min_latitude), ("latitude", "<=", max_latitude),
+            ("longitude", ">=", min_longitude), ("longitude", "<=", max_longitude),
+        ]
+        filters = [
+            [(CELL_COLUMN, ">=", low), (CELL_COLUMN, "<=", high), *box]
+            for low, high in cell_ranges(min_latitude, min_longitude, max_latitude, max_longitude)
+        ]
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, "latitude", "longitude"]))
+        return self.read_data(columns=columns, filters=filters).to_pandas()
+
+    def users_in_bounding_box(self, min_latitude, min_longitude, max_latitude, max_longitude, columns=None):
+        """
+        Return the users located in a bounding box, reading only the row groups that may hold them.
+
+        :param columns: Columns to return besides the coordinates. Defaults to all columns.
+
+        Returns:
+        - pd.DataFrame: The matching rows.
+        """
+        if min_latitude > max_latitude or min_longitude > max_longitude:
+            raise ValueError("The minimum coordinates of the bounding box must not exceed the maximum ones.")
+        return self._read_region(min_latitude, min_longitude, max_latitude, max_longitude, columns)
+
+    def nearest_users(self, latitude, longitude, k=10, columns=None, radius_km=50.0):
+        """
+        Return the k users nearest to a point. The users within `radius_km` are read through the
+        bounding box of that radius; the radius grows fourfold until k users are found or it covers
+        the whole globe.
+
+        :param columns: Columns to return besides the coordinates. Defaults to all columns.
+        :param radius_km: Radius of the first search.
+
+        Returns:
+        - pd.DataFrame: Up to k rows, nearest first, with their great-circle distance in `distance_km`.
+        """
+        radius = radius_km
+        while True:
+            rows = self._read_region(*bounding_box(latitude, longitude, radius), columns)
+            rows["distance_km"] = haversine_km(latitude, longitude, rows["latitude"], rows["longitude"])
+            rows = rows[rows["distance_km"] <= radius]
+            if len(rows) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return rows.sort_values("distance_km", kind="stable").head(k).reset_index(drop=True)
+            radius *= 4
@@ -0,0 +1,308 @@
+import json
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import duckdb
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: concurrent publishers may then move the pointer back.
+    fcntl = None
+
+
+class JsonRequestHandler(BaseHTTPRequestHandler):
+    """
+    Base HTTP request handler answering with JSON bodies and not logging every request.
+    """
+
+    def _send(self, status, body):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MartStore:
+    """
+    Versioned store of the mart tables in persistent DuckDB database files.
+
+    Every publish writes a complete new database file and then atomically replaces the CURRENT
+    pointer file, so readers always see either the previous or the new version of every table,
+    never a mix of both. Older versions are removed, keeping the last `keep_versions`.
+    """
+
+    POINTER_FILE = "CURRENT"
+
+    def __init__(self, store_dir: str, keep_versions: int = 3):
+        """
+        Args:
+            store_dir (str): Directory holding the database files and the CURRENT pointer.
+            keep_versions (int): Number of published versions kept on disk.
+        """
+        self.store_dir = store_dir
+        self.keep_versions = keep_versions
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _version_path(self, version: int) -> str:
+        return os.path.join(self.store_dir, f"mart-v{version:06d}.duckdb")
+
+    def _versions(self):
+        versions = []
+        for file_name in os.listdir(self.store_dir):
+            match = re.fullmatch(r"mart-v(\d+)\.duckdb", file_name)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def _reserve_version(self) -> int:
+        """
+        Reserve the next version number by creating its reservation file exclusively, so concurrent
+        publishers never pick the same number.
+        """
+        versions = self._versions()
+        version = (versions[-1] if versions else 0) + 1
+        while True:
+            try:
+                os.close(os.open(self._reservation_path(version), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                version += 1
+                continue
+            # A publisher that finished meanwhile removed its reservation after creating its file.
+            if not os.path.exists(self._version_path(version)):
+                return version
+            os.remove(self._reservation_path(version))
+            version += 1
+
+    def _reservation_path(self, version: int) -> str:
+        return os.path.join(self.store_dir, f".mart-v{version:06d}.reserved")
+
+    @contextmanager
+    def _pointer_lock(self):
+        with open(os.path.join(self.store_dir, ".pointer.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def current_version(self):
+        """
+        Return the published version readers should use, or None if nothing was published yet.
+        """
+        try:
+            with open(os.path.join(self.store_dir, self.POINTER_FILE)) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+
+    def current_path(self):
+        version = self.current_version()
+        return None if version is None else self._version_path(version)
+
+    def publish(self, tables: dict) -> int:
+        """
+        Write the tables to a new database version and make it the current one.
+
+        Args:
+            tables (dict): Mapping of table name to DataFrame.
+
+        Returns:
+            int: The published version.
+        """
+        for name in tables:
+            if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+                raise ValueError(f"Invalid table name '{name}'.")
+
+        tmp_path = os.path.join(self.store_dir, f".{uuid.uuid4().hex}.duckdb")
+        with duckdb.connect(tmp_path) as connection:
+            for name, df in tables.items():
+                connection.register("published_df", df)
+                connection.execute(f'CREATE TABLE "{name}" AS SELECT * FROM published_df')
+                connection.unregister("published_df")
+            connection.execute("CHECKPOINT")
+
+        version = self._reserve_version()
+        os.replace(tmp_path, self._version_path(version))
+        os.remove(self._reservation_path(version))
+
+        # Concurrent publishers replace the pointer in any order; it must never move back.
+        with self._pointer_lock():
+            current = self.current_version()
+            if current is None or current < version:
+                pointer_tmp_path = os.path.join(self.store_dir, f".{uuid.uuid4().hex}.pointer")
+                with open(pointer_tmp_path, "w") as f:
+                    f.write(str(version))
+                os.replace(pointer_tmp_path, os.path.join(self.store_dir, self.POINTER_FILE))
+
+        # Readers still holding an older file keep reading it; removing it only unlinks the name.
+        for old_version in self._versions()[:-self.keep_versions]:
+            os.remove(self._version_path(old_version))
+
+        return version
+
+
+class MartSnapshot:
+    """
+    One opened version of the MartStore: its read-only connection and its materialised tables.
+    The connection is closed once the snapshot is retired and no query is using it any more.
+    """
+
+    def __init__(self, version=None, connection=None, tables=None):
+        self.version = version
+        self.connection = connection
+        self.tables = tables or {}
+        self.readers = 0
+        self.retired = False
+
+    def rows(self, metric: str) -> list:
+        """
+        Return the rows of a metric as a list of dictionaries.
+
+        Raises:
+            KeyError: If the metric does not exist in this version.
+        """
+        if metric not in self.tables:
+            raise KeyError(f"Unknown metric '{metric}'.")
+        return self.tables[metric]
+
+
+class MartQueryService:
+    """
+    Serves mart lookups from a warm, read-only connection to the current MartStore version.
+
+    Metric tables are materialised in memory when a version is opened, so lookups do not run a
+    query. Each lookup checks the store's pointer and swaps to a newly published version first.
+    The previous version's connection stays open until the queries still running on it finish.
+    """
+
+    def __init__(self, store: MartStore):
+        self.store = store
+        self._lock = threading.Lock()
+        # Replaced as a whole when a new version is opened.
+        self._snapshot = MartSnapshot()
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def refresh(self):
+        """
+        Open the current version if it differs from the one being served.
+        """
+        version = self.store.current_version()
+        if version == self._snapshot.version:
+            return
+
+        with self._lock:
+            if version == self._snapshot.version:
+                return
+
+            # Open the version read from the pointer; rereading the pointer could yield a newer one.
+            try:
+                connection = duckdb.connect(self.store._version_path(version), read_only=True)
+            except (FileNotFoundError, duckdb.IOException):
+                # Already garbage-collected by a newer publish: keep serving until the next refresh.
+                return
+            table_names = [row[0] for row in connection.execute("SHOW TABLES").fetchall()]
+            tables = {}
+            for name in table_names:
+                cursor = connection.execute(f'SELECT * FROM "{name}"')
+                columns = [column[0] for column in cursor.description]
+                tables[name] = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+            previous = self._snapshot
+            self._snapshot = MartSnapshot(version, connection, tables)
+            previous.retired = True
+            self._close_if_unused(previous)
+
+    @staticmethod
+    def _close_if_unused(snapshot: MartSnapshot):
+        if snapshot.retired and snapshot.readers == 0 and snapshot.connection is not None:
+            snapshot.connection.close()
+
+    def snapshot(self) -> MartSnapshot:
+        """
+        Return the current version, so that several reads (e.g. its version number and the rows
+        of a metric) come from the same one.
+        """
+        self.refresh()
+        return self._snapshot
+
+    def metrics(self) -> list:
+        """
+        Return the names of the available metrics.
+        """
+        return sorted(self.snapshot().tables)
+
+    def get(self, metric: str) -> list:
+        """
+        Return the rows of a metric as a list of dictionaries.
+
+        Raises:
+            KeyError: If the metric does not exist in the current version.
+        """
+        return self.snapshot().rows(metric)
+
+    @contextmanager
+    def _reading(self):
+        """
+        Yield the current snapshot, keeping its connection open until the block exits.
+        """
+        self.refresh()
+        with self._lock:
+            snapshot = self._snapshot
+            snapshot.readers += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.readers -= 1
+                self._close_if_unused(snapshot)
+
+    def query(self, sql: str, parameters=None):
+        """
+        Run an ad-hoc read-only query against the current version.
+
+        Returns:
+            pd.DataFrame: The query result.
+        """
+        with self._reading() as snapshot:
+            if snapshot.connection is None:
+                raise ValueError("No mart version has been published yet.")
+            return snapshot.connection.cursor().execute(sql, parameters).df()
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        """
+        Create an HTTP server answering GET /metrics and GET /metrics/<name> with JSON.
+        Call serve_forever() on the returned server to start it.
+        """
+        service = self
+
+        class Handler(JsonRequestHandler):
+            def do_GET(self):
+                parts = [part for part in self.path.split("?")[0].split("/") if part]
+                try:
+                    snapshot = service.snapshot()
+                    if parts == ["metrics"]:
+                        self._send(200, {"version": snapshot.version, "metrics": sorted(snapshot.tables)})
+                    elif len(parts) == 2 and parts[0] == "metrics":
+                        rows = snapshot.rows(parts[1])
+                        self._send(200, {"version": snapshot.version, "metric": parts[1], "rows": rows})
+                    else:
+                        self._send(404, {"error": "Not found"})
+                except KeyError as e:
+                    self._send(404, {"error": str(e)})
+                except Exception as e:
+                    self._send(500, {"error": str(e)})
+
+        return ThreadingHTTPServer((host, port), Handler)
@@ -1,11 +1,19 @@
 import requests
 import pandas as pd
-from validation.api_validator import validate_api_response_to_dataframe
+from services.io_manager.parquet_io import ParquetIO
+from validation.api_validator import partition_api_response, validate_api_response_to_dataframe
 import hashlib
+import json
+import os
+import shutil
+import socket
 import time
+import uuid
 
 class ApiHandler:
-    def __init__(self, io_handler, url, params, output_path, retries=3, backoff_factor=2):
+    def __init__(self, io_handler, url, params, output_path, retries=3, backoff_factor=2, response_cache=None,
+                 dead_letter_path=None, write_behind=False, session=None, snapshot_log=None,
+                 dead_letter_io_handler=None):
         """
         Initialize ApiHandler with an I/O handler, API details, and output path.
 
@@ -16,6 +24,19 @@ class ApiHandler:
             output_path (str): File path to store the processed data.
             retries (int): Number of retry attempts in case of failure.
             backoff_factor (int): Factor to increase wait time between retries.
+            response_cache (ResponseCache): Optional cache used to record and replay API responses.
+            dead_letter_path (str): Folder where invalid records are quarantined. When set, records are
+                validated one by one and only the invalid ones are rejected; otherwise any invalid
+                record fails the whole page.
+            write_behind (bool): Hand pages to the I/O handler's background writers (submit_write) so
+                the next page is fetched while the previous one is encoded and written.
+            session (requests.Session): Session sending the requests, e.g. one shared by the handlers of
+                several configurations so they reuse the same connection pool. Defaults to requests.get.
+            snapshot_log (SnapshotLog): Commit log of the output path. When set, data is staged and
+                published as a new snapshot version once complete, instead of clearing and rewriting
+                the output path in place, so readers never see a partial dataset.
+            dead_letter_io_handler: Handler of the dead-letter dataset. Defaults to a ParquetIO, whatever
+                the format of the output path.
         """
         self.io_handler = io_handler
         self.url = url
@@ -23,34 +44,272 @@ class ApiHandler:
         self.output_path = output_path
         self.retries = retries
         self.backoff_factor = backoff_factor
+        self.response_cache = response_cache
+        self.dead_letter_path = dead_letter_path
+        self.dead_letter_io_handler = dead_letter_io_handler if dead_letter_io_handler is not None else ParquetIO()
+        self.write_behind = write_behind
+        self.session = session
+        self.snapshot_log = snapshot_log
 
-    def fetch_and_store_data(self, total_records: int = 30000, batch_size: int = 1000):
+    def fetch_and_store_data(self, total_records: int = 30000, batch_size: int = 1000, start_offset: int = 0,
+                             clear: bool = True) -> int:
         """
         Fetch data from the API in batches, validate it, and store it incrementally.
 
         Args:
             total_records (int): Total number of records to fetch.
             batch_size (int): Number of records to fetch per request.
+            start_offset (int): Offset of the first record to fetch, e.g. the end of a previous fetch.
+            clear (bool): Clear the output path first. Unset it to append to the stored data.
+
+        Returns:
+            int: Number of valid records stored.
+        """
+        if self.snapshot_log is not None:
+            destination = self.snapshot_log.begin(append=not clear)
+        else:
+            destination = self.output_path
+            if clear:
+                self.io_handler.clear(self.output_path)
+
+        rows = 0
+        try:
+            try:
+                for offset in range(start_offset, start_offset + total_records, batch_size):
+                    df = self._fetch_page(offset, batch_size)
+                    if df.empty:
+                        continue
+                    rows += len(df)
+                    if self.write_behind:
+                        self.io_handler.submit_write(destination, df)
+                    else:
+                        self.io_handler.write(destination, df)
+            finally:
+                # Every page is on disk before the next stage reads the output.
+                self.io_handler.flush()
+        except Exception:
+            if self.snapshot_log is not None:
+                self.snapshot_log.abort(destination)
+            raise
+        if self.snapshot_log is not None:
+            self.snapshot_log.commit(destination)
+        return rows
+
+    def fetch_and_store_shard(self, coordinator, worker_id: str = None, poll_interval: float = 1.0):
         """
-        self.io_handler.clear(self.output_path)
+        Fetch and store pages leased from a coordinator until every lease is done.
 
-        for offset in range(0, total_records, batch_size):
-            self.params.update({"_quantity": batch_size, "_offset": offset})
+        Several workers, in other processes or on other hosts sharing the output path, can run this
+        concurrently against the same coordinator: each page is fetched by the worker holding its lease.
+        Pages are stored under a name derived from their offset, so a page refetched after its lease
+        expired replaces the earlier file instead of duplicating it. The output path is not cleared;
+        that is done once when the leases are planned. With a snapshot log, pages are written to its
+        "shards" staging directory, begun when the leases are planned and committed once all are done.
 
-            data = self._fetch_with_retries()
-            if 'data' not in data:
-                raise ValueError("Unexpected API response structure.")
+        Args:
+            coordinator (LeaseCoordinator): Coordinator holding the planned leases.
+            worker_id (str): Identifier of this worker. Defaults to "<hostname>-<pid>".
+            poll_interval (float): Seconds to wait before asking again when all remaining leases are held by other workers.
+
+        Returns:
+            int: Number of valid records stored by this worker.
 
+        Raises:
+            RuntimeError: If some leases failed on every allowed attempt.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        destination = self.output_path if self.snapshot_log is None else self.snapshot_log.staging_path("shards")
+        # (offset, rows, future) of the pages being written in the background. A lease is only completed
+        # once its page is written; a failed write gives the lease back.
+        pending_writes = []
+        stored_rows = 0
+
+        def settle_writes(wait: bool):
+            nonlocal stored_rows
+            for offset, rows, future in list(pending_writes):
+                if not (wait or future.done()):
+                    continue
+                pending_writes.remove((offset, rows, future))
+                error = self.io_handler.collect(future)
+                if error is None:
+                    coordinator.complete(worker_id, offset)
+                    stored_rows += rows
+                else:
+                    print(f"Worker {worker_id} failed to write offset {offset}: {error}")
+                    coordinator.release(worker_id, offset)
+
+        while True:
+            settle_writes(wait=False)
+            lease = coordinator.claim(worker_id)
+            if lease is None:
+                if pending_writes:
+                    settle_writes(wait=True)
+                    continue
+                if coordinator.is_finished():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            offset, quantity = lease
+            try:
+                df = self._fetch_page(offset, quantity)
+            except Exception as e:
+                print(f"Worker {worker_id} failed to fetch offset {offset}: {e}")
+                coordinator.release(worker_id, offset)
+                continue
+
+            # Only write if the lease was not reassigned while the page was being fetched.
+            if not coordinator.renew(worker_id, offset):
+                print(f"Worker {worker_id} lost the lease on offset {offset}; discarding the page.")
+                continue
+
+            if df.empty:
+                coordinator.complete(worker_id, offset)
+            elif self.write_behind:
+                pending_writes.append(
+                    (offset, len(df), self.io_handler.submit_write(destination, df, f"part-{offset:012d}"))
+                )
+            else:
+                try:
+                    self.io_handler.write(destination, df, f"part-{offset:012d}")
+                except Exception:
+                    # Give the lease back right away instead of blocking the page until it expires.
+                    coordinator.release(worker_id, offset)
+                    raise
+                coordinator.complete(worker_id, offset)
+                stored_rows += len(df)
+
+        failed = coordinator.progress()["failed"]
+        if failed:
+            raise RuntimeError(f"{failed} page(s) could not be fetched after the maximum number of attempts.")
+        return stored_rows
+
+    def _fetch_page(self, offset: int, batch_size: int) -> pd.DataFrame:
+        """
+        Fetch and validate a single page of records.
+
+        Args:
+            offset (int): Offset of the first record of the page.
+            batch_size (int): Number of records in the page.
+
+        Returns:
+            pd.DataFrame: The valid records of the page, with their unique_id and processed_at columns.
+                Invalid records are quarantined when a dead-letter path is set.
+        """
+        self.params.update({"_quantity": batch_size, "_offset": offset})
+
+        data = self._fetch_with_retries()
+        if 'data' not in data:
+            raise ValueError("Unexpected API response structure.")
+
+        if self.dead_letter_path is None:
             self._validate_data(data)
+            records = data['data']
+        else:
+            records, rejected = partition_api_response(data)
+            if rejected:
+                self._quarantine(rejected, offset)
+
+        return self._to_dataframe(records)
+
+    def _to_dataframe(self, records) -> pd.DataFrame:
+        """
+        Build the raw DataFrame of a list of valid records.
+        """
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df
+
+        # df = pd.DataFrame([item.dict() for item in validated_data])
+        df['unique_id'] = df.apply(self.generate_unique_hash, axis=1)
+        df['processed_at'] = pd.Timestamp.now()
+
+        return df
+
+    def _quarantine(self, rejected, offset):
+        """
+        Write rejected records to the dead-letter dataset, with the reason and origin of each rejection.
+        The file is named after the offset, so a page refetched after its lease expired replaces the
+        rejects written by the first fetch instead of duplicating them.
+
+        Args:
+            rejected (list[dict]): Rejected records as returned by partition_api_response.
+            offset (int): Offset of the page the records belong to.
+        """
+        print(f"Quarantined {len(rejected)} invalid record(s) from offset {offset}.")
+        dead_letters = pd.DataFrame({
+            'record': [json.dumps(item['record'], default=str) for item in rejected],
+            'reason': [item['reason'] for item in rejected],
+            'offset': [offset + item['index'] for item in rejected],
+            'url': self.url,
+            'rejected_at': pd.Timestamp.now(),
+        })
+        self.dead_letter_io_handler.write(self.dead_letter_path, dead_letters, f"offset-{offset:012d}")
 
-            df = pd.DataFrame(data['data'])
+    def replay_dead_letters(self):
+        """
+        Validate the quarantined records again (e.g. after the validation rules were fixed), append the
+        records that are now valid to the output path and keep the others in the dead-letter dataset.
+
+        Returns:
+            tuple[int, int]: The number of replayed records and the number of records still rejected.
+        """
+        if self.dead_letter_path is None:
+            raise ValueError("No dead-letter path configured.")
+
+        try:
+            files = self.dead_letter_io_handler.list_files(self.dead_letter_path)
+        except ValueError:
+            # Nothing was quarantined yet.
+            return 0, 0
+        if not files:
+            return 0, 0
+        frames = [self.dead_letter_io_handler.read_table(self.dead_letter_path, files=[name]).to_pandas()
+                  for name in files]
+        dead_letters = pd.concat(frames, ignore_index=True)
+        file_of_row = pd.Series([name for name, frame in zip(files, frames) for _ in range(len(frame))])
+
+        records = [json.loads(record) for record in dead_letters['record']]
+        valid, rejected = partition_api_response({'data': records})
 
-            # df = pd.DataFrame([item.dict() for item in validated_data])
-            df['unique_id'] = df.apply(self.generate_unique_hash, axis=1)
-            df['processed_at'] = pd.Timestamp.now()
+        if valid:
+            if self.snapshot_log is not None:
+                staging_path = self.snapshot_log.begin(append=True)
+                self.io_handler.write(staging_path, self._to_dataframe(valid))
+                self.snapshot_log.commit(staging_path)
+            else:
+                self.io_handler.write(self.output_path, self._to_dataframe(valid))
 
-            self.io_handler.write(self.output_path, df)
+        rejected_rows = [item['index'] for item in rejected]
+        still_rejected = dead_letters.iloc[rejected_rows].copy()
+        still_rejected['reason'] = [item['reason'] for item in rejected]
+        still_rejected_files = file_of_row.iloc[rejected_rows].to_numpy()
+        self._rewrite_dead_letters(files, still_rejected, still_rejected_files)
 
+        return len(valid), len(rejected)
+
+
+    def _rewrite_dead_letters(self, files, still_rejected, still_rejected_files):
+        """
+        Replace each replayed dead-letter file with its records still rejected, or delete it if none
+        are left. The records are staged in a separate directory and renamed over the file, so a
+        crash leaves either the old or the new file; files quarantined during the replay are kept.
+        """
+        staging_path = os.path.join(self.dead_letter_path, f"_replay-{uuid.uuid4().hex}", "")
+        os.makedirs(staging_path)
+        try:
+            for name in files:
+                target_path = os.path.join(self.dead_letter_path, name)
+                remaining = still_rejected[still_rejected_files == name]
+                if remaining.empty:
+                    os.remove(target_path)
+                    continue
+                self.dead_letter_io_handler.write(
+                    staging_path, remaining.reset_index(drop=True), os.path.splitext(name)[0]
+                )
+                os.replace(os.path.join(staging_path, name), target_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
 
     def _validate_data(self, data):
         """
@@ -72,19 +331,30 @@ class ApiHandler:
 
     def _fetch_with_retries(self):
         """
-        Fetch data from the API with a retry policy.
+        Fetch data from the API with a retry policy, going through the response cache if one is set.
 
         Returns:
             dict: The JSON response from the API.
 
         Raises:
-            RuntimeError: If all retry attempts fail.
+            RuntimeError: If all retry attempts fail, or if the response is missing from a replay-only cache.
         """
+        if self.response_cache is not None:
+            cached = self.response_cache.get(self.url, self.params)
+            if cached is not None:
+                return cached
+            if self.response_cache.read_only:
+                raise RuntimeError(f"No recorded response for {self.url} with params {self.params} in replay mode.")
+
         for attempt in range(self.retries):
             try:
-                response = requests.get(self.url, params=self.params)
+                http = self.session if self.session is not None else requests
+                response = http.get(self.url, params=self.params)
                 response.raise_for_status()
-                return response.json()
+                data = response.json()
+                if self.response_cache is not None:
+                    self.response_cache.put(self.url, self.params, data)
+                return data
             except requests.RequestException as e:
                 if attempt < self.retries - 1:
                     wait_time = self.backoff_factor ** attempt
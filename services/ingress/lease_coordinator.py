@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import time
+
+
+class LeaseCoordinator:
+    """
+    File-based coordinator splitting an API offset space into leases shared by ingest workers.
+
+    Leases are stored in a SQLite database, so workers in different processes, or on different
+    hosts sharing the filesystem, can claim them. A claimed lease expires unless the worker renews
+    it; expired leases are handed to the next worker asking for one. Each lease moves through the
+    statuses pending -> claimed -> done, or ends as failed after `max_attempts` claims.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 300, max_attempts: int = 3):
+        """
+        Initialize the coordinator.
+
+        Args:
+            db_path (str): Path of the SQLite database holding the leases.
+            lease_seconds (float): Time a worker may hold a lease without renewing it.
+            max_attempts (int): Number of claims after which a lease that never completed is marked as failed.
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE, which takes
+        # the database write lock up front so two workers can never claim the same lease.
+        # The default rollback journal is kept because WAL does not work on network filesystems.
+        connection = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                "offset" INTEGER PRIMARY KEY,
+                quantity INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                owner TEXT,
+                expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        return connection
+
+    def plan(self, total_records: int, batch_size: int):
+        """
+        Replace any existing plan with one lease per page of the offset space.
+
+        Args:
+            total_records (int): Total number of records to fetch.
+            batch_size (int): Number of records fetched per lease.
+        """
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive integer.")
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM leases")
+            connection.executemany(
+                'INSERT INTO leases ("offset", quantity, status) VALUES (?, ?, \'pending\')',
+                [
+                    (offset, min(batch_size, total_records - offset))
+                    for offset in range(0, total_records, batch_size)
+                ],
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def claim(self, worker_id: str):
+        """
+        Claim the next pending or expired lease.
+
+        Args:
+            worker_id (str): Identifier of the claiming worker.
+
+        Returns:
+            tuple[int, int] | None: The (offset, quantity) of the claimed lease, or None if no lease is available.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Leases that expired after their last allowed attempt are given up.
+            connection.execute(
+                "UPDATE leases SET status = 'failed', owner = NULL "
+                "WHERE status = 'claimed' AND expires_at < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = connection.execute(
+                'SELECT "offset", quantity FROM leases '
+                "WHERE status = 'pending' OR (status = 'claimed' AND expires_at < ?) "
+                'ORDER BY "offset" LIMIT 1',
+                (now,),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE leases SET status = 'claimed', owner = ?, expires_at = ?, attempts = attempts + 1 "
+                    'WHERE "offset" = ?',
+                    (worker_id, now + self.lease_seconds, row[0]),
+                )
+            connection.execute("COMMIT")
+            return row
+        finally:
+            connection.close()
+
+    def _update_owned(self, sql: str, params: tuple) -> bool:
+        connection = self._connect()
+        try:
+            cursor = connection.execute(sql, params)
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    def renew(self, worker_id: str, offset: int) -> bool:
+        """
+        Extend a lease held by the worker.
+
+        Returns:
+            bool: False if the worker no longer holds the lease (it expired and was reassigned).
+        """
+        return self._update_owned(
+            "UPDATE leases SET expires_at = ? "
+            "WHERE \"offset\" = ? AND owner = ? AND status = 'claimed'",
+            (time.time() + self.lease_seconds, offset, worker_id),
+        )
+
+    def complete(self, worker_id: str, offset: int) -> bool:
+        """
+        Mark a lease held by the worker as done.
+
+        Returns:
+            bool: False if the worker no longer holds the lease.
+        """
+        return self._update_owned(
+            "UPDATE leases SET status = 'done', expires_at = NULL "
+            "WHERE \"offset\" = ? AND owner = ? AND status = 'claimed'",
+            (offset, worker_id),
+        )
+
+    def release(self, worker_id: str, offset: int) -> bool:
+        """
+        Give a lease back so another worker can claim it immediately, or mark it as failed
+        if it has used all its attempts.
+
+        Returns:
+            bool: False if the worker no longer holds the lease.
+        """
+        return self._update_owned(
+            "UPDATE leases SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, expires_at = NULL "
+            "WHERE \"offset\" = ? AND owner = ? AND status = 'claimed'",
+            (self.max_attempts, offset, worker_id),
+        )
+
+    def progress(self) -> dict:
+        """
+        Return the number of leases in each status.
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT status, COUNT(*) FROM leases GROUP BY status").fetchall()
+        finally:
+            connection.close()
+
+        counts = {"pending": 0, "claimed": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self) -> bool:
+        """
+        Return True once no lease is pending or claimed.
+        """
+        counts = self.progress()
+        return counts["pending"] == 0 and counts["claimed"] == 0
@@ -0,0 +1,66 @@
+import gzip
+import json
+from services.cache.disk_cache import DiskCache
+
+
+class ResponseCache:
+    """
+    On-disk cache of API responses, used to record responses and replay them later.
+
+    Responses are keyed by URL plus normalised query parameters and stored as gzip-compressed JSON.
+    In "record" mode, cached responses are returned and missing ones are fetched and stored.
+    In "replay" mode the cache is read-only: a missing response is an error instead of a request,
+    which makes reruns and benchmarks fully offline. Replaying never evicts: the TTL only applies
+    when recording.
+    """
+
+    MODES = ("record", "replay")
+
+    def __init__(self, cache_dir: str, mode: str = "record", ttl_seconds: float = None, max_bytes: int = None):
+        """
+        Initialize the response cache.
+
+        Args:
+            cache_dir (str): Directory where the responses are stored.
+            mode (str): "record" or "replay".
+            ttl_seconds (float): Responses older than this are evicted and refetched when recording.
+                Never expire when None.
+            max_bytes (int): Maximum total size of the stored responses; least recently used ones are evicted.
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported cache mode '{mode}'. Choose from: {', '.join(self.MODES)}")
+        self.mode = mode
+        # A replayed recording must stay as it was recorded, so replay ignores the TTL.
+        max_age_seconds = None if mode == "replay" else ttl_seconds
+        self.cache = DiskCache(cache_dir, max_bytes=max_bytes, max_age_seconds=max_age_seconds, suffix=".json.gz")
+
+    @property
+    def read_only(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        """
+        Build the cache key of a request. Parameters are sorted and their values converted to
+        strings, so {"_offset": 0} and {"_offset": "0"} map to the same response.
+        """
+        normalised_params = sorted((str(key), str(value)) for key, value in (params or {}).items())
+        return DiskCache.make_key(url, json.dumps(normalised_params))
+
+    def get(self, url: str, params: dict):
+        """
+        Return the cached JSON response of a request, or None on a miss.
+        """
+        body = self.cache.get(self.make_key(url, params))
+        if body is None:
+            return None
+        return json.loads(gzip.decompress(body))
+
+    def put(self, url: str, params: dict, response: dict):
+        """
+        Store the JSON response of a request. Ignored in replay mode.
+        """
+        if self.read_only:
+            return
+        body = gzip.compress(json.dumps(response).encode())
+        self.cache.put(self.make_key(url, params), body)
@@ -0,0 +1,67 @@
+import hashlib
+import os
+
+
+def fingerprint_paths(paths, storage_options: dict = None) -> str:
+    """
+    Compute a cheap content fingerprint for a set of files and/or directories.
+
+    The fingerprint is built from file names, sizes and modification times rather than
+    file contents, so it can be computed without reading the data.
+
+    Args:
+        paths (iterable[str]): Files or directories to fingerprint. Directories are walked recursively.
+            URLs (e.g. "s3://bucket/raw/") are fingerprinted from the object listing.
+        storage_options (dict): fsspec options (endpoint, credentials) of the object store holding the URLs.
+
+    Returns:
+        str: A hex digest that changes whenever a file is added, removed or modified.
+    """
+    digest = hashlib.sha256()
+
+    for path in sorted(paths):
+        digest.update(path.encode())
+
+        if "://" in path:
+            _update_with_objects(digest, path, storage_options)
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        elif os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    file_path = os.path.join(dir_path, file_name)
+                    stat = os.stat(file_path)
+                    relative_path = os.path.relpath(file_path, path)
+                    digest.update(f"|{relative_path}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        else:
+            digest.update(b"|missing")
+
+    return digest.hexdigest()
+
+
+def _update_with_objects(digest, url: str, storage_options: dict = None):
+    import fsspec  # Optional dependency, only needed for object store paths.
+
+    fs, path = fsspec.core.url_to_fs(url, **(storage_options or {}))
+    try:
+        entries = fs.find(path, detail=True)
+    except FileNotFoundError:
+        entries = {}
+    if not entries:
+        digest.update(b"|missing")
+    for name in sorted(entries):
+        entry = entries[name]
+        digest.update(f"|{name}|{object_version(entry)}".encode())
+
+
+def object_version(entry: dict) -> str:
+    """
+    Return a value identifying the version of an object from its fsspec listing entry:
+    its size and ETag, or modification time when the store has no ETag.
+    """
+    for field in ("ETag", "etag", "md5Hash", "mtime", "LastModified", "last_modified", "created"):
+        if entry.get(field) is not None:
+            return f"{entry.get('size')}-{entry[field]}"
+    return str(entry.get("size"))
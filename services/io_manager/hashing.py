@@ -0,0 +1,11 @@
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values) -> np.ndarray:
+    """
+    Hash values to unsigned 64-bit integers. Values are compared as strings, so 42 and "42" match.
+    hash_pandas_object uses a fixed key, so the hashes are stable across processes and runs, and
+    can be persisted (e.g. in index segments or sketches).
+    """
+    return pd.util.hash_pandas_object(pd.Series(values).astype(str), index=False).to_numpy(dtype=np.uint64)
@@ -1,17 +1,82 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+import pyarrow as pa
+from services.io_manager.fingerprint import fingerprint_paths
+
+
+_SQL_OPERATORS = {"=": "=", "==": "=", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=",
+                  "in": "IN", "not in": "NOT IN"}
+
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def filters_to_sql(filters) -> str:
+    """
+    Translate row filters in PyArrow's DNF format (a list of (column, op, value) predicates
+    combined with AND, or a list of such lists combined with OR) into a SQL condition.
+
+    Raises:
+        ValueError: If a predicate uses an unsupported operator.
+    """
+    disjunction = filters if filters and isinstance(filters[0], list) else [filters]
+    clauses = []
+    for conjunction in disjunction:
+        predicates = []
+        for column, op, value in conjunction:
+            operator = _SQL_OPERATORS.get(op.lower() if isinstance(op, str) else op)
+            if operator is None:
+                raise ValueError(f"Unsupported filter operator '{op}'.")
+            if operator in ("IN", "NOT IN"):
+                value = "(" + ", ".join(_sql_literal(item) for item in value) + ")"
+            else:
+                value = _sql_literal(value)
+            predicates.append('"' + column.replace('"', '""') + f'" {operator} {value}')
+        clauses.append("(" + " AND ".join(predicates) + ")")
+    return " OR ".join(clauses)
+
+
+def sample_clause(sample: float, seed: int = None) -> str:
+    """
+    Return the DuckDB USING SAMPLE clause keeping every row with probability `sample`.
+    """
+    return f"USING SAMPLE {sample * 100} PERCENT (bernoulli{'' if seed is None else f', {int(seed)}'})"
 
 
 class IOHandler(ABC):
     """
     Abstract base class for I/O handlers.
     Defines a standard interface for all I/O operations.
+
+    Besides the synchronous methods, every handler can write in the background: submit_write()
+    hands a write to a bounded pool of writer threads and returns a Future, blocking once
+    `max_pending_writes` writes are queued or running, and flush() waits for all of them. The
+    async variants aread/awrite/aclear run the same operations without blocking an event loop.
     """
 
+    # Writer threads and maximum number of queued or running background writes.
+    max_writers = 2
+    max_pending_writes = 4
+
     @abstractmethod
     def read(self, *args, **kwargs):
         """
         Read data from the specified source.
 
+        Implementations accept two optional keyword arguments and push them down to storage:
+        `columns` (list of column names to read) and `filters` (row predicates in PyArrow's
+        DNF format, e.g. [("email_provider", "==", "gmail.com")]). Handlers implementing
+        list_files() also accept `files`, the names of the files to read.
+
         Args:
             *args: Positional arguments for the specific implementation.
             **kwargs: Keyword arguments for the specific implementation.
@@ -61,6 +126,33 @@ class IOHandler(ABC):
         if not destination or not isinstance(destination, str):
             raise ValueError(f"Invalid destination: {destination}")
 
+    def fingerprint(self, source: str) -> str:
+        """
+        Return a cheap fingerprint of the data stored at the source, which changes whenever
+        the data is modified. The default implementation stats local files and directories.
+
+        Args:
+            source (str): The source to fingerprint.
+
+        Returns:
+            str: The fingerprint of the source.
+        """
+        self.validate_source(source)
+        return fingerprint_paths([source])
+
+    def list_files(self, source: str) -> list:
+        """
+        Return the sorted names of the data files stored at the source, e.g. to process only the
+        files added since a previous run. Handlers storing data as files implement it.
+
+        Args:
+            source (str): The source to list.
+
+        Returns:
+            list[str]: The file names, without their directory.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not list the files of a source.")
+
     @abstractmethod
     def clear(self, *args, **kwargs):
         """
@@ -78,7 +170,8 @@ class IOHandler(ABC):
     @abstractmethod
     def read_all(self, *args, **kwargs):
         """
-        Read all data from the specified source.
+        Read all data from the specified source. Accepts the same `columns` and `filters`
+        keyword arguments as read().
 
         Args:
             *args: Positional arguments for the specific implementation.
@@ -87,4 +180,168 @@ class IOHandler(ABC):
         Returns:
             None
         """
-        pass
\ No newline at end of file
+        pass
+
+    def read_table(self, *args, **kwargs) -> pa.Table:
+        """
+        Read all data from the specified source as an Arrow table.
+        The default implementation converts the result of read_all; handlers backed by
+        Arrow-compatible storage override it to avoid the conversion.
+
+        Args:
+            *args: Positional arguments for the specific implementation.
+            **kwargs: Keyword arguments for the specific implementation.
+
+        Returns:
+            pa.Table: The data as an Arrow table.
+        """
+        return pa.Table.from_pandas(self.read_all(*args, **kwargs), preserve_index=False)
+
+    def duckdb_source(self, connection, source: str, name: str, columns=None, filters=None, files=None,
+                      sample: float = None, seed: int = None):
+        """
+        Expose the data stored at the source to a DuckDB connection and return the SQL relation
+        reading it, or None if there is no data. The default implementation reads the data through
+        the handler, applying the pushdown, and registers it on the connection under `name`;
+        handlers whose files DuckDB can scan in place override it.
+
+        With `sample`, the relation is a Bernoulli sample keeping every row with that probability.
+        The default implementation samples after reading; handlers that can skip whole blocks of
+        their files read only part of them.
+
+        Args:
+            connection: DuckDB connection or cursor the relation is used on.
+            source (str): The source to read.
+            name (str): Name the data is registered under, unique on the connection. The caller
+                unregisters it once done.
+            columns (list[str]): Columns to read. Defaults to all columns.
+            filters (list): Row filters in PyArrow's DNF format.
+            files (list[str]): Names of the files to read. Defaults to all files of the source.
+            sample (float): Fraction of the rows to keep, between 0 (excluded) and 1. All rows when None.
+            seed (int): Seed making the sample repeatable.
+
+        Returns:
+            str: The SQL relation, or None.
+        """
+        read_options = {
+            key: value for key, value in (("columns", columns), ("filters", filters), ("files", files))
+            if value is not None
+        }
+        try:
+            table = self.read_table(source, **read_options)
+        except FileNotFoundError:
+            return None
+        connection.register(name, table)
+        if sample is None:
+            return name
+        return f"(SELECT * FROM {name} {sample_clause(sample, seed)})"
+
+    def _writer_state(self):
+        # Created lazily, since subclasses do not call IOHandler.__init__, and dropped when pickled.
+        state = self.__dict__.get("_writer")
+        if state is None:
+            state = {
+                "executor": ThreadPoolExecutor(max_workers=self.max_writers, thread_name_prefix="io-writer"),
+                "slots": threading.BoundedSemaphore(self.max_pending_writes),
+                "pending": set(),
+                "lock": threading.Lock(),
+            }
+            self.__dict__["_writer"] = state
+        return state
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_writer", None)
+        return state
+
+    def submit_write(self, *args, **kwargs) -> Future:
+        """
+        Write data in a background writer thread, with the same arguments as write().
+        Blocks while `max_pending_writes` writes are already queued or running, so producers
+        cannot run ahead of the disk by more than that many batches.
+
+        Returns:
+            Future: Completes when the data is written. Errors are also raised by flush().
+        """
+        state = self._writer_state()
+        state["slots"].acquire()
+        try:
+            future = state["executor"].submit(self.write, *args, **kwargs)
+        except BaseException:
+            state["slots"].release()
+            raise
+
+        with state["lock"]:
+            state["pending"].add(future)
+        future.add_done_callback(lambda done: self._write_done(state, done))
+        return future
+
+    @staticmethod
+    def _write_done(state, future: Future):
+        state["slots"].release()
+        # Failed writes are kept until flush() or collect() reports them.
+        if future.exception() is None:
+            with state["lock"]:
+                state["pending"].discard(future)
+
+    def collect(self, future: Future):
+        """
+        Wait for a write returned by submit_write() and take over its outcome: flush() no longer
+        raises its error, e.g. because the caller handles it itself.
+
+        Returns:
+            Exception: The error raised by the write, or None if it succeeded.
+        """
+        error = future.exception()
+        state = self.__dict__.get("_writer")
+        if state is not None:
+            with state["lock"]:
+                state["pending"].discard(future)
+        return error
+
+    def flush(self):
+        """
+        Wait until every write submitted so far is on disk. Call it at stage boundaries,
+        before the next stage reads the destination.
+
+        Raises:
+            Exception: The first error raised by a background write, after all of them finished.
+        """
+        state = self.__dict__.get("_writer")
+        if state is None:
+            return
+
+        with state["lock"]:
+            pending, state["pending"] = state["pending"], set()
+        errors = [future.exception() for future in pending]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+
+    async def aread(self, *args, **kwargs):
+        """
+        Asynchronously iterate over the batches returned by read(). Each batch is read in a worker thread.
+        """
+        batches = iter(self.read(*args, **kwargs))
+        end = object()
+        while True:
+            batch = await asyncio.to_thread(next, batches, end)
+            if batch is end:
+                break
+            yield batch
+
+    async def awrite(self, *args, **kwargs):
+        """
+        Asynchronously write data through the background writers, with the same arguments as write().
+        Waiting for a free writer slot does not block the event loop.
+        """
+        future = await asyncio.to_thread(self.submit_write, *args, **kwargs)
+        await asyncio.wrap_future(future)
+
+    async def aclear(self, *args, **kwargs):
+        """
+        Asynchronously clear the destination, with the same arguments as clear(), after the
+        pending background writes finished.
+        """
+        await asyncio.to_thread(self.flush)
+        await asyncio.to_thread(self.clear, *args, **kwargs)
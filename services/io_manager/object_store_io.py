@@ -0,0 +1,308 @@
+import hashlib
+import posixpath
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from services.cache.disk_cache import DiskCache
+from services.io_manager.fingerprint import object_version
+from services.io_manager.io_handler import IOHandler
+from services.io_manager.parquet_io import ParquetIO
+
+try:
+    import fsspec
+except ImportError:  # Optional dependency: pip install fsspec (and s3fs for S3).
+    fsspec = None
+
+
+class ObjectStoreIO(IOHandler):
+    """
+    Parquet I/O handler for object stores (S3, GCS, Azure, MinIO...) and any other fsspec filesystem.
+
+    Objects are read as fixed-size blocks fetched with concurrent range requests: first the
+    footer blocks of a group of files, then the blocks holding the column chunks the read needs,
+    so only the projected columns are downloaded. Blocks can be kept in a local DiskCache,
+    keyed by the object's version (ETag or size and modification time), so rereading unchanged
+    objects does not hit the network. Files are encoded in memory and uploaded as one object;
+    objects larger than `part_size` are sent as a multipart upload whose parts are uploaded
+    concurrently. Background writes (submit_write) upload up to `max_concurrency` objects at once.
+
+    Requires the optional fsspec dependency, plus the filesystem's package (e.g. s3fs for s3:// URLs).
+    """
+
+    file_extension = ".parquet"
+
+    def __init__(self, profile: str = "default", storage_options: dict = None, max_concurrency: int = 8,
+                 block_size: int = 4 * 1024 * 1024, part_size: int = 16 * 1024 * 1024, cache_dir: str = None,
+                 cache_max_bytes: int = 1024 * 1024 * 1024, **options):
+        """
+        Args:
+            profile (str): Name of the Parquet write profile (see parquet_profiles.WRITE_PROFILES).
+            storage_options (dict): Options of the fsspec filesystem, e.g. {"endpoint_url": ..., "key": ...}.
+            max_concurrency (int): Maximum number of concurrent range requests, background uploads and
+                parts of a multipart upload.
+            block_size (int): Size of the blocks objects are read and cached in.
+            part_size (int): Objects larger than this are uploaded in parts of this size.
+            cache_dir (str): Local directory of the block cache. Blocks are not cached when None.
+            cache_max_bytes (int): Maximum size of the block cache.
+            **options: Write options overriding the ones of the profile.
+        """
+        if fsspec is None:
+            raise ImportError("ObjectStoreIO requires fsspec. Install it with `pip install fsspec`.")
+        self.encoder = ParquetIO(profile=profile, **options)
+        self.storage_options = storage_options or {}
+        self.max_concurrency = max_concurrency
+        self.max_writers = max_concurrency
+        self.max_pending_writes = 2 * max_concurrency
+        self.block_size = block_size
+        self.part_size = part_size
+        self.block_cache = DiskCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+
+    def _filesystem(self, url: str):
+        """
+        Return the filesystem of a URL and the path of the URL inside it, without a trailing slash.
+        """
+        fs, path = fsspec.core.url_to_fs(url, **self.storage_options)
+        return fs, path.rstrip("/")
+
+    def _list_files(self, fs, path: str) -> list:
+        """
+        List the Parquet objects directly under a prefix, with their size and version.
+        """
+        try:
+            entries = fs.ls(path, detail=True)
+        except FileNotFoundError:
+            return []
+        files = [
+            entry for entry in entries
+            if entry.get("type") == "file" and entry["name"].endswith(self.file_extension)
+        ]
+        return sorted(files, key=lambda entry: entry["name"])
+
+    def _fetch_block(self, fs, entry: dict, index: int) -> bytes:
+        key = None
+        if self.block_cache is not None:
+            key = DiskCache.make_key(entry["name"], object_version(entry), self.block_size, index)
+            cached = self.block_cache.get(key)
+            if cached is not None:
+                return cached
+
+        start = index * self.block_size
+        end = min(start + self.block_size, entry["size"])
+        block = fs.cat_file(entry["name"], start=start, end=end)
+        if key is not None:
+            self.block_cache.put(key, block)
+        return block
+
+    def _prefetch(self, executor, fs, requests):
+        """
+        Fetch (entry, blocks, indexes) requests concurrently, skipping blocks already fetched.
+        """
+        missing = [
+            (entry, blocks, index) for entry, blocks, indexes in requests for index in indexes if index not in blocks
+        ]
+        fetched = executor.map(lambda request: self._fetch_block(fs, request[0], request[2]), missing)
+        for (_, blocks, index), block in zip(missing, fetched):
+            blocks[index] = block
+
+    def _blocks_of_range(self, start: int, end: int) -> range:
+        return range(start // self.block_size, (max(end, start + 1) - 1) // self.block_size + 1)
+
+    def _assemble(self, entry: dict, blocks: dict) -> pa.Buffer:
+        """
+        Lay the fetched blocks of an object out at their offsets in a buffer of the object's size.
+        Parts that were not fetched stay zero; they are never allocated in memory by the OS.
+        """
+        buffer = bytearray(entry["size"])
+        for index, block in blocks.items():
+            start = index * self.block_size
+            buffer[start:start + len(block)] = block
+        return pa.py_buffer(buffer)
+
+    def _read_tables(self, fs, entries: list, columns=None, filters=None):
+        """
+        Read a group of objects, fetching their footers and then their column chunks concurrently.
+        """
+        files = [(entry, {}) for entry in entries]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            # An object ends with its footer, the footer length (4 bytes) and "PAR1". The last block
+            # usually holds the whole footer; larger footers are completed in a second round.
+            self._prefetch(executor, fs, [
+                (entry, blocks, self._blocks_of_range(max(0, entry["size"] - 8), entry["size"]))
+                for entry, blocks in files
+            ])
+            footer_requests = []
+            for entry, blocks in files:
+                trailer = self._assemble(entry, blocks)[entry["size"] - 8:entry["size"] - 4]
+                footer_start = max(0, entry["size"] - 8 - int.from_bytes(trailer.to_pybytes(), "little"))
+                footer_requests.append((entry, blocks, self._blocks_of_range(footer_start, entry["size"])))
+            self._prefetch(executor, fs, footer_requests)
+
+            chunk_requests = []
+            for entry, blocks in files:
+                metadata = pq.read_metadata(pa.BufferReader(self._assemble(entry, blocks)))
+                indexes = set()
+                for row_group in range(metadata.num_row_groups):
+                    row_group_metadata = metadata.row_group(row_group)
+                    for column in range(row_group_metadata.num_columns):
+                        chunk = row_group_metadata.column(column)
+                        if columns is not None and chunk.path_in_schema.split(".")[0] not in columns:
+                            continue
+                        start = chunk.data_page_offset
+                        if chunk.has_dictionary_page and chunk.dictionary_page_offset is not None:
+                            start = min(start, chunk.dictionary_page_offset)
+                        indexes.update(self._blocks_of_range(start, start + chunk.total_compressed_size))
+                chunk_requests.append((entry, blocks, sorted(indexes)))
+            self._prefetch(executor, fs, chunk_requests)
+
+            tables = []
+            for entry, blocks in files:
+                try:
+                    source = pa.BufferReader(self._assemble(entry, blocks))
+                    table = pq.read_table(source, columns=columns, filters=filters)
+                except (pa.ArrowException, OSError):
+                    # The reader needed bytes outside the footer and column chunks: fetch the whole
+                    # object and read it again.
+                    self._prefetch(executor, fs, [(entry, blocks, self._blocks_of_range(0, entry["size"]))])
+                    source = pa.BufferReader(self._assemble(entry, blocks))
+                    table = pq.read_table(source, columns=columns, filters=filters)
+                tables.append(table)
+        return tables
+
+    def _select_files(self, fs, path: str, files=None) -> list:
+        entries = self._list_files(fs, path)
+        if files is None:
+            return entries
+        wanted = set(files)
+        return [entry for entry in entries if posixpath.basename(entry["name"]) in wanted]
+
+    def list_files(self, source_folder: str) -> list:
+        fs, path = self._filesystem(source_folder)
+        return [posixpath.basename(entry["name"]) for entry in self._list_files(fs, path)]
+
+    def read(self, source_folder: str, batch_size: int = 1000, *args, columns=None, filters=None, files=None,
+             **kwargs):
+        """
+        Read the Parquet objects under a prefix, yielding each object as a Pandas DataFrame.
+        Objects are fetched in groups of `max_concurrency`.
+
+        Args:
+            source_folder (str): URL of the prefix, e.g. "s3://bucket/data/raw/".
+            batch_size (int): Kept for compatibility with the IOHandler contract. Not used.
+            columns (list[str]): Columns to read. Only their column chunks are downloaded.
+            filters (list): Row filters in PyArrow's DNF format.
+            files (list[str]): Names of the objects to read. Defaults to all objects under the prefix.
+
+        Yields:
+            pd.DataFrame: The data of each object.
+        """
+        fs, path = self._filesystem(source_folder)
+        entries = self._select_files(fs, path, files)
+        for start in range(0, len(entries), self.max_concurrency):
+            for table in self._read_tables(fs, entries[start:start + self.max_concurrency], columns, filters):
+                yield table.to_pandas()
+
+    def read_table(self, source_folder: str, *args, columns=None, filters=None, files=None, **kwargs) -> pa.Table:
+        """
+        Read and combine the Parquet objects under a prefix (or the named `files` among them)
+        into a single Arrow table.
+
+        Raises:
+            FileNotFoundError: If no Parquet objects are found under the prefix.
+        """
+        fs, path = self._filesystem(source_folder)
+        entries = self._select_files(fs, path, files)
+        if not entries:
+            raise FileNotFoundError(f"No Parquet files found under: '{source_folder}'")
+
+        tables = []
+        for start in range(0, len(entries), self.max_concurrency):
+            tables.extend(self._read_tables(fs, entries[start:start + self.max_concurrency], columns, filters))
+        return pa.concat_tables(tables, promote_options="default")
+
+    def read_all(self, source_folder: str, *args, columns=None, filters=None, **kwargs) -> pd.DataFrame:
+        """
+        Read and combine the Parquet objects under a prefix into a single Pandas DataFrame.
+
+        Raises:
+            FileNotFoundError: If no Parquet objects are found under the prefix.
+        """
+        return self.read_table(source_folder, columns=columns, filters=filters).to_pandas()
+
+    def write(self, destination: str, data: pd.DataFrame, file_name: str = None, *args, row_group_size: int = None,
+              **kwargs):
+        """
+        Encode a DataFrame with the write profile and upload it as one object under the prefix.
+
+        Args:
+            destination (str): URL of the prefix.
+            data (pd.DataFrame): The data to write.
+            file_name (str): Name of the object without extension. A random name is used if omitted.
+            row_group_size (int): Row-group size of this object, overriding the one of the profile.
+        """
+        if file_name is None:
+            file_name = uuid.uuid4()
+        fs, path = self._filesystem(destination)
+        object_path = posixpath.join(path, f"{file_name}{self.file_extension}")
+
+        payload = self.encoder.encode(data, row_group_size)
+        if payload.size <= self.part_size:
+            fs.pipe_file(object_path, payload.to_pybytes())
+        else:
+            self._upload_in_parts(fs, object_path, payload)
+
+    def _upload_in_parts(self, fs, object_path: str, payload: pa.Buffer):
+        """
+        Upload an object as a multipart upload of `part_size` parts, up to `max_concurrency` parts at
+        once. Filesystems without S3's multipart calls (s3fs's call_s3) are sent the parts one after
+        the other through a file stream, which uploads them as a multipart upload where supported.
+        """
+        view = memoryview(payload)
+        parts = [view[start:start + self.part_size] for start in range(0, len(view), self.part_size)]
+        if not hasattr(fs, "call_s3"):
+            with fs.open(object_path, "wb", block_size=self.part_size) as f:
+                for part in parts:
+                    f.write(part)
+            return
+
+        bucket, key, _ = fs.split_path(object_path)
+        upload_id = fs.call_s3("create_multipart_upload", Bucket=bucket, Key=key)["UploadId"]
+
+        def upload_part(number, part):
+            response = fs.call_s3(
+                "upload_part", Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=bytes(part)
+            )
+            return {"PartNumber": number, "ETag": response["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                uploaded = list(executor.map(upload_part, range(1, len(parts) + 1), parts))
+        except Exception:
+            fs.call_s3("abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id)
+            raise
+        fs.call_s3(
+            "complete_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": uploaded}
+        )
+        fs.invalidate_cache(object_path)
+
+    def clear(self, destination: str, *args, **kwargs):
+        """
+        Delete the Parquet objects under the prefix, in one bulk request where the store supports it.
+        """
+        fs, path = self._filesystem(destination)
+        names = [entry["name"] for entry in self._list_files(fs, path)]
+        if names:
+            fs.rm(names)
+        print(f"All files in '{destination}' have been deleted.")
+
+    def fingerprint(self, source: str) -> str:
+        """
+        Fingerprint the objects under the prefix from their listing (names, sizes and versions).
+        """
+        fs, path = self._filesystem(source)
+        digest = hashlib.sha256(source.encode())
+        for entry in self._list_files(fs, path):
+            digest.update(f"|{entry['name']}|{object_version(entry)}".encode())
+        return digest.hexdigest()
@@ -1,7 +1,16 @@
+import numpy as np
 import pandas as pd
-# import pyarrow as pa
-# import pyarrow.parquet as pq
-from services.io_manager.io_handler import IOHandler
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import duckdb
+from services.io_manager.io_handler import IOHandler, filters_to_sql, sample_clause
+from services.io_manager.parquet_profiles import (
+    duckdb_supports_bloom_filters,
+    duckdb_unsupported_options,
+    get_write_profile,
+)
+from services.io_manager.point_index import PointIndex
 import uuid
 import os
 
@@ -10,49 +19,213 @@ class ParquetIO(IOHandler):
     Parquet I/O handler for reading from and writing to Parquet files using PyArrow.
     """
 
-    def read(self, source_folder: str, batch_size: int = 1000, *args, **kwargs):
+    file_extension = ".parquet"
+
+    # Row-group sampling of duckdb_source: row groups are read with this many times the sampling
+    # fraction, and only when at least this many of them are expected to be read.
+    sample_row_group_oversampling = 4
+    min_sampled_row_groups = 8
+
+    def __init__(self, profile: str = "default", index_columns=None, **options):
+        """
+        Args:
+            profile (str): Name of the write profile (see parquet_profiles.WRITE_PROFILES).
+            index_columns (tuple[str]): Key columns added to the destination's PointIndex after every
+                write, e.g. ("unique_id", "id"). No index is maintained when None.
+            **options: Write options overriding the ones of the profile (e.g. row_group_size=10000).
+
+        Raises:
+            ValueError: If the profile requests Bloom filters, which are written with DuckDB, together
+                with options DuckDB cannot honour (see parquet_profiles.duckdb_unsupported_options).
+        """
+        self.profile = profile
+        self.index_columns = tuple(index_columns) if index_columns else None
+        self.write_options = get_write_profile(profile, **options)
+        if self._writes_with_duckdb():
+            unsupported = duckdb_unsupported_options(self.write_options)
+            if unsupported:
+                raise ValueError(
+                    f"Parquet write profile '{profile}' requests Bloom filters, which are written with DuckDB, "
+                    f"but DuckDB cannot honour: {', '.join(unsupported)}."
+                )
+
+    def _writes_with_duckdb(self) -> bool:
+        return bool(self.write_options.get("bloom_filter_columns")) and duckdb_supports_bloom_filters()
+
+    def point_index(self, dataset_dir: str):
+        """
+        Return the PointIndex the handler maintains for a dataset directory, or None if indexing is disabled.
+        """
+        if self.index_columns is None:
+            return None
+        return PointIndex(dataset_dir, self.index_columns)
+
+    def list_files(self, source_folder: str) -> list:
+        if not os.path.isdir(source_folder):
+            raise ValueError(f"The provided source path '{source_folder}' is not a valid directory.")
+        return sorted(f for f in os.listdir(source_folder) if f.endswith('.parquet'))
+
+    def read(self, source_folder: str, batch_size: int = 1000, *args, columns=None, filters=None, files=None,
+             **kwargs):
             """
             Read data from all Parquet files in a directory in batches, yielding each batch as a Pandas DataFrame.
+            Files are streamed, so only one batch of a file is decoded at a time. Batches do not span files.
 
             Args:
                 source_folder (str): Path to the folder containing Parquet files.
-                batch_size (int): The number of rows to read in each batch. Not using it this class. Defaults to 1000.
+                batch_size (int): The maximum number of rows of a batch. Defaults to 1000.
+                columns (list[str]): Columns to read. Other columns are not read or decoded. Defaults to all columns.
+                filters (list): Row filters in PyArrow's DNF format, e.g. [("country", "==", "Germany")].
+                    Row groups whose statistics exclude the filters are skipped.
+                files (list[str]): Names of the files to read. Defaults to all files of the directory.
             
             Yields:
-                pd.DataFrame: A batch of data from each Parquet file in the directory.
+                pd.DataFrame: A batch of data from a Parquet file in the directory.
             """
             # Ensure source_folder is a directory
             if not os.path.isdir(source_folder):
                 raise ValueError(f"The provided source path {source_folder} is not a valid directory.")
 
             # List all Parquet files in the directory
-            parquet_files = [f for f in os.listdir(source_folder) if f.endswith('.parquet')]
-            
+            parquet_files = self.list_files(source_folder) if files is None else files
+            expression = pq.filters_to_expression(filters) if filters else None
+
             # Iterate over each Parquet file
             for parquet_file in parquet_files:
-                file_path = os.path.join(source_folder, parquet_file)
-                
-                # Open the Parquet file
-                df = pd.read_parquet(file_path)
+                dataset = ds.dataset(os.path.join(source_folder, parquet_file), format="parquet")
 
-                    # Yield the DataFrame as a batch
-                yield df
+                # Yield the file batch by batch
+                for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+                    if batch.num_rows:
+                        yield batch.to_pandas()
 
-    def write(self, destination: str, data: pd.DataFrame, file_name: str = None, *args, **kwargs):
+    def write(self, destination: str, data: pd.DataFrame, file_name: str = None, *args, row_group_size: int = None,
+              **kwargs):
         """
-        Write a Pandas DataFrame to a Parquet file using PyArrow.
+        Write a Pandas DataFrame to a Parquet file using the options of the handler's write profile.
+        Profiles requesting Bloom filters are written with DuckDB when it supports them.
+        The file is added to the destination's point index when index_columns are set.
 
         Args:
             data (pd.DataFrame): The data to write.
             destination (str): Path to the output Parquet file.
+            row_group_size (int): Row-group size of this file, overriding the one of the profile.
 
         Returns:
             None
         """
         if file_name is None:
             file_name = uuid.uuid4()
-        data.to_parquet(destination + f"{file_name}.parquet")
+        file_path = destination + f"{file_name}.parquet"
+
+        if self._writes_with_duckdb():
+            self._write_with_duckdb(file_path, data, row_group_size)
+        else:
+            self._write_with_pyarrow(file_path, data, row_group_size)
+
+        index = self.point_index(destination)
+        if index is not None:
+            index.add(file_path)
+
+    def duckdb_source(self, connection, source: str, name: str, columns=None, filters=None, files=None,
+                      sample: float = None, seed: int = None):
+        """
+        Return a read_parquet relation scanning the files in place, so DuckDB reads them with all
+        cores, with the filters translated into its WHERE clause.
+
+        Samples skip whole row groups: each one is read with probability
+        `sample_row_group_oversampling` times `sample`, and its rows are then kept with the remaining
+        probability, so every row is still kept with probability `sample` while only the selected row
+        groups are read. Rows of a row group are then sampled together, so the sample is less spread
+        than a row-level one; inputs with too few row groups to select at least
+        `min_sampled_row_groups` of them are read whole and sampled row by row.
+        """
+        if not os.path.isdir(source):
+            return None
+        paths = [os.path.join(source, file_name) for file_name in (self.list_files(source) if files is None else files)]
+        if not paths:
+            return None
+        projection = ", ".join('"' + column.replace('"', '""') + '"' for column in columns) if columns else "*"
+        where = f" WHERE {filters_to_sql(filters)}" if filters else ""
+
+        if sample is not None:
+            fragments = [
+                row_group for fragment in ds.dataset(paths, format="parquet").get_fragments()
+                for row_group in fragment.split_by_row_group()
+            ]
+            row_group_fraction = min(1.0, self.sample_row_group_oversampling * sample)
+            if row_group_fraction < 1 and len(fragments) * row_group_fraction >= self.min_sampled_row_groups:
+                rng = np.random.default_rng(seed)
+                selected = [fragment for fragment in fragments if rng.random() < row_group_fraction]
+                schema = pa.unify_schemas([fragment.physical_schema for fragment in fragments])
+                connection.register(name, ds.FileSystemDataset(selected, schema, ds.ParquetFileFormat()))
+                rows = sample_clause(sample / row_group_fraction, seed)
+                return f"(SELECT {projection} FROM {name}{where} {rows})"
+
+        file_list = ", ".join("'" + path.replace("'", "''") + "'" for path in paths)
+        # Partition directories such as config=<id>/ must not add a column to the data.
+        scan = f"read_parquet([{file_list}], union_by_name = true, hive_partitioning = false)"
+        rows = "" if sample is None else f" {sample_clause(sample, seed)}"
+        return f"(SELECT {projection} FROM {scan}{where}{rows})"
+
+    def encode(self, data: pd.DataFrame, row_group_size: int = None) -> pa.Buffer:
+        """
+        Encode a DataFrame as a Parquet file in memory with the handler's write profile, for
+        handlers that upload the bytes themselves. Bloom filters are not written on this path.
+        """
+        sink = pa.BufferOutputStream()
+        self._write_with_pyarrow(sink, data, row_group_size)
+        return sink.getvalue()
+
+    def _write_with_pyarrow(self, sink, data: pd.DataFrame, row_group_size: int = None):
+        options = self.write_options
+        table = pa.Table.from_pandas(data)
+        pq.write_table(
+            table,
+            sink,
+            compression=options.get("compression", "snappy"),
+            compression_level=options.get("compression_level"),
+            row_group_size=row_group_size or options.get("row_group_size"),
+            use_dictionary=options.get("use_dictionary", True),
+            write_statistics=options.get("write_statistics", True),
+            write_page_index=options.get("write_page_index", False),
+        )
 
+    def duckdb_copy_options(self, row_group_size: int = None) -> str:
+        """
+        Return the options of a DuckDB `COPY ... TO` statement writing Parquet files with the
+        handler's write profile, so SQL engines can write files this handler would have written.
+        Bloom filters are only requested when the profile asks for them and DuckDB supports them.
+        DuckDB adds one to every dictionary-encoded column, and gives up on the dictionary of a column
+        with many distinct values: the dictionary limit is then raised to the row-group size, so that
+        high-cardinality columns such as unique_id get a Bloom filter too. The options DuckDB cannot honour
+        (see parquet_profiles.duckdb_unsupported_options) are left to its defaults.
+        `row_group_size` overrides the row-group size of the profile.
+        """
+        options = self.write_options
+        row_group_size = row_group_size or options.get("row_group_size", 122880)
+        compression = options.get("compression", "snappy")
+        copy_options = {
+            "FORMAT": "parquet",
+            "COMPRESSION": "uncompressed" if compression == "none" else compression,
+            "ROW_GROUP_SIZE": row_group_size,
+        }
+        if options.get("compression_level") is not None:
+            copy_options["COMPRESSION_LEVEL"] = options["compression_level"]
+        if options.get("bloom_filter_columns") and duckdb_supports_bloom_filters():
+            copy_options["BLOOM_FILTER_FALSE_POSITIVE_RATIO"] = options.get("bloom_filter_fpp", 0.01)
+            copy_options["DICTIONARY_SIZE_LIMIT"] = row_group_size
+
+        return ", ".join(f"{key} {value}" for key, value in copy_options.items())
+
+    def _write_with_duckdb(self, file_path: str, data: pd.DataFrame, row_group_size: int = None):
+        """
+        Write through DuckDB, which, unlike PyArrow, can write Bloom filters.
+        """
+        escaped_path = file_path.replace("'", "''")
+        with duckdb.connect() as connection:
+            connection.register("data", data)
+            connection.execute(f"COPY data TO '{escaped_path}' ({self.duckdb_copy_options(row_group_size)})")
 
     def clear(self, destination: str, *args, **kwargs):
         """
@@ -76,14 +249,20 @@ class ParquetIO(IOHandler):
             if os.path.isfile(file_path):
                 os.remove(file_path)
 
+        index = self.point_index(destination)
+        if index is not None:
+            index.clear()
+
         print(f"All files in '{destination}' have been deleted.")
 
-    def read_all(self, source_folder: str, *args, **kwargs):
+    def read_all(self, source_folder: str, *args, columns=None, filters=None, **kwargs):
         """
         Read and combine all Parquet files in a directory into a single Pandas DataFrame.
 
         Args:
             source_folder (str): Path to the folder containing Parquet files.
+            columns (list[str]): Columns to read. Defaults to all columns.
+            filters (list): Row filters in PyArrow's DNF format, used to skip row groups and rows.
         
         Returns:
             pd.DataFrame: A single DataFrame containing all the data from the Parquet files in the directory.
@@ -107,8 +286,39 @@ class ParquetIO(IOHandler):
         all_data = []
         for parquet_file in parquet_files:
             file_path = os.path.join(source_folder, parquet_file)
-            df = pd.read_parquet(file_path)
+            df = pd.read_parquet(file_path, columns=columns, filters=filters)
             all_data.append(df)
 
         # Concatenate all DataFrames and return
         return pd.concat(all_data, ignore_index=True)
+
+    def read_table(self, source_folder: str, *args, columns=None, filters=None, files=None, **kwargs) -> pa.Table:
+        """
+        Read and combine all Parquet files in a directory into a single Arrow table,
+        skipping the conversion to Pandas.
+
+        Args:
+            source_folder (str): Path to the folder containing Parquet files.
+            columns (list[str]): Columns to read. Defaults to all columns.
+            filters (list): Row filters in PyArrow's DNF format, used to skip row groups and rows.
+            files (list[str]): Names of the files to read. Defaults to all files of the directory.
+
+        Returns:
+            pa.Table: A single table containing all the data from the Parquet files in the directory.
+
+        Raises:
+            ValueError: If the source path is not a valid directory.
+            FileNotFoundError: If no Parquet files are found in the directory.
+        """
+        if not os.path.isdir(source_folder):
+            raise ValueError(f"The provided source path '{source_folder}' is not a valid directory.")
+
+        parquet_files = self.list_files(source_folder) if files is None else list(files)
+        if not parquet_files:
+            raise FileNotFoundError(f"No Parquet files found in the directory: '{source_folder}'")
+
+        tables = [
+            pq.read_table(os.path.join(source_folder, f), columns=columns, filters=filters)
+            for f in parquet_files
+        ]
+        return pa.concat_tables(tables, promote_options="default")
@@ -0,0 +1,170 @@
+import os
+import time
+from tempfile import TemporaryDirectory
+import duckdb
+import pandas as pd
+
+# Named Parquet write profiles. Every option is optional:
+# - compression: codec ("snappy", "lz4", "zstd", "gzip", "brotli" or "none").
+# - compression_level: codec level, for the codecs that support one.
+# - row_group_size: maximum number of rows per row group.
+# - use_dictionary: dictionary-encode columns (True, False, or a list of column names).
+# - write_statistics: write min/max statistics used to skip row groups on read.
+# - write_page_index: write the column and offset indexes used to skip pages on read.
+# - bloom_filter_columns: columns that should get a Bloom filter, for fast point lookups.
+#   Written by DuckDB, which cannot honour every option (see duckdb_unsupported_options).
+# - bloom_filter_fpp: target false positive probability of the Bloom filters.
+WRITE_PROFILES = {
+    # Same output as DataFrame.to_parquet with its defaults.
+    "default": {
+        "compression": "snappy",
+    },
+    # Cheapest encoding for data that is written once and read once by the next stage.
+    "fast-raw": {
+        "compression": "lz4",
+        "row_group_size": 128 * 1024,
+        "use_dictionary": False,
+        "write_statistics": False,
+    },
+    "uncompressed": {
+        "compression": "none",
+        "use_dictionary": False,
+    },
+    # Balanced encoding for data that is scanned and filtered repeatedly, with Bloom filters for
+    # point lookups by unique_id from engines that do not use the layer's point index.
+    "compact-intermediate": {
+        "compression": "zstd",
+        "compression_level": 3,
+        "row_group_size": 122880,
+        "use_dictionary": True,
+        "write_statistics": True,
+        "bloom_filter_columns": ["unique_id", "country"],
+        "bloom_filter_fpp": 0.01,
+    },
+    # Smallest files for long-lived, consumer-facing tables.
+    "compact-mart": {
+        "compression": "zstd",
+        "compression_level": 19,
+        "use_dictionary": True,
+        "write_statistics": True,
+        "write_page_index": True,
+    },
+}
+
+
+def get_write_profile(profile: str, **overrides) -> dict:
+    """
+    Return the options of a named write profile, updated with the given overrides.
+
+    Args:
+        profile (str): Name of the profile (a key of WRITE_PROFILES).
+        **overrides: Options replacing the ones of the profile (e.g. row_group_size=10000).
+
+    Returns:
+        dict: The write options.
+
+    Raises:
+        ValueError: If the profile does not exist.
+    """
+    if profile not in WRITE_PROFILES:
+        raise ValueError(f"Unknown Parquet write profile '{profile}'. Choose from: {', '.join(WRITE_PROFILES)}")
+    return {**WRITE_PROFILES[profile], **overrides}
+
+
+def duckdb_supports_bloom_filters() -> bool:
+    """
+    DuckDB writes Parquet Bloom filters from version 1.2 on. PyArrow cannot write them.
+    """
+    major, minor = (int(part) for part in duckdb.__version__.split(".")[:2])
+    return (major, minor) >= (1, 2)
+
+
+def duckdb_unsupported_options(options: dict) -> list:
+    """
+    Return the write options DuckDB's Parquet writer cannot honour. It always writes statistics,
+    never writes a page index, and adds a Bloom filter to every dictionary-encoded column. The
+    dictionary limit is raised to the row-group size, so every column, including all-distinct ones
+    like unique_id, is dictionary-encoded and gets a Bloom filter; the columns cannot be chosen.
+    """
+    unsupported = []
+    if options.get("use_dictionary", True) is not True:
+        unsupported.append("use_dictionary")
+    if options.get("write_statistics", True) is not True:
+        unsupported.append("write_statistics")
+    if options.get("write_page_index", False):
+        unsupported.append("write_page_index")
+    return unsupported
+
+
+def benchmark_profiles(sample: pd.DataFrame, profiles=None, repeat: int = 3) -> pd.DataFrame:
+    """
+    Write and read a sample DataFrame with each profile and measure file size and timings.
+
+    Args:
+        sample (pd.DataFrame): Representative data to benchmark with.
+        profiles (iterable[str]): Names of the profiles to compare. Defaults to all profiles.
+        repeat (int): Number of write/read rounds per profile; the best timing is kept.
+
+    Returns:
+        pd.DataFrame: One row per profile with the columns profile, file_size_bytes,
+            write_seconds and read_seconds.
+    """
+    # Imported here to avoid a circular import, ParquetIO reads its profiles from this module.
+    from services.io_manager.parquet_io import ParquetIO
+
+    results = []
+    with TemporaryDirectory() as temp_dir:
+        for profile in (profiles or WRITE_PROFILES):
+            handler = ParquetIO(profile=profile)
+            destination = os.path.join(temp_dir, profile) + "/"
+            os.makedirs(destination)
+            file_path = os.path.join(destination, "sample.parquet")
+
+            write_seconds, read_seconds = float("inf"), float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                handler.write(destination, sample, file_name="sample")
+                write_seconds = min(write_seconds, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                pd.read_parquet(file_path)
+                read_seconds = min(read_seconds, time.perf_counter() - start)
+
+            results.append({
+                "profile": profile,
+                "file_size_bytes": os.path.getsize(file_path),
+                "write_seconds": write_seconds,
+                "read_seconds": read_seconds,
+            })
+
+    return pd.DataFrame(results)
+
+
+def recommend_profile(sample: pd.DataFrame, profiles=None, size_weight: float = 0.5, repeat: int = 3):
+    """
+    Benchmark the profiles on a sample and recommend the one with the best size/speed trade-off.
+
+    Each profile is scored on its file size and its write plus read time, both relative to
+    the best profile for that measure; the profile with the lowest weighted score wins.
+
+    Args:
+        sample (pd.DataFrame): Representative data to benchmark with.
+        profiles (iterable[str]): Names of the profiles to compare. Defaults to all profiles.
+        size_weight (float): Weight of the file size in the score, between 0 (only speed
+            matters) and 1 (only size matters).
+        repeat (int): Number of write/read rounds per profile.
+
+    Returns:
+        tuple[str, pd.DataFrame]: The recommended profile and the benchmark results, with a score column.
+    """
+    if not 0 <= size_weight <= 1:
+        raise ValueError("size_weight must be between 0 and 1.")
+
+    results = benchmark_profiles(sample, profiles=profiles, repeat=repeat)
+    total_seconds = results["write_seconds"] + results["read_seconds"]
+    results["score"] = (
+        size_weight * results["file_size_bytes"] / results["file_size_bytes"].min()
+        + (1 - size_weight) * total_seconds / total_seconds.min()
+    )
+    results = results.sort_values("score").reset_index(drop=True)
+    return results.loc[0, "profile"], results
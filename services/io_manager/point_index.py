@@ -0,0 +1,191 @@
+import glob
+import json
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from services.io_manager.hashing import hash_values
+
+
+SEGMENT_DTYPE = np.dtype([("hash", "<u8"), ("file", "<u4"), ("row_group", "<u4")])
+
+
+class PointIndex:
+    """
+    Secondary index mapping key columns (e.g. unique_id and id) of a Parquet dataset directory
+    to the files and row groups holding each key.
+
+    The index lives in an `.index/<column>/` directory next to the data. Every indexed file adds a
+    segment: a NumPy file of (key hash, file number, row group) entries sorted by hash, and a JSON
+    list of the file names the numbers refer to. Segments are memory-mapped and binary searched,
+    so a lookup reads only the index entries of the requested keys and then the matching row
+    groups. compact() merges the segments of many small files into one.
+
+    Hashes may collide, so lookups verify the keys against the row groups they read.
+    """
+
+    INDEX_DIR = ".index"
+
+    def __init__(self, dataset_dir: str, columns=("unique_id", "id")):
+        """
+        Args:
+            dataset_dir (str): Directory holding the Parquet files.
+            columns (tuple[str]): Key columns to index. Files without a column are not indexed on it.
+        """
+        self.dataset_dir = dataset_dir
+        self.columns = tuple(columns)
+
+    def _column_dir(self, column: str) -> str:
+        return os.path.join(self.dataset_dir, self.INDEX_DIR, column)
+
+    def _segments(self, column: str):
+        # The .npy file is written last, so only complete segments are listed.
+        return sorted(glob.glob(os.path.join(glob.escape(self._column_dir(column)), "*.npy")))
+
+    def _write_segment(self, column: str, entries: np.ndarray, file_names: list, name: str = None) -> str:
+        column_dir = self._column_dir(column)
+        os.makedirs(column_dir, exist_ok=True)
+        name = name or uuid.uuid4().hex
+        entries = entries[np.argsort(entries["hash"], kind="stable")]
+
+        files_path = os.path.join(column_dir, f"{name}.json")
+        with open(f"{files_path}.tmp", "w") as f:
+            json.dump(file_names, f)
+        os.replace(f"{files_path}.tmp", files_path)
+
+        segment_path = os.path.join(column_dir, f"{name}.npy")
+        with open(f"{segment_path}.tmp", "wb") as f:
+            np.save(f, entries)
+        os.replace(f"{segment_path}.tmp", segment_path)
+        return segment_path
+
+    @staticmethod
+    def _load_segment(segment_path: str):
+        entries = np.load(segment_path, mmap_mode="r")
+        with open(segment_path[:-len(".npy")] + ".json") as f:
+            file_names = json.load(f)
+        return entries, file_names
+
+    def add(self, file_path: str):
+        """
+        Index a Parquet file of the dataset. Only the key columns are read, one row group at a time.
+
+        Args:
+            file_path (str): Path of the file, inside the dataset directory.
+        """
+        parquet_file = pq.ParquetFile(file_path)
+        available = set(parquet_file.schema_arrow.names)
+        file_name = os.path.basename(file_path)
+
+        for column in self.columns:
+            if column not in available:
+                continue
+            parts = []
+            for row_group in range(parquet_file.num_row_groups):
+                keys = parquet_file.read_row_group(row_group, columns=[column]).column(0).to_pandas().dropna()
+                part = np.empty(len(keys), dtype=SEGMENT_DTYPE)
+                part["hash"] = hash_values(keys)
+                part["file"] = 0
+                part["row_group"] = row_group
+                parts.append(part)
+            entries = np.concatenate(parts) if parts else np.empty(0, dtype=SEGMENT_DTYPE)
+            self._write_segment(column, entries, [file_name], name=os.path.splitext(file_name)[0])
+
+    def locate(self, ids, column: str = "unique_id") -> pd.DataFrame:
+        """
+        Return the candidate positions of keys without reading any data file.
+
+        Args:
+            ids (iterable): Keys to look up.
+            column (str): Indexed column the keys belong to.
+
+        Returns:
+            pd.DataFrame: One row per (hash, file, row_group) candidate, with the columns
+            key, file and row_group. Candidates are unverified: a hash collision may add a
+            row group that does not contain the key.
+        """
+        if column not in self.columns:
+            raise ValueError(f"Column '{column}' is not indexed.")
+
+        keys = pd.Series(list(ids), dtype=object).astype(str).drop_duplicates()
+        hashes = hash_values(keys)
+        order = np.argsort(hashes)
+        sorted_hashes, sorted_keys = hashes[order], keys.to_numpy()[order]
+
+        rows = []
+        for segment_path in self._segments(column):
+            entries, file_names = self._load_segment(segment_path)
+            if len(entries) == 0:
+                continue
+            segment_hashes = entries["hash"]
+            starts = np.searchsorted(segment_hashes, sorted_hashes, side="left")
+            ends = np.searchsorted(segment_hashes, sorted_hashes, side="right")
+            for key, start, end in zip(sorted_keys, starts, ends):
+                for entry in entries[start:end]:
+                    rows.append((key, file_names[entry["file"]], int(entry["row_group"])))
+
+        return pd.DataFrame(rows, columns=["key", "file", "row_group"]).drop_duplicates(ignore_index=True)
+
+    def lookup(self, ids, column: str = "unique_id", columns: list = None) -> pd.DataFrame:
+        """
+        Return the rows holding the keys, reading only the row groups the index points to.
+
+        Args:
+            ids (iterable): Keys to look up.
+            column (str): Indexed column the keys belong to.
+            columns (list[str]): Columns to return. Defaults to all columns.
+
+        Returns:
+            pd.DataFrame: The matching rows, with the _file and _row_group columns telling where
+            each row is stored. Keys that are not found are absent from the result.
+        """
+        candidates = self.locate(ids, column)
+        wanted = set(candidates["key"])
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, column]))
+
+        frames = []
+        for (file_name, row_group), _ in candidates.groupby(["file", "row_group"], sort=True):
+            file_path = os.path.join(self.dataset_dir, file_name)
+            if not os.path.exists(file_path):
+                # The file was removed after it was indexed.
+                continue
+            data = pq.ParquetFile(file_path).read_row_group(row_group, columns=read_columns).to_pandas()
+            data = data[data[column].astype(str).isin(wanted)]
+            if columns is not None:
+                data = data[columns]
+            frames.append(data.assign(_file=file_name, _row_group=row_group))
+
+        if not frames:
+            return pd.DataFrame(columns=[*(columns or []), "_file", "_row_group"])
+        return pd.concat(frames, ignore_index=True)
+
+    def compact(self):
+        """
+        Merge all segments of each column into one. Segments added while compacting are kept.
+        """
+        for column in self.columns:
+            segment_paths = self._segments(column)
+            if len(segment_paths) < 2:
+                continue
+
+            parts, file_names = [], []
+            for segment_path in segment_paths:
+                entries, segment_files = self._load_segment(segment_path)
+                part = np.array(entries)
+                part["file"] += len(file_names)
+                parts.append(part)
+                file_names.extend(segment_files)
+            self._write_segment(column, np.concatenate(parts), file_names)
+
+            for segment_path in segment_paths:
+                os.remove(segment_path)
+                os.remove(segment_path[:-len(".npy")] + ".json")
+
+    def clear(self):
+        """
+        Remove the index of the dataset.
+        """
+        for column in self.columns:
+            for path in glob.glob(os.path.join(glob.escape(self._column_dir(column)), "*")):
+                os.remove(path)
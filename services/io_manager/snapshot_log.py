@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+
+class SnapshotLog:
+    """
+    Commit log of a dataset directory, isolating readers from writers.
+
+    Every committed snapshot is an immutable version directory (v000001/, v000002/...) inside
+    the dataset directory. Writers stage their files in a private _staging-<id>/ directory and
+    commit it by renaming it to the next version, which is atomic: a reader pins the latest
+    version with pin() and reads it as a plain directory, without ever seeing a partial write,
+    while newer versions are committed. An appending commit starts from hard links to the files
+    (and point index) of the current version, so it copies no data.
+
+    After each commit, versions are garbage-collected: the last `keep_versions` versions are kept,
+    and so is any version superseded less than `retention_seconds` ago, so that readers pinned to
+    it can finish. Staging directories older than `retention_seconds` are left over by writers
+    that crashed, and are removed too.
+    """
+
+    STAGING_PREFIX = "_staging-"
+    MARKER_FILE = "_SNAPSHOT.json"
+
+    def __init__(self, dataset_dir: str, keep_versions: int = 3, retention_seconds: float = 3600):
+        """
+        Args:
+            dataset_dir (str): Directory holding the versions of the dataset.
+            keep_versions (int): Number of most recent versions never garbage-collected.
+            retention_seconds (float): Time a superseded version is kept for the readers pinned to it.
+        """
+        self.dataset_dir = dataset_dir
+        self.keep_versions = keep_versions
+        self.retention_seconds = retention_seconds
+
+    def version_path(self, version: int) -> str:
+        return os.path.join(self.dataset_dir, f"v{version:06d}", "")
+
+    def versions(self) -> list:
+        """
+        Return the committed versions, oldest first.
+        """
+        if not os.path.isdir(self.dataset_dir):
+            return []
+        versions = []
+        for name in os.listdir(self.dataset_dir):
+            match = re.fullmatch(r"v(\d{6,})", name)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def current_version(self):
+        """
+        Return the latest committed version, or None if nothing was committed yet.
+        """
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def pin(self) -> str:
+        """
+        Return the directory of the latest committed version, for a reader to use for its whole run.
+        Directories without committed versions (e.g. written without a log, or remote) are returned as is.
+        """
+        version = self.current_version()
+        return self.dataset_dir if version is None else self.version_path(version)
+
+    def staging_path(self, name: str) -> str:
+        return os.path.join(self.dataset_dir, f"{self.STAGING_PREFIX}{name}", "")
+
+    def begin(self, append: bool = False, name: str = None) -> str:
+        """
+        Create a staging directory for a writer and return its path.
+
+        Args:
+            append (bool): Start from the files of the current version, to add files to it.
+                Otherwise the commit replaces the dataset with the staged files only.
+            name (str): Name of the staging directory, for writers in other processes to find it
+                with staging_path(). A staging directory of the same name is discarded. Random if omitted.
+        """
+        staging_path = self.staging_path(name or uuid.uuid4().hex)
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.makedirs(staging_path)
+
+        version = self.current_version() if append else None
+        if version is not None:
+            source = self.version_path(version)
+            for dir_path, _, file_names in os.walk(source):
+                relative_dir = os.path.relpath(dir_path, source)
+                target_dir = os.path.join(staging_path, relative_dir)
+                os.makedirs(target_dir, exist_ok=True)
+                for file_name in file_names:
+                    if relative_dir == "." and file_name == self.MARKER_FILE:
+                        continue
+                    self._link(os.path.join(dir_path, file_name), os.path.join(target_dir, file_name))
+        return staging_path
+
+    @staticmethod
+    def _link(source: str, target: str):
+        try:
+            os.link(source, target)
+        except OSError:
+            # The filesystem does not support hard links.
+            shutil.copy2(source, target)
+
+    def commit(self, staging_path: str) -> int:
+        """
+        Publish a staging directory as the next version, then garbage-collect old versions.
+        Concurrent commits get distinct versions; the last one committed is the current one.
+
+        Returns:
+            int: The committed version.
+        """
+        staging_dir = staging_path.rstrip(os.sep)
+        while True:
+            version = (self.current_version() or 0) + 1
+            # The marker keeps the directory non-empty: renaming onto an existing empty directory
+            # would silently replace it instead of failing.
+            with open(os.path.join(staging_dir, self.MARKER_FILE), "w") as f:
+                json.dump({"version": version, "committed_at": time.time()}, f)
+            try:
+                os.rename(staging_dir, self.version_path(version).rstrip(os.sep))
+                break
+            except OSError:
+                if not os.path.isdir(self.version_path(version)):
+                    raise
+                # Another writer committed this version first: take the next one.
+
+        self.garbage_collect()
+        return version
+
+    def abort(self, staging_path: str):
+        """
+        Discard a staging directory.
+        """
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    def _committed_at(self, version: int) -> float:
+        path = self.version_path(version)
+        try:
+            with open(os.path.join(path, self.MARKER_FILE)) as f:
+                return json.load(f)["committed_at"]
+        except (OSError, ValueError, KeyError):
+            try:
+                return os.path.getmtime(path)
+            except FileNotFoundError:
+                # Removed by a concurrent garbage collection: keep its predecessor for now.
+                return time.time()
+
+    def garbage_collect(self) -> list:
+        """
+        Remove the versions and staging directories that are no longer needed.
+
+        Returns:
+            list[int]: The removed versions.
+        """
+        now = time.time()
+        versions = self.versions()
+        kept = set(versions[-self.keep_versions:]) if self.keep_versions > 0 else set()
+        removed = []
+        for version, successor in zip(versions, versions[1:]):
+            if version in kept:
+                continue
+            if now - self._committed_at(successor) >= self.retention_seconds:
+                shutil.rmtree(self.version_path(version), ignore_errors=True)
+                removed.append(version)
+
+        for name in os.listdir(self.dataset_dir):
+            if not name.startswith(self.STAGING_PREFIX):
+                continue
+            path = os.path.join(self.dataset_dir, name)
+            try:
+                stale = now - os.path.getmtime(path) >= self.retention_seconds
+            except FileNotFoundError:
+                # Committed or aborted meanwhile.
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+        return removed
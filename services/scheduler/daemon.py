@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from services.egress.mart_store import JsonRequestHandler
+
+
+class PipelineDaemon:
+    """
+    Long-running process keeping a pipeline warm between runs.
+
+    The pipeline object, and with it the HTTP connection pool, the DuckDB database, the loaded
+    mart input, the caches and the writer pools, lives as long as the daemon, so a cycle only
+    pays for the new data. A cycle runs:
+    - at startup,
+    - every `interval` seconds, if set,
+    - when a file is dropped into `trigger_dir` (the file is consumed), and
+    - when trigger() is called, e.g. by POST /trigger on the HTTP endpoint (see serve()).
+    Triggers arriving while a cycle runs are coalesced into one following cycle.
+
+    The first cycle runs the whole pipeline while some configuration was never ingested;
+    the others call run_increment(), which ingests, transforms and publishes only new records.
+    """
+
+    def __init__(self, pipeline, interval: float = None, trigger_dir: str = None, increment_records: int = None,
+                 poll_interval: float = 1.0):
+        """
+        Args:
+            pipeline (DataPipeline): The pipeline to run. It must provide needs_full_run(),
+                run() and run_increment(records).
+            interval (float): Seconds between the starts of scheduled cycles. No schedule when None.
+            trigger_dir (str): Directory watched for trigger files. Not watched when None.
+            increment_records (int): Records fetched per configuration by incremental cycles.
+                Defaults to one page.
+            poll_interval (float): Seconds between two checks of the trigger directory.
+        """
+        self.pipeline = pipeline
+        self.interval = interval
+        self.trigger_dir = trigger_dir
+        self.increment_records = increment_records
+        self.poll_interval = poll_interval
+        if self.trigger_dir is not None:
+            os.makedirs(self.trigger_dir, exist_ok=True)
+
+        self.started_at = time.time()
+        self.cycles = 0
+        self.failures = 0
+        self.running = False
+        self.last_cycle = None
+        self.last_success_at = None
+        self._triggered = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def trigger(self):
+        """
+        Request a cycle as soon as the current one, if any, is done.
+        """
+        self._triggered.set()
+
+    def stop(self):
+        """
+        Make run() return once the current cycle, if any, is done.
+        """
+        self._stopped.set()
+        self._triggered.set()
+
+    def _consume_trigger_files(self) -> bool:
+        if self.trigger_dir is None:
+            return False
+        file_names = [f for f in os.listdir(self.trigger_dir) if not f.startswith(".")]
+        for file_name in file_names:
+            try:
+                os.remove(os.path.join(self.trigger_dir, file_name))
+            except FileNotFoundError:
+                pass
+        return bool(file_names)
+
+    def _wait_for_trigger(self, next_scheduled: float):
+        """
+        Block until the next cycle is due and return its reason, or None once stopped.
+        """
+        while not self._stopped.is_set():
+            if self._triggered.is_set():
+                self._triggered.clear()
+                if not self._stopped.is_set():
+                    return "request"
+            elif self._consume_trigger_files():
+                return "file"
+            elif next_scheduled is not None and time.monotonic() >= next_scheduled:
+                return "schedule"
+
+            timeout = self.poll_interval
+            if next_scheduled is not None:
+                timeout = max(0.0, min(timeout, next_scheduled - time.monotonic()))
+            self._triggered.wait(timeout)
+        return None
+
+    def run_cycle(self, reason: str = "request") -> dict:
+        """
+        Run one cycle of the pipeline and record its statistics.
+
+        Args:
+            reason (str): What triggered the cycle, reported in the statistics.
+
+        Returns:
+            dict: The statistics of the cycle (see stats()).
+        """
+        with self._lock:
+            self.running = True
+            self.cycles += 1
+            cycle = {
+                "cycle": self.cycles,
+                "reason": reason,
+                "mode": "full" if self.pipeline.needs_full_run() else "incremental",
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            }
+        start = time.perf_counter()
+        try:
+            if cycle["mode"] == "full":
+                results = self.pipeline.run()
+            else:
+                results = self.pipeline.run_increment(self.increment_records)
+            cycle["status"] = "succeeded"
+            cycle["tasks_run"] = sorted(results)
+            for stage, field in (("ingest", "ingested_rows"), ("transform", "transformed_rows")):
+                # Task names are "<stage>" or "<stage>[<config id>]".
+                cycle[field] = sum(
+                    value for name, value in results.items()
+                    if name.split("[")[0] == stage and isinstance(value, int)
+                )
+        except Exception as e:
+            cycle["status"] = "failed"
+            cycle["error"] = str(e)
+            traceback.print_exc()
+
+        with self._lock:
+            cycle["duration_seconds"] = round(time.perf_counter() - start, 3)
+            if cycle["status"] == "succeeded":
+                self.last_success_at = cycle["started_at"]
+            else:
+                self.failures += 1
+            self.last_cycle = cycle
+            self.running = False
+        return cycle
+
+    def run(self, max_cycles: int = None):
+        """
+        Run cycles whenever they are triggered, until stop() is called or `max_cycles` cycles ran.
+        """
+        cycles = 0
+        reason = "startup"
+        while reason is not None:
+            cycle_start = time.monotonic()
+            self.run_cycle(reason)
+            cycles += 1
+            if max_cycles is not None and cycles >= max_cycles:
+                return
+            next_scheduled = None if self.interval is None else cycle_start + self.interval
+            reason = self._wait_for_trigger(next_scheduled)
+
+    def health(self) -> dict:
+        """
+        Return the liveness of the daemon. It is healthy unless its last cycle failed.
+        """
+        with self._lock:
+            healthy = self.last_cycle is None or self.last_cycle["status"] != "failed"
+            return {
+                "status": "ok" if healthy else "failing",
+                "running": self.running,
+                "uptime_seconds": round(time.time() - self.started_at, 3),
+                "cycles": self.cycles,
+                "failures": self.failures,
+                "last_success_at": self.last_success_at,
+            }
+
+    def stats(self) -> dict:
+        """
+        Return the statistics of the last cycle: its number, reason, mode ("full" or
+        "incremental"), start time, duration, status, the tasks that ran and the number of
+        ingested and transformed rows, or the error of a failed cycle.
+        """
+        with self._lock:
+            return {"last_cycle": None if self.last_cycle is None else dict(self.last_cycle)}
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8766) -> ThreadingHTTPServer:
+        """
+        Create an HTTP server exposing GET /health (503 once the last cycle failed), GET /stats
+        and POST /trigger. Call serve_forever() on it, usually from a background thread.
+        """
+        daemon = self
+
+        class Handler(JsonRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path == "/health":
+                    health = daemon.health()
+                    self._send(200 if health["status"] == "ok" else 503, health)
+                elif path == "/stats":
+                    self._send(200, daemon.stats())
+                else:
+                    self._send(404, {"error": "Not found"})
+
+            def do_POST(self):
+                if self.path.split("?")[0].rstrip("/") == "/trigger":
+                    daemon.trigger()
+                    self._send(202, {"triggered": True})
+                else:
+                    self._send(404, {"error": "Not found"})
+
+        return ThreadingHTTPServer((host, port), Handler)
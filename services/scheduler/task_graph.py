@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from services.io_manager.fingerprint import fingerprint_paths
+
+
+class Task:
+    def __init__(self, name, func, depends_on=(), inputs=(), outputs=(), key=None, retries=0, executor="thread"):
+        """
+        A single node of a TaskGraph.
+
+        Args:
+            name (str): Unique name of the task within the graph.
+            func (callable): Callable invoked without arguments. Must be picklable when executor is "process".
+            depends_on (iterable[str]): Names of the tasks that must succeed before this one can run.
+            inputs (iterable[str]): Files or directories read by the task. The task is rerun when they change.
+            outputs (iterable[str]): Files or directories produced by the task. The task is rerun when they
+                were modified or removed since its last successful run.
+            key (str): Extra value folded into the fingerprint (e.g. API parameters).
+            retries (int): Number of additional attempts within a single run before the task is marked as failed.
+            executor (str): Pool the task runs on, either "thread" or "process".
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor '{executor}' for task '{name}'.")
+
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.key = key
+        self.retries = retries
+        self.executor = executor
+
+
+class TaskGraph:
+    """
+    Minimal DAG scheduler for pipeline stages.
+
+    Tasks whose dependencies have all succeeded are run concurrently on a thread or process pool.
+    The outcome of each task is persisted to a JSON state file, which allows a later run to:
+    - skip tasks whose inputs, key and upstream results are unchanged since their last success, and
+    - rerun only failed tasks (and their dependents) instead of the whole graph.
+    """
+
+    def __init__(self, state_path: str = None, max_workers: int = 4, storage_options: dict = None):
+        """
+        Initialize the task graph.
+
+        Args:
+            state_path (str): Path of the JSON file used to persist task state between runs.
+                When None, no state is kept and every task runs on each call to run().
+            max_workers (int): Maximum number of tasks running at the same time on each pool.
+            storage_options (dict): fsspec options used to list the inputs and outputs stored on an
+                object store (URLs), e.g. a custom endpoint and its credentials.
+        """
+        self.state_path = state_path
+        self.max_workers = max_workers
+        self.storage_options = storage_options
+        self.tasks = {}
+        self.last_run = {}
+
+    def add_task(self, name, func, depends_on=(), inputs=(), outputs=(), key=None, retries=0, executor="thread"):
+        """
+        Declare a task in the graph. See Task for a description of the arguments.
+
+        Returns:
+            Task: The declared task.
+
+        Raises:
+            ValueError: If a task with the same name already exists.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task '{name}' is already defined.")
+
+        task = Task(name, func, depends_on, inputs, outputs, key, retries, executor)
+        self.tasks[name] = task
+        return task
+
+    def run(self, force: bool = False) -> dict:
+        """
+        Run the graph until every task has succeeded, been skipped, or failed.
+
+        Args:
+            force (bool): Run every task even if its fingerprint is unchanged.
+
+        Returns:
+            dict: Mapping of task name to the value returned by the task, for the tasks that ran.
+                The status of every task is available in `last_run` afterwards.
+
+        Raises:
+            RuntimeError: If one or more tasks failed. The state of the successful tasks is kept,
+                so calling run() again only retries the failed tasks and their dependents.
+        """
+        self._validate()
+        state = self._load_state()
+
+        results = {}
+        errors = {}
+        status = {name: "pending" for name in self.tasks}
+        attempts = {name: 0 for name in self.tasks}
+        fingerprints = {}
+        running = {}
+
+        pools = {
+            "thread": ThreadPoolExecutor(max_workers=self.max_workers),
+        }
+        if any(task.executor == "process" for task in self.tasks.values()):
+            pools["process"] = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        def submit(task):
+            attempts[task.name] += 1
+            status[task.name] = "running"
+            future = pools[task.executor].submit(task.func)
+            running[future] = task
+
+        try:
+            while True:
+                # Resolve tasks that became ready or can no longer run.
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, task in self.tasks.items():
+                        if status[name] != "pending":
+                            continue
+
+                        upstream = [status[dep] for dep in task.depends_on]
+                        if any(s in ("failed", "blocked") for s in upstream):
+                            status[name] = "blocked"
+                            progressed = True
+                        elif all(s in ("success", "skipped") for s in upstream):
+                            fingerprints[name] = self._fingerprint(task, state)
+                            if not force and self._is_up_to_date(task, state, fingerprints[name]):
+                                status[name] = "skipped"
+                                print(f"Skipping task '{name}': inputs unchanged since last run.")
+                                progressed = True
+                            else:
+                                submit(task)
+
+                if not running:
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        results[task.name] = future.result()
+                    except Exception as e:
+                        if attempts[task.name] <= task.retries:
+                            print(f"Task '{task.name}' failed on attempt {attempts[task.name]}: {e}. Retrying...")
+                            submit(task)
+                            continue
+                        status[task.name] = "failed"
+                        errors[task.name] = e
+                        state[task.name] = {
+                            "status": "failed",
+                            "error": str(e),
+                            "finished_at": time.time(),
+                        }
+                    else:
+                        status[task.name] = "success"
+                        state[task.name] = {
+                            "status": "success",
+                            "run_id": uuid.uuid4().hex,
+                            "fingerprint": fingerprints[task.name],
+                            "outputs_fingerprint": fingerprint_paths(task.outputs, self.storage_options),
+                            "finished_at": time.time(),
+                        }
+                    self._save_state(state)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+        self.last_run = status
+
+        if errors:
+            blocked = [name for name, s in status.items() if s == "blocked"]
+            message = "; ".join(f"{name}: {error}" for name, error in errors.items())
+            if blocked:
+                message += f" (not run: {', '.join(blocked)})"
+            raise RuntimeError(f"Task graph failed: {message}") from next(iter(errors.values()))
+
+        return results
+
+    def _validate(self):
+        """
+        Ensure every dependency exists and the graph has no cycles.
+
+        Raises:
+            ValueError: If the graph is invalid.
+        """
+        for task in self.tasks.values():
+            for dep in task.depends_on:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'.")
+
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected in task graph at task '{name}'.")
+            visiting.add(name)
+            for dep in self.tasks[name].depends_on:
+                visit(dep)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def _fingerprint(self, task, state):
+        """
+        Fingerprint a task from its key, its inputs and the last successful run of its dependencies.
+        """
+        payload = {
+            "key": task.key,
+            "inputs": fingerprint_paths(task.inputs, self.storage_options),
+            "upstream": {dep: state.get(dep, {}).get("run_id") for dep in task.depends_on},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _is_up_to_date(self, task, state, fingerprint):
+        previous = state.get(task.name)
+        if not previous or previous.get("status") != "success":
+            return False
+        return (
+            previous.get("fingerprint") == fingerprint
+            and previous.get("outputs_fingerprint") == fingerprint_paths(task.outputs, self.storage_options)
+        )
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        if self.state_path is None:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
@@ -1,10 +1,24 @@
+import json
 import os
+import time
 import pandas as pd
 from services.io_manager.io_handler import IOHandler
+from services.io_manager.snapshot_log import SnapshotLog
 from services.transform.person_data_transformer import PersonDataTransformer  # Assuming this import is correct
+from services.transform.batch_tuner import BatchSizeTuner, peak_memory_bytes
+from services.transform.duckdb_transformer import DuckDBTransformer
+from services.transform.geo import CELL_COLUMN
+from services.transform.sketches import PersonSketches
 
 class BatchProcessor:
-    def __init__(self, input_path: str, output_path: str, io_handler: IOHandler, batch_size: int = 1000):
+    ENGINES = ("pandas", "duckdb")
+
+    def __init__(self, input_path: str, output_path: str, io_handler: IOHandler, batch_size: int = 1000,
+                 output_io_handler: IOHandler = None, sketch_path: str = None,
+                 columns: list = None, filters: list = None, engine: str = "pandas", connection=None,
+                 state_path: str = None, snapshot_log: SnapshotLog = None, autotune: bool = False,
+                 row_group_size: int = None, memory_limit_bytes: int = 512 * 1024 * 1024,
+                 input_snapshots: bool = True):
         """
         Initialize the batch processor.
 
@@ -12,29 +26,194 @@ class BatchProcessor:
             input_path (str): Path to the directory where raw Parquet files are stored.
             output_path (str): Path to the directory where transformed Parquet files will be stored.
             io_handler (IOHandler): An instance of the IOHandler handler for reading and writing data.
-            batch_size (int): Number of rows to process at once (per batch).
+            batch_size (int): Number of rows to process at once (per batch). Batches may span input files.
+                With `autotune`, the batch size to start from.
+            output_io_handler (IOHandler): Handler used to write the transformed data. Defaults to io_handler.
+            sketch_path (str): Path of the JSON file where approximate aggregates (distinct users,
+                top Gmail countries, age quantiles) are saved. No sketches are built when None. A full run
+                replaces the saved sketches, like it rewrites the output; an incremental run merges into them.
+            columns (list): Input columns to read. Defaults to all columns: the transformer keeps every
+                input column (masked) in its output, so only restrict this to drop columns from the output.
+            filters (list): Row filters in PyArrow's DNF format pushed down to the read, e.g. to
+                reprocess a subset of the raw data.
+            engine (str): "pandas" transforms each file with PersonDataTransformer; "duckdb" applies the
+                same rules as one DuckDB query over the whole input directory (see DuckDBTransformer).
+            connection: DuckDB connection shared with other components, used by the "duckdb" engine.
+            state_path (str): Path of the JSON file listing the input files already transformed, which
+                incremental runs skip. Required by process(incremental=True).
+            snapshot_log (SnapshotLog): Commit log of the output path. When set, the output is staged
+                and published as a new snapshot version once complete, instead of being cleared and
+                rewritten in place.
+            autotune (bool): Tune the batch size and the output row-group size while processing, for
+                the highest throughput within `memory_limit_bytes` (see BatchSizeTuner). The chosen
+                values are available in `tuning` after process(). Used by the "pandas" engine only;
+                the "duckdb" engine transforms the whole input in one query.
+            row_group_size (int): Row-group size of the output files. Defaults to the output handler's;
+                with `autotune`, the one used until the memory per row was measured.
+            memory_limit_bytes (int): Memory a batch may need when `autotune` is set.
+            input_snapshots (bool): Read the latest snapshot version of the input path. Disable it when
+                the input is rewritten in place, so versions left over from earlier runs are ignored.
         """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown transform engine '{engine}'. Expected one of: {', '.join(self.ENGINES)}.")
         self.input_path = input_path
         self.output_path = output_path
         self.io_handler = io_handler
         self.batch_size = batch_size
+        self.output_io_handler = output_io_handler if output_io_handler is not None else io_handler
+        self.input_snapshots = input_snapshots
+        self.sketch_path = sketch_path
+        self.columns = columns
+        self.filters = filters
+        self.engine = engine
+        self.connection = connection
+        self.state_path = state_path
+        self.snapshot_log = snapshot_log
+        self.autotune = autotune
+        self.row_group_size = row_group_size
+        self.memory_limit_bytes = memory_limit_bytes
+        self.tuning = None
 
-    def process(self):
+    def process(self, incremental: bool = False) -> int:
         """
         Process each Parquet file in the input directory:
         - Read the file in batches
         - Transform the data for each batch
         - Write the transformed data to the output directory.
+        - Update the sketches with the transformed data, if enabled.
+
+        With `incremental`, only the input files not transformed yet are processed and their
+        output is added to the output directory, which is not cleared; the sketches are merged.
+
+        Returns:
+            int: Number of transformed rows.
         """
+        # Read one snapshot of the input, even if the ingest commits a newer one meanwhile.
+        input_path = SnapshotLog(self.input_path).pin() if self.input_snapshots else self.input_path
+        if incremental:
+            if self.state_path is None:
+                raise ValueError("Incremental processing requires a state_path.")
+            processed = self._load_processed()
+            files = [f for f in self.io_handler.list_files(input_path) if f not in processed]
+            if not files:
+                return 0
+        else:
+            processed = set()
+            # Files added while this run is processing are left to the next incremental run.
+            files = self.io_handler.list_files(input_path) if self.state_path is not None else None
+
+        if self.snapshot_log is not None:
+            output_path = self.snapshot_log.begin(append=incremental)
+        else:
+            output_path = self.output_path
+            if not incremental:
+                self.output_io_handler.clear(self.output_path)
+        sketches = PersonSketches() if self.sketch_path else None
+
+        try:
+            if self.engine == "duckdb":
+                rows = DuckDBTransformer(connection=self.connection).transform(
+                    input_path, output_path, self.io_handler, self.output_io_handler,
+                    batch_size=self.batch_size, columns=self.columns, filters=self.filters, sketches=sketches,
+                    files=files,
+                )
+            else:
+                rows = self._process_with_pandas(input_path, output_path, sketches, files)
+        except Exception:
+            if self.snapshot_log is not None:
+                self.snapshot_log.abort(output_path)
+            raise
+        if self.snapshot_log is not None:
+            self.snapshot_log.commit(output_path)
 
-        self.io_handler.clear(self.output_path)
+        if sketches is not None:
+            self._save_sketches(sketches, merge=incremental)
+        if files is not None:
+            self._save_processed(processed.union(files))
+        return rows
+
+    def _load_processed(self) -> set:
+        if not os.path.exists(self.state_path):
+            return set()
+        with open(self.state_path) as f:
+            return set(json.load(f))
+
+    def _save_processed(self, processed: set):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sorted(processed), f)
+        os.replace(tmp_path, self.state_path)
+
+    def _process_with_pandas(self, input_path: str, output_path: str, sketches: PersonSketches = None,
+                             files: list = None) -> int:
+        """
+        Transform the input batch by batch with PersonDataTransformer, tuning the batch size if enabled.
+        """
+        # Only pass the pushdown arguments that are set, so handlers without them keep working.
+        read_options = {
+            key: value for key, value in (("columns", self.columns), ("filters", self.filters), ("files", files))
+            if value is not None
+        }
+        tuner = None
+        if self.autotune:
+            tuner = BatchSizeTuner(self.batch_size, self.row_group_size, memory_limit_bytes=self.memory_limit_bytes)
+        rows = 0
 
-        # Iterate over all files in the input directory using the read method from ParquetIO
-        for batch_df in self.io_handler.read(self.input_path, batch_size=self.batch_size):
+        frames = self.io_handler.read(input_path, batch_size=self.batch_size, **read_options)
+        started, peak_memory = time.perf_counter(), peak_memory_bytes()
+        for batch_df in self._rebatch(frames, lambda: tuner.batch_size if tuner else self.batch_size):
             # Initialize the transformer
             transformer = PersonDataTransformer(batch_df)
 
             # Perform the transformation
             transformed_df = transformer.transform()
 
-            self.io_handler.write(self.output_path, transformed_df)
+            # Cluster the written rows by grid cell, so bounding-box reads skip most row groups
+            self.output_io_handler.write(
+                output_path, transformed_df.sort_values(CELL_COLUMN, kind="stable", na_position="last", ignore_index=True),
+                row_group_size=tuner.row_group_size if tuner else self.row_group_size,
+            )
+            rows += len(transformed_df)
+
+            if sketches is not None:
+                sketches.update(transformed_df, transformer.calculate_age(batch_df['birthday']))
+
+            if tuner is not None:
+                finished, finished_peak = time.perf_counter(), peak_memory_bytes()
+                memory = batch_df.memory_usage(deep=True).sum() + transformed_df.memory_usage(deep=True).sum()
+                if peak_memory is not None:
+                    memory = max(memory, finished_peak - peak_memory)
+                tuner.record(len(batch_df), finished - started, int(memory))
+                started, peak_memory = finished, finished_peak
+
+        self.tuning = tuner.report() if tuner else None
+        return rows
+
+    @staticmethod
+    def _rebatch(frames, batch_size):
+        """
+        Regroup DataFrames into batches of `batch_size()` rows (the last one may be shorter).
+        The size is asked again for every batch, so it can change while the input is read.
+        """
+        pending, pending_rows = [], 0
+        for frame in frames:
+            while len(frame):
+                take = frame.iloc[:batch_size() - pending_rows]
+                pending.append(take)
+                pending_rows += len(take)
+                frame = frame.iloc[len(take):]
+                if pending_rows >= batch_size():
+                    yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0].reset_index(drop=True)
+                    pending, pending_rows = [], 0
+        if pending:
+            yield pd.concat(pending, ignore_index=True) if len(pending) > 1 else pending[0].reset_index(drop=True)
+
+    def _save_sketches(self, sketches: PersonSketches, merge: bool = False):
+        """
+        Save the sketches of this run, merged into the previously saved ones if `merge` is set.
+        """
+        if merge and os.path.exists(self.sketch_path):
+            saved = PersonSketches.load(self.sketch_path)
+            saved.merge(sketches)
+            sketches = saved
+        sketches.save(self.sketch_path)
@@ -0,0 +1,135 @@
+import statistics
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: memory growth is then estimated from the batches only.
+    resource = None
+
+
+def peak_memory_bytes():
+    """
+    Return the peak resident memory of the process in bytes, or None where it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BatchSizeTuner:
+    """
+    Picks the batch size maximising transform throughput within a memory ceiling, while a run is
+    in progress.
+
+    Every batch reports its rows, duration and memory (record()). The tuner starts from the
+    initial batch size (e.g. the one chosen by the previous run) and doubles it after
+    `samples_per_size` batches as long as the median rows/s improves by at least `min_gain` and the
+    memory a batch of the doubled size would need stays under `memory_limit_bytes`. It then settles
+    on the best size seen. The memory of a batch (e.g. the larger of its data's in-memory size and
+    the growth of the process's peak resident memory while it ran) is extrapolated linearly in rows,
+    from the last full batch. A settled tuner halves the batch size again if a batch exceeds the ceiling.
+
+    The row-group size of the output follows from the measured memory per row: the largest number
+    of rows, up to the batch size, whose data fits in `row_group_bytes`.
+    """
+
+    def __init__(self, batch_size: int = 1000, row_group_size: int = None, memory_limit_bytes: int = 512 * 1024 * 1024,
+                 min_batch_size: int = 100, max_batch_size: int = 1_000_000, samples_per_size: int = 2,
+                 min_gain: float = 0.05, row_group_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            batch_size (int): Batch size to start from.
+            row_group_size (int): Row-group size used until memory per row was measured. Defaults to the batch size.
+            memory_limit_bytes (int): Maximum memory a batch may need.
+            min_batch_size (int): Smallest batch size tried.
+            max_batch_size (int): Largest batch size tried.
+            samples_per_size (int): Batches measured before a batch size is judged.
+            min_gain (float): Relative throughput gain a doubled batch size must bring to be kept.
+            row_group_bytes (int): Target in-memory size of an output row group.
+        """
+        self.batch_size = min(max(int(batch_size), min_batch_size), max_batch_size)
+        self._initial_row_group_size = row_group_size
+        self.memory_limit_bytes = memory_limit_bytes
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.samples_per_size = samples_per_size
+        self.min_gain = min_gain
+        self.row_group_bytes = row_group_bytes
+        self.settled = False
+        self.best_batch_size = None
+        self.best_rows_per_second = None
+        self.bytes_per_row = None
+        self.trials = []
+        self._samples = []
+
+    @property
+    def row_group_size(self) -> int:
+        return self._row_group_size(self.batch_size)
+
+    def _row_group_size(self, batch_size: int) -> int:
+        if self.bytes_per_row is None:
+            return self._initial_row_group_size or batch_size
+        return max(1, min(batch_size, int(self.row_group_bytes / self.bytes_per_row)))
+
+    def _fits(self, batch_size: int) -> bool:
+        return self.bytes_per_row is None or batch_size * self.bytes_per_row <= self.memory_limit_bytes
+
+    def record(self, rows: int, seconds: float, memory_bytes: int):
+        """
+        Record a transformed batch and adjust the batch size.
+
+        Args:
+            rows (int): Rows of the batch.
+            seconds (float): Time spent reading, transforming and writing it.
+            memory_bytes (int): Memory the batch needed.
+        """
+        if rows <= 0:
+            return
+        # Batches shorter than the batch size (the end of the input) say little about it.
+        if rows < self.batch_size // 2:
+            if self.bytes_per_row is None:
+                self.bytes_per_row = memory_bytes / rows
+            return
+        self.bytes_per_row = memory_bytes / rows
+
+        if memory_bytes > self.memory_limit_bytes and self.batch_size > self.min_batch_size:
+            self._samples = []
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            if self.best_batch_size is not None and self.best_batch_size > self.batch_size:
+                self.best_batch_size, self.best_rows_per_second = self.batch_size, None
+            self.settled = True
+            return
+
+        self._samples.append(rows / seconds if seconds > 0 else float("inf"))
+        if self.settled or len(self._samples) < self.samples_per_size:
+            return
+
+        rows_per_second = statistics.median(self._samples)
+        self._samples = []
+        self.trials.append({"batch_size": self.batch_size, "rows_per_second": round(rows_per_second, 1)})
+        if self.best_rows_per_second is None or rows_per_second > self.best_rows_per_second * (1 + self.min_gain):
+            self.best_batch_size, self.best_rows_per_second = self.batch_size, rows_per_second
+            candidate = self.batch_size * 2
+            if candidate <= self.max_batch_size and self._fits(candidate):
+                self.batch_size = candidate
+                return
+        self.batch_size = self.best_batch_size
+        self.settled = True
+
+    def report(self) -> dict:
+        """
+        Return the chosen values and the measurements behind them, e.g. for a run report.
+        A run ending before the tuner settled reports the best batch size measured so far.
+        """
+        batch_size = self.batch_size if self.settled or self.best_batch_size is None else self.best_batch_size
+        return {
+            "batch_size": batch_size,
+            "row_group_size": self._row_group_size(batch_size),
+            "settled": self.settled,
+            "rows_per_second": None if self.best_rows_per_second is None else round(self.best_rows_per_second, 1),
+            "bytes_per_row": None if self.bytes_per_row is None else round(self.bytes_per_row, 1),
+            "memory_limit_bytes": self.memory_limit_bytes,
+            "trials": list(self.trials),
+        }
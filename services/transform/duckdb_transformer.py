@@ -0,0 +1,184 @@
+import os
+import uuid
+from datetime import datetime
+import duckdb
+from services.io_manager.io_handler import IOHandler
+from services.io_manager.parquet_io import ParquetIO
+from services.transform.geo import CELL_COLUMN, grid_cell_sql
+from services.transform.person_data_transformer import PersonDataTransformer
+from services.transform.sketches import PersonSketches
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _record_batches(cursor, batch_size: int):
+    # to_arrow_reader replaces fetch_record_batch in newer DuckDB releases.
+    if hasattr(cursor, "to_arrow_reader"):
+        return cursor.to_arrow_reader(batch_size)
+    return cursor.fetch_record_batch(batch_size)
+
+
+class DuckDBTransformer:
+    """
+    Applies the PersonDataTransformer rules as a single DuckDB query over a whole layer:
+    masking is a constant projection, the age group is arithmetic on the birthday, the email
+    provider is split_part on the email, the country and coordinates are read from the address
+    struct and the grid cell is bit arithmetic on the coordinates. The output is sorted by grid
+    cell, so its row groups cover small regions.
+
+    Raw Parquet layers are scanned with one read_parquet over all files and written with
+    `COPY (SELECT ...) TO`, so DuckDB reads, transforms and writes with all cores. Other
+    formats are read through the input handler and written through the output handler.
+
+    Invalid birthdays give the age group "nan-nan", as in the pandas engine.
+    """
+
+    def __init__(self, today: datetime = None, connection=None):
+        """
+        Args:
+            today (datetime): Reference date of the age calculation. Defaults to the current date.
+            connection: DuckDB connection each transform opens its own cursor on, so several
+                transforms can share one database and its thread pool. A new in-memory database
+                is used for each transform if omitted.
+        """
+        self.today = today
+        self.connection = connection
+
+    def _age_expression(self) -> str:
+        year = (self.today or datetime.today()).year
+        return f'{year} - year(TRY_CAST("birthday" AS DATE))'
+
+    @staticmethod
+    def _has_address_fields(connection, source: str, *fields: str) -> bool:
+        try:
+            selected = ", ".join(f'"address".{_quote(field)}' for field in fields)
+            connection.execute(f"DESCRIBE SELECT {selected} FROM {source}")
+            return True
+        except duckdb.BinderException:
+            return False
+
+    @staticmethod
+    def _country_expression(has_country: bool) -> str:
+        # Mirrors address.get('country', '****'): rows without an address, or addresses without
+        # a country field, get the masked value.
+        if has_country:
+            return """CASE WHEN "address" IS NULL THEN '****' ELSE "address"."country" END"""
+        return "'****'"
+
+    @staticmethod
+    def _coordinate_expressions(has_coordinates: bool) -> tuple:
+        # Mirrors pd.to_numeric(errors='coerce'): missing or unparsable coordinates are NULL.
+        if has_coordinates:
+            return tuple(f'TRY_CAST("address"."{field}" AS DOUBLE)' for field in ("latitude", "longitude"))
+        return "CAST(NULL AS DOUBLE)", "CAST(NULL AS DOUBLE)"
+
+    @staticmethod
+    def _email_provider_expression() -> str:
+        return """CASE WHEN strpos("email", '@') > 0 THEN split_part("email", '@', 2) END"""
+
+    def build_query(self, source: str, column_names: list, has_country: bool = True,
+                    has_coordinates: bool = True) -> str:
+        """
+        Build the query transforming the rows of a relation.
+
+        Args:
+            source (str): SQL relation (table name or table function) holding the raw data.
+            column_names (list): Columns of the relation, in order.
+            has_country (bool): Whether the address struct has a country field.
+            has_coordinates (bool): Whether the address struct has latitude and longitude fields.
+
+        Returns:
+            str: A SELECT statement producing the same columns as PersonDataTransformer.transform.
+        """
+        projection = []
+        for column in column_names:
+            if column in PersonDataTransformer.SENSITIVE_FIELDS:
+                continue
+            if column in PersonDataTransformer.UNMASKED_FIELDS:
+                projection.append(_quote(column))
+            else:
+                projection.append(f"'****' AS {_quote(column)}")
+
+        age_group = "CAST(floor(__age / 10.0) * 10 AS BIGINT)"
+        projection += [
+            f"CASE WHEN __age IS NULL THEN 'nan-nan' "
+            f"ELSE CAST({age_group} AS VARCHAR) || '-' || CAST({age_group} + 9 AS VARCHAR) END AS age_group",
+            f"{self._email_provider_expression()} AS email_provider",
+            f"{self._country_expression(has_country)} AS country",
+            "__latitude AS latitude",
+            "__longitude AS longitude",
+            f"{grid_cell_sql('__latitude', '__longitude')} AS {CELL_COLUMN}",
+        ]
+        latitude, longitude = self._coordinate_expressions(has_coordinates)
+        return (
+            f"SELECT {', '.join(projection)} "
+            f"FROM (SELECT *, {self._age_expression()} AS __age, {latitude} AS __latitude, "
+            f"{longitude} AS __longitude FROM {source})"
+        )
+
+    def transform(self, input_path: str, output_path: str, io_handler: IOHandler, output_io_handler: IOHandler,
+                  batch_size: int = 1000, columns: list = None, filters: list = None,
+                  sketches: PersonSketches = None, files: list = None) -> int:
+        """
+        Transform every raw file of the input directory into the output directory.
+
+        Args:
+            input_path (str): Directory holding the raw files.
+            output_path (str): Directory receiving the transformed files. It is not cleared.
+            io_handler (IOHandler): Handler of the raw layer.
+            output_io_handler (IOHandler): Handler of the transformed layer.
+            batch_size (int): Rows per written batch when the output is not written with COPY.
+            columns (list): Input columns to read. Defaults to all columns.
+            filters (list): Row filters in PyArrow's DNF format, applied by the input handler.
+            sketches (PersonSketches): Sketches updated with the transformed rows, if given.
+            files (list): Names of the raw files to transform. Defaults to all files of the input directory.
+
+        Returns:
+            int: Number of transformed rows.
+        """
+        with (self.connection.cursor() if self.connection is not None else duckdb.connect()) as connection:
+            source = io_handler.duckdb_source(connection, input_path, "raw_data", columns, filters, files)
+            if source is None:
+                return 0
+
+            column_names = [row[0] for row in connection.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+            has_country = self._has_address_fields(connection, source, "country")
+            has_coordinates = self._has_address_fields(connection, source, "latitude", "longitude")
+            # Cluster the output by grid cell, so bounding-box reads skip most row groups.
+            query = f"{self.build_query(source, column_names, has_country, has_coordinates)} ORDER BY {CELL_COLUMN} NULLS LAST"
+
+            if isinstance(output_io_handler, ParquetIO):
+                file_path = os.path.join(output_path, f"{uuid.uuid4()}.parquet")
+                escaped_path = file_path.replace("'", "''")
+                rows = connection.execute(
+                    f"COPY ({query}) TO '{escaped_path}' ({output_io_handler.duckdb_copy_options()})"
+                ).fetchone()[0]
+                index = output_io_handler.point_index(output_path)
+                if index is not None:
+                    index.add(file_path)
+            else:
+                rows = 0
+                reader = _record_batches(connection.execute(query), batch_size)
+                for batch in reader:
+                    output_io_handler.write(output_path, batch.to_pandas())
+                    rows += batch.num_rows
+
+            if sketches is not None:
+                self._update_sketches(connection, source, has_country, sketches, batch_size)
+
+        return rows
+
+    def _update_sketches(self, connection, source: str, has_country: bool, sketches: PersonSketches, batch_size: int):
+        """
+        Stream the columns the sketches need, computed with the same expressions as the output.
+        """
+        query = (
+            f'SELECT "unique_id", {self._email_provider_expression()} AS email_provider, '
+            f"{self._country_expression(has_country)} AS country, {self._age_expression()} AS age "
+            f"FROM {source}"
+        )
+        for batch in _record_batches(connection.execute(query), batch_size):
+            batch_df = batch.to_pandas()
+            sketches.update(batch_df, batch_df["age"])
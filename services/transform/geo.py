@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# Column holding the grid cell of each row of the intermediate layer, which is clustered by it.
+CELL_COLUMN = "geo_cell"
+
+# Bits per axis of the grid: 2^16 x 2^16 cells of about 0.0027 degrees of latitude (300 m).
+GRID_BITS = 16
+
+# Mean radius of the Earth, in kilometers.
+EARTH_RADIUS_KM = 6371.0088
+
+# Masks spreading the bits of a 16-bit integer over the even bits of a 32-bit one.
+_SPREAD_STEPS = ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555))
+
+
+def _spread(values: np.ndarray) -> np.ndarray:
+    for shift, mask in _SPREAD_STEPS:
+        values = (values | (values << shift)) & mask
+    return values
+
+
+def _quantize(values: np.ndarray, span: float) -> np.ndarray:
+    cells = np.floor((values + span / 2) / span * (1 << GRID_BITS))
+    return np.minimum(cells, (1 << GRID_BITS) - 1).astype(np.int64)
+
+
+def grid_cells(latitude, longitude) -> pd.Series:
+    """
+    Return the grid cell of every coordinate: the Z-order (Morton) code interleaving the bits of
+    the quantized longitude and latitude, as geohashes do. Cells close in the code are close on
+    the map, and the cells of a bounding box fall in a few ranges of codes (see cell_ranges).
+    Missing or out-of-range coordinates have no cell.
+
+    Args:
+        latitude: Latitudes in degrees.
+        longitude: Longitudes in degrees.
+
+    Returns:
+        pd.Series: The cells, as nullable integers, indexed like `latitude` if it is a Series.
+    """
+    index = latitude.index if isinstance(latitude, pd.Series) else None
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    valid = (np.abs(latitude) <= 90) & (np.abs(longitude) <= 180)  # False for NaN.
+
+    cells = np.zeros(len(latitude), dtype=np.int64)
+    cells[valid] = (
+        (_spread(_quantize(longitude[valid], 360.0)) << 1) | _spread(_quantize(latitude[valid], 180.0))
+    )
+    return pd.Series(pd.arrays.IntegerArray(cells, ~valid), index=index, name=CELL_COLUMN)
+
+
+def grid_cell_sql(latitude: str, longitude: str) -> str:
+    """
+    Return a DuckDB expression computing the same cell as grid_cells from two DOUBLE expressions.
+    """
+    def quantize(value, span):
+        return f"LEAST(CAST(floor(({value} + {span / 2}) / {span} * {1 << GRID_BITS}) AS BIGINT), {(1 << GRID_BITS) - 1})"
+
+    def spread(value):
+        for shift, mask in _SPREAD_STEPS:
+            value = f"(({value} | ({value} << {shift})) & {mask})"
+        return value
+
+    return (
+        f"CASE WHEN abs({latitude}) <= 90 AND abs({longitude}) <= 180 "
+        f"THEN ({spread(quantize(longitude, 360.0))} << 1) | {spread(quantize(latitude, 180.0))} END"
+    )
+
+
+def _cell(x: int, y: int) -> int:
+    return int((_spread(np.int64(x)) << 1) | _spread(np.int64(y)))
+
+
+def cell_ranges(min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float,
+                max_ranges: int = 16) -> list:
+    """
+    Return ranges of cells covering a bounding box, for row-group statistics to prune by.
+
+    The grid is a quadtree in Z-order: each of its nodes is a contiguous range of cells. The nodes
+    overlapping the box are split level by level, and the ones inside it kept whole, until splitting
+    further would give more than `max_ranges` ranges; the nodes still partly outside the box are then
+    kept whole too. Adjacent ranges are merged.
+
+    Returns:
+        list[tuple[int, int]]: The (lowest, highest) cells of each range, in increasing order.
+    """
+    min_x, max_x = _quantize(np.array([min_longitude, max_longitude], dtype=np.float64), 360.0)
+    min_y, max_y = _quantize(np.array([min_latitude, max_latitude], dtype=np.float64), 180.0)
+
+    ranges, nodes, size = [], [(0, 0)], 1 << GRID_BITS
+    while nodes:
+        partial = []
+        for x, y in nodes:
+            if x > max_x or x + size - 1 < min_x or y > max_y or y + size - 1 < min_y:
+                continue
+            if min_x <= x and x + size - 1 <= max_x and min_y <= y and y + size - 1 <= max_y:
+                ranges.append((_cell(x, y), _cell(x, y) + size * size - 1))
+            else:
+                partial.append((x, y))
+        if len(ranges) + 4 * len(partial) > max_ranges:
+            ranges.extend((_cell(x, y), _cell(x, y) + size * size - 1) for x, y in partial)
+            break
+        size //= 2
+        nodes = [(x + dx, y + dy) for x, y in partial for dx in (0, size) for dy in (0, size)]
+
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and merged[-1][1] + 1 >= low:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> tuple:
+    """
+    Return the (min_latitude, min_longitude, max_latitude, max_longitude) box holding every point
+    within `radius_km` of a point, clamped to the valid coordinates. The box spans every longitude
+    when it would cross a pole or the antimeridian.
+    """
+    delta_latitude = float(np.degrees(radius_km / EARTH_RADIUS_KM))
+    min_latitude, max_latitude = latitude - delta_latitude, latitude + delta_latitude
+    if min_latitude <= -90 or max_latitude >= 90:
+        return max(min_latitude, -90.0), -180.0, min(max_latitude, 90.0), 180.0
+
+    delta_longitude = float(np.degrees(radius_km / (EARTH_RADIUS_KM * np.cos(np.radians(latitude)))))
+    min_longitude, max_longitude = longitude - delta_longitude, longitude + delta_longitude
+    if min_longitude < -180 or max_longitude > 180:
+        min_longitude, max_longitude = -180.0, 180.0
+    return min_latitude, min_longitude, max_latitude, max_longitude
+
+
+def haversine_km(latitude: float, longitude: float, latitudes, longitudes) -> np.ndarray:
+    """
+    Return the great-circle distances, in kilometers, between a point and arrays of points.
+    """
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    latitudes = np.radians(np.asarray(latitudes, dtype=np.float64))
+    longitudes = np.radians(np.asarray(longitudes, dtype=np.float64))
+    a = (
+        np.sin((latitudes - latitude) / 2) ** 2
+        + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
@@ -1,34 +1,43 @@
 import pandas as pd
 from datetime import datetime
+from services.transform.geo import CELL_COLUMN, grid_cells
 
 class PersonDataTransformer:
+    # Fields kept as they are by the masking step; the sensitive ones are dropped after deriving the generalized columns.
+    UNMASKED_FIELDS = ['id', 'unique_id', 'birthday', 'email', 'address']
+    SENSITIVE_FIELDS = ['birthday', 'email', 'address']
+
     def __init__(self, data: pd.DataFrame):
         # Initialize with the input DataFrame
         self.data = data
 
     def mask_user_data(self, data: pd.DataFrame) -> pd.DataFrame:
         """Mask user-identifiable information except for certain fields."""
-        fields_to_leave_unmasked = ['id', 'unique_id', 'birthday', 'email', 'address']
-        
-        # Mask all columns except for those in fields_to_leave_unmasked
+        # Mask all columns except for those in UNMASKED_FIELDS
         for column in data.columns:
-            if column not in fields_to_leave_unmasked:
+            if column not in self.UNMASKED_FIELDS:
                 data[column] = '****'
         return data
 
-    def generalize_birthdate(self, birthdate: pd.Series) -> pd.Series:
-        """Generalize birthdate into age groups."""
+    def calculate_age(self, birthdate: pd.Series) -> pd.Series:
+        """Calculate the age in years from the birthdate (NaN for invalid dates)."""
         today = datetime.today()
 
         # Handle invalid or masked dates (e.g., '****')
         # Convert to datetime, but coerce invalid formats to NaT (Not a Time)
         birthdate = pd.to_datetime(birthdate, errors='coerce')  # Convert invalid dates to NaT
-        
+
+        return today.year - birthdate.dt.year
+
+    def generalize_birthdate(self, birthdate: pd.Series) -> pd.Series:
+        """Generalize birthdate into age groups."""
         # Calculate age group only for valid dates (NaT will be excluded)
-        valid_age = today.year - birthdate.dt.year
-        valid_age_group = (valid_age // 10) * 10
+        valid_age = self.calculate_age(birthdate)
+        # Integer bounds, even when an invalid date turns the ages of the batch into floats
+        valid_age_group = ((valid_age // 10) * 10).astype('Int64')
         valid_age_group_end = valid_age_group + 9
-        return valid_age_group.astype(str) + '-' + valid_age_group_end.astype(str)
+        age_group = valid_age_group.astype(str) + '-' + valid_age_group_end.astype(str)
+        return age_group.where(valid_age_group.notna(), 'nan-nan')
 
     def extract_email_provider(self, email: pd.Series) -> pd.Series:
         """Extract email domain, masking the first part."""
@@ -41,6 +50,12 @@ class PersonDataTransformer:
             lambda x: x.get('country', '****') if isinstance(x, dict) else '****'
         )
 
+    def extract_coordinates(self, address: pd.Series):
+        """Extract the latitude and longitude from the address field as floats (NaN when missing or invalid)."""
+        latitude = pd.to_numeric(address.str.get('latitude'), errors='coerce').astype('float64')
+        longitude = pd.to_numeric(address.str.get('longitude'), errors='coerce').astype('float64')
+        return latitude, longitude
+
     def transform(self) -> pd.DataFrame:
         """Perform the complete transformation."""
         transformed_data = self.data.copy()
@@ -57,8 +72,14 @@ class PersonDataTransformer:
         # Extract user country
         transformed_data['country'] = self.extract_country(transformed_data['address'])
 
+        # Keep the coordinates and derive the grid cell the intermediate layer is clustered by
+        latitude, longitude = self.extract_coordinates(transformed_data['address'])
+        transformed_data['latitude'] = latitude
+        transformed_data['longitude'] = longitude
+        transformed_data[CELL_COLUMN] = grid_cells(latitude, longitude)
+
         # Drop the sensitive fields
-        transformed_data.drop(['birthday', 'email', 'address'], axis=1, inplace=True)
+        transformed_data.drop(self.SENSITIVE_FIELDS, axis=1, inplace=True)
 
         # Return the transformed data as a DataFrame
         return transformed_data
\ No newline at end of file
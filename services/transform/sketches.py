@@ -0,0 +1,280 @@
+import base64
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from services.io_manager.hashing import hash_values
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter. Uses 2**precision one-byte registers; the relative
+    standard error of the estimate is 1.04 / sqrt(2**precision).
+    """
+
+    def __init__(self, precision: int = 14, registers: np.ndarray = None):
+        if not 11 <= precision <= 18:
+            raise ValueError("precision must be between 11 and 18.")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: pd.Series):
+        values = values.dropna()
+        if values.empty:
+            return
+
+        hashes = hash_values(values)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remaining_bits = 64 - self.precision
+        remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+
+        # rho = position of the leftmost 1-bit in the remaining bits. The remainder has at most
+        # 53 bits, so its float conversion is exact and frexp gives floor(log2) + 1.
+        _, exponent = np.frexp(remainder.astype(np.float64))
+        rho = np.where(remainder == 0, remaining_bits + 1, remaining_bits - exponent + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rho)
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw_estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if raw_estimate <= 2.5 * m and empty_registers:
+            # Linear counting is more accurate for small cardinalities.
+            return m * math.log(m / empty_registers)
+        return float(raw_estimate)
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(data["precision"], registers)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters sketch keeping at most `capacity` counters.
+
+    Every reported count is an upper bound of the true count and overestimates it by at most
+    its error, which itself is at most total / capacity.
+    """
+
+    def __init__(self, capacity: int = 100, counters: dict = None, total: int = 0):
+        self.capacity = capacity
+        # item -> [count, error]
+        self.counters = counters if counters is not None else {}
+        self.total = total
+
+    def update(self, values: pd.Series):
+        for item, count in values.dropna().value_counts().items():
+            self.add(str(item), int(count))
+
+    def add(self, item: str, count: int = 1):
+        self.total += count
+        if item in self.counters:
+            self.counters[item][0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            # Replace the smallest counter; its count becomes the new item's error.
+            smallest = min(self.counters, key=lambda key: self.counters[key][0])
+            minimum = self.counters.pop(smallest)[0]
+            self.counters[item] = [minimum + count, minimum]
+
+    def _minimum(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: "SpaceSaving"):
+        """
+        Merge another sketch. An item missing from a full sketch may have been counted up to
+        that sketch's smallest counter, which is added to its count and error.
+        """
+        own_minimum, other_minimum = self._minimum(), other._minimum()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(item, [own_minimum, own_minimum])
+            other_count, other_error = other.counters.get(item, [other_minimum, other_minimum])
+            merged[item] = [count + other_count, error + other_error]
+
+        largest = sorted(merged.items(), key=lambda entry: entry[1][0], reverse=True)[:self.capacity]
+        self.counters = {item: counter for item, counter in largest}
+        self.total += other.total
+
+    def top(self, k: int) -> list:
+        """
+        Return the k items with the largest counts as (item, count, error) tuples.
+        The true count of each item lies in [count - error, count].
+        """
+        ranked = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, count, error) for item, (count, error) in ranked[:k]]
+
+    def to_dict(self) -> dict:
+        return {"capacity": self.capacity, "counters": self.counters, "total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SpaceSaving":
+        return cls(data["capacity"], {item: list(counter) for item, counter in data["counters"].items()}, data["total"])
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative accuracy guarantees (DDSketch). Values are counted in
+    logarithmic buckets, so any returned quantile is within `relative_accuracy` of the true value.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, buckets: dict = None, zero_count: int = 0):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets = buckets if buckets is not None else {}
+        self.zero_count = zero_count
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.buckets.values())
+
+    def update(self, values: pd.Series):
+        values = pd.to_numeric(values, errors="coerce").dropna().to_numpy(dtype=np.float64)
+        if (values < 0).any():
+            raise ValueError("DDSketch only supports non-negative values.")
+
+        positive = values[values > 0]
+        self.zero_count += int(len(values) - len(positive))
+
+        indexes, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "DDSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge DDSketches with different relative accuracies.")
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float):
+        """
+        Return the approximate q-quantile, or None if the sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1.")
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+
+        cumulative = self.zero_count
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        buckets = {int(index): count for index, count in data["buckets"].items()}
+        return cls(data["relative_accuracy"], buckets, data["zero_count"])
+
+
+class PersonSketches:
+    """
+    The sketches maintained over transformed person data:
+    - distinct_users: HyperLogLog over unique_id.
+    - gmail_countries: Space-Saving over the country of Gmail users.
+    - age: DDSketch over the age of every person.
+    """
+
+    def __init__(self, distinct_users=None, gmail_countries=None, age=None, rows=0):
+        self.distinct_users = distinct_users or HyperLogLog()
+        self.gmail_countries = gmail_countries or SpaceSaving()
+        self.age = age or DDSketch()
+        self.rows = rows
+
+    def update(self, transformed_data: pd.DataFrame, ages: pd.Series):
+        """
+        Update the sketches with a transformed batch.
+
+        Args:
+            transformed_data (pd.DataFrame): Output of PersonDataTransformer for the batch.
+            ages (pd.Series): Age of every person of the batch. Negative ages (birthdays in the
+                future) are left out of the age sketch, like missing ones.
+        """
+        self.rows += len(transformed_data)
+        self.distinct_users.update(transformed_data["unique_id"])
+        gmail_users = transformed_data["email_provider"] == "gmail.com"
+        self.gmail_countries.update(transformed_data.loc[gmail_users, "country"])
+        ages = pd.to_numeric(ages, errors="coerce")
+        self.age.update(ages[ages >= 0])
+
+    def merge(self, other: "PersonSketches"):
+        self.distinct_users.merge(other.distinct_users)
+        self.gmail_countries.merge(other.gmail_countries)
+        self.age.merge(other.age)
+        self.rows += other.rows
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "distinct_users": self.distinct_users.to_dict(),
+            "gmail_countries": self.gmail_countries.to_dict(),
+            "age": self.age.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PersonSketches":
+        return cls(
+            HyperLogLog.from_dict(data["distinct_users"]),
+            SpaceSaving.from_dict(data["gmail_countries"]),
+            DDSketch.from_dict(data["age"]),
+            data["rows"],
+        )
+
+    def save(self, path: str):
+        """
+        Write the sketches to a JSON file, atomically replacing any previous version.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PersonSketches":
+        """
+        Read sketches saved with save().
+
+        Raises:
+            FileNotFoundError: If no sketches were saved at the path.
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -2,8 +2,14 @@ import pytest
 import pandas as pd
 import requests
 from unittest.mock import MagicMock
+from services.ingress import api_handler as api_handler_module
 from services.ingress.api_handler import ApiHandler
+from services.ingress.lease_coordinator import LeaseCoordinator
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+from services.io_manager.parquet_io import ParquetIO
+from tempfile import TemporaryDirectory
 import hashlib
+import os
 
 
 # Sample data extracted from the JSON
@@ -130,3 +136,155 @@ def test_generate_unique_hash():
 
     # Verify that the hash matches
     assert expected_hash == calculated_hash
+
+
+def test_fetch_and_store_shard(mocker):
+    mock_io_handler = MagicMock()
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", return_value=mock_api_data)
+
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"))
+        coordinator.plan(total_records=3, batch_size=1)
+
+        api_handler = ApiHandler(mock_io_handler, "https://example.com/api", {}, "/output/path")
+        rows = api_handler.fetch_and_store_shard(coordinator, worker_id="worker-1")
+
+        assert rows == 3 * len(mock_api_data["data"])
+        # Pages are written under offset-based names and the output is not cleared by workers
+        file_names = [call.args[2] for call in mock_io_handler.write.call_args_list]
+        assert file_names == ["part-000000000000", "part-000000000001", "part-000000000002"]
+        mock_io_handler.clear.assert_not_called()
+        assert coordinator.progress()["done"] == 3
+
+
+def test_failed_shard_write_releases_the_lease(mocker):
+    mock_io_handler = MagicMock()
+    mock_io_handler.write.side_effect = FileNotFoundError("staging directory not created yet")
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", return_value=mock_api_data)
+
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"))
+        coordinator.plan(total_records=1, batch_size=1)
+
+        api_handler = ApiHandler(mock_io_handler, "https://example.com/api", {}, "/output/path")
+        with pytest.raises(FileNotFoundError):
+            api_handler.fetch_and_store_shard(coordinator, worker_id="worker-1")
+
+        # Another worker can claim the page right away
+        assert coordinator.progress()["pending"] == 1
+        assert coordinator.claim("worker-2") == (0, 1)
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_write_behind_writes_every_page(mocker, sharded):
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", return_value=mock_api_data)
+
+    with TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "raw/")
+        os.makedirs(output_path)
+        io_handler = ParquetIO()
+        api_handler = ApiHandler(io_handler, "https://example.com/api", {}, output_path, write_behind=True)
+
+        if sharded:
+            coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"))
+            coordinator.plan(total_records=4, batch_size=1)
+            rows = api_handler.fetch_and_store_shard(coordinator, worker_id="worker-1")
+            assert coordinator.progress()["done"] == 4
+        else:
+            rows = api_handler.fetch_and_store_data(total_records=4, batch_size=1)
+
+        assert rows == 4 * len(mock_api_data["data"])
+        assert len(io_handler.read_all(output_path)) == 4 * len(mock_api_data["data"])
+
+
+def test_invalid_records_are_quarantined(mocker):
+    invalid_record = dict(mock_api_data["data"][0], id=2, email="not-an-email")
+    page = dict(mock_api_data, data=[mock_api_data["data"][0], invalid_record])
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", return_value=page)
+
+    with TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "raw/")
+        dead_letter_path = os.path.join(temp_dir, "dead_letter/")
+        os.makedirs(output_path)
+        os.makedirs(dead_letter_path)
+        io_handler = ArrowIPCIO()
+
+        api_handler = ApiHandler(io_handler, "https://example.com/api", {}, output_path,
+                                 dead_letter_path=dead_letter_path)
+        api_handler.fetch_and_store_data(total_records=2, batch_size=2)
+        # A refetched page replaces its rejects instead of duplicating them
+        api_handler.fetch_and_store_data(total_records=2, batch_size=2)
+
+        # The valid record continues down the pipeline
+        assert io_handler.read_all(output_path)["id"].tolist() == [1]
+
+        # Dead letters are a Parquet dataset, whatever the raw format
+        assert os.listdir(dead_letter_path) == ["offset-000000000000.parquet"]
+        dead_letters = ParquetIO().read_all(dead_letter_path)
+        assert dead_letters["offset"].tolist() == [1]
+        assert "email" in dead_letters["reason"][0]
+
+        # Once the validation rules accept the record, it can be replayed
+        mocker.patch("services.ingress.api_handler.partition_api_response",
+                     side_effect=lambda data: (data["data"], []))
+        assert api_handler.replay_dead_letters() == (1, 0)
+        assert sorted(io_handler.read_all(output_path)["id"].tolist()) == [1, 2]
+        assert os.listdir(dead_letter_path) == []
+
+
+def test_replay_rewrites_only_the_replayed_dead_letter_files(mocker):
+    invalid_records = [dict(mock_api_data["data"][0], id=record_id, email="not-an-email") for record_id in (2, 3)]
+    pages = [dict(mock_api_data, data=[record]) for record in invalid_records]
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", side_effect=pages)
+
+    with TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "raw/")
+        dead_letter_path = os.path.join(temp_dir, "dead_letter/")
+        os.makedirs(output_path)
+        os.makedirs(dead_letter_path)
+        api_handler = ApiHandler(ParquetIO(), "https://example.com/api", {}, output_path,
+                                 dead_letter_path=dead_letter_path)
+        api_handler.fetch_and_store_data(total_records=2, batch_size=1)
+        assert sorted(os.listdir(dead_letter_path)) == ["offset-000000000000.parquet", "offset-000000000001.parquet"]
+
+        # A crash while rewriting the dead letters loses none of them
+        write = mocker.patch.object(api_handler.dead_letter_io_handler, "write", side_effect=OSError("disk full"))
+        with pytest.raises(OSError):
+            api_handler.replay_dead_letters()
+        assert len(ParquetIO().read_all(dead_letter_path)) == 2
+        mocker.stop(write)
+
+        # The record with id 2 is now accepted, the one with id 3 is still rejected
+        partition = api_handler_module.partition_api_response
+        mocker.patch("services.ingress.api_handler.partition_api_response", side_effect=lambda data: (
+            [record for record in data["data"] if record["id"] == 2],
+            [item for item in partition(data)[1] if item["record"]["id"] == 3],
+        ))
+        assert api_handler.replay_dead_letters() == (1, 1)
+        assert os.listdir(dead_letter_path) == ["offset-000000000001.parquet"]
+        assert ParquetIO().read_all(dead_letter_path)["offset"].tolist() == [1]
+
+
+def test_invalid_record_fails_page_without_dead_letter_path(mocker):
+    invalid_record = dict(mock_api_data["data"][0], email="not-an-email")
+    mocker.patch.object(ApiHandler, "_fetch_with_retries", return_value=dict(mock_api_data, data=[invalid_record]))
+
+    api_handler = ApiHandler(MagicMock(), "https://example.com/api", {}, "/output/path")
+    with pytest.raises(ValueError):
+        api_handler.fetch_and_store_data(total_records=1, batch_size=1)
+
+
+def test_requests_go_through_the_shared_session(mocker):
+    mock_get = mocker.patch("services.ingress.api_handler.requests.get")
+    session = MagicMock()
+    session.get.return_value.json.return_value = mock_api_data
+    handlers = [
+        ApiHandler(MagicMock(), "http://example.com/api", {"_gender": gender}, "raw/", session=session)
+        for gender in ("male", "female")
+    ]
+
+    for handler in handlers:
+        handler._fetch_with_retries()
+
+    assert [call.kwargs["params"]["_gender"] for call in session.get.call_args_list] == ["male", "female"]
+    mock_get.assert_not_called()
@@ -0,0 +1,79 @@
+import os
+import pytest
+import pandas as pd
+import pyarrow as pa
+from tempfile import TemporaryDirectory
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+
+
+def test_write_and_read_all():
+    data1 = pd.DataFrame({"col1": [1, 2], "col2": ["A", "B"]})
+    data2 = pd.DataFrame({"col1": [3, 4], "col2": ["C", "D"]})
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ArrowIPCIO()
+        handler.write(temp_dir, data1, file_name="file1")
+        handler.write(temp_dir, data2, file_name="file2")
+
+        assert sorted(os.listdir(temp_dir)) == ["file1.arrow", "file2.arrow"]
+
+        combined_data = handler.read_all(temp_dir)
+        expected_data = pd.concat([data1, data2], ignore_index=True)
+        pd.testing.assert_frame_equal(combined_data, expected_data)
+
+
+def test_read_yields_one_dataframe_per_file():
+    data = pd.DataFrame({"id": [1], "address": [{"country": "UK"}]})
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ArrowIPCIO()
+        handler.write(temp_dir, data)
+        handler.write(temp_dir, data)
+
+        batches = list(handler.read(temp_dir))
+
+        assert len(batches) == 2
+        assert batches[0]["address"][0] == {"country": "UK"}
+
+
+def test_read_table_is_memory_mapped():
+    data = pd.DataFrame({"value": range(1000)})
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ArrowIPCIO()
+        handler.write(temp_dir, data)
+
+        allocated_before = pa.total_allocated_bytes()
+        table = handler.read_table(temp_dir)
+
+        assert table.num_rows == 1000
+        # Buffers point into the mapped file instead of newly allocated memory
+        assert pa.total_allocated_bytes() == allocated_before
+
+
+def test_read_all_missing_files():
+    with TemporaryDirectory() as temp_dir:
+        with pytest.raises(FileNotFoundError):
+            ArrowIPCIO().read_all(temp_dir)
+
+
+def test_clear_folder():
+    with TemporaryDirectory() as temp_dir:
+        handler = ArrowIPCIO()
+        handler.write(temp_dir, pd.DataFrame({"a": [1]}))
+        handler.clear(temp_dir)
+
+        assert os.listdir(temp_dir) == []
+
+
+def test_read_with_column_projection_and_filters():
+    data = pd.DataFrame({"id": range(10), "country": ["Germany", "France"] * 5})
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ArrowIPCIO()
+        handler.write(temp_dir, data)
+
+        result = handler.read_all(temp_dir, columns=["id"], filters=[("country", "==", "France")])
+
+        assert result.columns.tolist() == ["id"]
+        assert result["id"].tolist() == [1, 3, 5, 7, 9]
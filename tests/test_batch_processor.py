@@ -6,6 +6,7 @@ from services.io_manager.parquet_io import ParquetIO
 from tempfile import TemporaryDirectory
 from services.transform.person_data_transformer import PersonDataTransformer
 from services.transform.batch_processor import BatchProcessor
+from services.transform.sketches import PersonSketches
 
 
 def test_batch_processor_end_to_end():
@@ -15,14 +16,17 @@ def test_batch_processor_end_to_end():
         'unique_id': ['abc123', 'def456'],
         'birthday': ['1980-05-10', '1990-07-20'],
         'email': ['user1@example.com', 'user2@gmail.com'],
-        'address': [{'country': 'USA'}, {'country': 'Canada'}],
+        'address': [
+            {'country': 'USA', 'latitude': 42.36, 'longitude': -71.06},
+            {'country': 'Canada', 'latitude': 43.65, 'longitude': -79.38},
+        ],
     })
     batch2 = pd.DataFrame({
         'id': [3],
         'unique_id': ['ghi789'],
         'birthday': ['2000-12-12'],
         'email': ['user3@yahoo.com'],
-        'address': [{'country': 'UK'}],
+        'address': [{'country': 'UK', 'latitude': None, 'longitude': None}],
     })
 
     # Expected transformed data
@@ -32,6 +36,9 @@ def test_batch_processor_end_to_end():
         'age_group': ['40-49', '30-39'],
         'email_provider': ['example.com', 'gmail.com'],
         'country': ['USA', 'Canada'],
+        'latitude': [42.36, 43.65],
+        'longitude': [-71.06, -79.38],
+        'geo_cell': pd.array([1710370686, 1702789554], dtype='Int64'),
     })
     expected_transformed_batch2 = pd.DataFrame({
         'id': [3],
@@ -39,6 +46,9 @@ def test_batch_processor_end_to_end():
         'age_group': ['20-29'],
         'email_provider': ['yahoo.com'],
         'country': ['UK'],
+        'latitude': [float('nan')],
+        'longitude': [float('nan')],
+        'geo_cell': pd.array([None], dtype='Int64'),
     })
 
     with TemporaryDirectory() as temp_dir:
@@ -101,3 +111,137 @@ def test_process_no_files(mocker):
 
     # Verify write was never called (no files to process)
     mock_io_handler.write.assert_not_called()
+
+
+def test_batch_processor_builds_and_merges_sketches():
+    batch = pd.DataFrame({
+        'id': [1, 2, 3],
+        'unique_id': ['abc123', 'def456', 'ghi789'],
+        'birthday': ['1980-05-10', '1990-07-20', '2000-12-12'],
+        'email': ['user1@gmail.com', 'user2@gmail.com', 'user3@yahoo.com'],
+        'address': [{'country': 'USA'}, {'country': 'USA'}, {'country': 'UK'}],
+    })
+    new_batch = pd.DataFrame({
+        'id': [4],
+        'unique_id': ['jkl012'],
+        'birthday': ['1970-01-01'],
+        'email': ['user4@gmail.com'],
+        'address': [{'country': 'USA'}],
+    })
+
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input/")
+        output_path = os.path.join(temp_dir, "output/")
+        sketch_path = os.path.join(temp_dir, "mart", "sketches.json")
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+        batch.to_parquet(os.path.join(input_path, "batch.parquet"))
+
+        processor = BatchProcessor(
+            input_path, output_path, ParquetIO(), sketch_path=sketch_path,
+            state_path=os.path.join(temp_dir, "processed.json"),
+        )
+        processor.process()
+        first = PersonSketches.load(sketch_path).to_dict()
+
+        # A second full run rewrites the output and replaces the sketches instead of counting the rows twice
+        processor.process()
+        assert PersonSketches.load(sketch_path).to_dict() == first
+
+        # An incremental run merges the new rows into the saved sketches
+        new_batch.to_parquet(os.path.join(input_path, "new_batch.parquet"))
+        processor.process(incremental=True)
+        sketches = PersonSketches.load(sketch_path)
+        assert sketches.rows == 4
+        assert sketches.gmail_countries.top(1) == [('USA', 3, 0)]
+        assert round(sketches.distinct_users.estimate()) == 4
+
+
+@pytest.mark.parametrize("engine", BatchProcessor.ENGINES)
+def test_incremental_processing_transforms_only_new_files(engine):
+    def person(i):
+        return {'id': i, 'unique_id': f'uid-{i}', 'birthday': '1980-05-10', 'email': f'user{i}@gmail.com',
+                'address': {'country': 'USA'}}
+
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input/")
+        output_path = os.path.join(temp_dir, "output/")
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+        io_handler = ParquetIO()
+        io_handler.write(input_path, pd.DataFrame([person(1), person(2)]), file_name="page-0")
+        processor = BatchProcessor(
+            input_path, output_path, io_handler, engine=engine,
+            sketch_path=os.path.join(temp_dir, "sketches.json"), state_path=os.path.join(temp_dir, "state.json"),
+        )
+
+        assert processor.process() == 2
+        assert processor.process(incremental=True) == 0
+
+        io_handler.write(input_path, pd.DataFrame([person(3)]), file_name="page-1")
+        assert processor.process(incremental=True) == 1
+
+        assert sorted(io_handler.read_all(output_path)['id']) == [1, 2, 3]
+        assert PersonSketches.load(os.path.join(temp_dir, "sketches.json")).rows == 3
+
+
+def test_incremental_processing_requires_a_state_path():
+    with pytest.raises(ValueError, match="state_path"):
+        BatchProcessor("in/", "out/", ParquetIO()).process(incremental=True)
+
+
+def test_batches_span_files_and_autotune_reports_its_choice():
+    def people(ids):
+        return pd.DataFrame([
+            {'id': i, 'unique_id': f'uid-{i}', 'birthday': '1980-05-10', 'email': f'user{i}@gmail.com',
+             'address': {'country': 'USA', 'latitude': 52.5, 'longitude': 13.4}}
+            for i in ids
+        ])
+
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input/")
+        output_path = os.path.join(temp_dir, "output/")
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+        io_handler = ParquetIO()
+        for part in range(5):
+            io_handler.write(input_path, people(range(part * 300, (part + 1) * 300)), file_name=f"page-{part}")
+
+        processor = BatchProcessor(input_path, output_path, io_handler, batch_size=500)
+        assert processor.process() == 1500
+        assert [len(df) for df in io_handler.read(output_path, batch_size=10000)] == [500, 500, 500]
+        assert processor.tuning is None
+
+        processor = BatchProcessor(input_path, output_path, io_handler, batch_size=100, autotune=True)
+        assert processor.process() == 1500
+        assert sorted(io_handler.read_all(output_path)['id']) == list(range(1500))
+        assert processor.tuning['batch_size'] >= 100
+        assert 0 < processor.tuning['row_group_size'] <= processor.tuning['batch_size']
+        assert processor.tuning['bytes_per_row'] > 0
+
+
+@pytest.mark.parametrize("engine", BatchProcessor.ENGINES)
+def test_future_birthday_does_not_abort_the_transform(engine):
+    batch = pd.DataFrame({
+        'id': [1, 2],
+        'unique_id': ['abc123', 'def456'],
+        'birthday': ['1980-05-10', '2090-01-01'],
+        'email': ['user1@gmail.com', 'user2@gmail.com'],
+        'address': [{'country': 'USA'}, {'country': 'UK'}],
+    })
+
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "input/")
+        output_path = os.path.join(temp_dir, "output/")
+        sketch_path = os.path.join(temp_dir, "sketches.json")
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+        batch.to_parquet(os.path.join(input_path, "batch.parquet"))
+
+        processor = BatchProcessor(input_path, output_path, ParquetIO(), sketch_path=sketch_path, engine=engine)
+        assert processor.process() == 2
+
+        sketches = PersonSketches.load(sketch_path)
+        assert sketches.rows == 2
+        # The negative age is left out of the age quantiles
+        assert sketches.age.count == 1
@@ -0,0 +1,65 @@
+from services.transform.batch_tuner import BatchSizeTuner, peak_memory_bytes
+
+
+def _run(tuner, throughput, bytes_per_row=100, batches=40):
+    """Feed the tuner batches whose rows/s is throughput(batch_size)."""
+    for _ in range(batches):
+        rows = tuner.batch_size
+        tuner.record(rows, rows / throughput(rows), rows * bytes_per_row)
+    return tuner
+
+
+def test_grows_while_throughput_improves_then_settles_on_the_best_size():
+    # Throughput improves up to 8000 rows, then degrades.
+    tuner = _run(BatchSizeTuner(batch_size=1000), lambda rows: 1000 + min(rows, 8000) - max(0, rows - 8000))
+
+    assert tuner.settled
+    assert tuner.batch_size == 8000
+    assert [trial["batch_size"] for trial in tuner.trials] == [1000, 2000, 4000, 8000, 16000]
+
+
+def test_stops_growing_at_the_memory_ceiling():
+    tuner = _run(BatchSizeTuner(batch_size=1000, memory_limit_bytes=500_000), lambda rows: rows, bytes_per_row=100)
+
+    assert tuner.batch_size == 4000
+    assert tuner.report()["bytes_per_row"] == 100
+
+
+def test_shrinks_when_a_batch_exceeds_the_ceiling():
+    tuner = BatchSizeTuner(batch_size=8000, memory_limit_bytes=500_000)
+
+    tuner.record(8000, 1.0, 8000 * 100)
+
+    assert tuner.settled
+    assert tuner.batch_size == 4000
+
+
+def test_short_batches_are_not_judged():
+    tuner = BatchSizeTuner(batch_size=1000)
+    for _ in range(10):
+        tuner.record(10, 1.0, 1000)
+
+    assert tuner.batch_size == 1000
+    assert tuner.trials == []
+
+
+def test_row_group_size_follows_the_memory_per_row():
+    tuner = BatchSizeTuner(batch_size=1000, row_group_size=500, row_group_bytes=20_000)
+    assert tuner.row_group_size == 500
+
+    tuner.record(1000, 1.0, 100_000)
+
+    assert tuner.row_group_size == 200
+    assert tuner.report()["row_group_size"] == 200
+
+
+def test_peak_memory_is_measured():
+    assert peak_memory_bytes() is None or peak_memory_bytes() > 0
+
+
+def test_unsettled_report_gives_the_best_measured_size():
+    tuner = _run(BatchSizeTuner(batch_size=1000), lambda rows: rows, batches=4)
+
+    assert not tuner.settled
+    assert tuner.batch_size == 4000
+    assert tuner.report()["batch_size"] == 2000
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from tempfile import TemporaryDirectory
+from services.scheduler.daemon import PipelineDaemon
+
+
+class FakePipeline:
+    def __init__(self, fail=False):
+        self.full_runs = 0
+        self.increments = []
+        self.fail = fail
+
+    def needs_full_run(self):
+        return self.full_runs == 0
+
+    def run(self):
+        self.full_runs += 1
+        return {"ingest": 100, "transform": 100, "percentage_gmail_users_in_germany": None}
+
+    def run_increment(self, records=None):
+        if self.fail:
+            raise RuntimeError("API unavailable")
+        self.increments.append(records)
+        return {"ingest[a]": 10, "ingest[b]": 5, "transform[a]": 10, "transform[b]": 5}
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_first_cycle_is_full_and_later_cycles_are_incremental():
+    pipeline = FakePipeline()
+    daemon = PipelineDaemon(pipeline, increment_records=50)
+
+    first = daemon.run_cycle("startup")
+    second = daemon.run_cycle()
+
+    assert (first["mode"], first["ingested_rows"]) == ("full", 100)
+    assert second["mode"] == "incremental"
+    assert (second["ingested_rows"], second["transformed_rows"]) == (15, 15)
+    assert pipeline.increments == [50]
+    assert daemon.stats()["last_cycle"]["cycle"] == 2
+
+
+def test_file_drop_and_requests_trigger_cycles():
+    with TemporaryDirectory() as temp_dir:
+        pipeline = FakePipeline()
+        daemon = PipelineDaemon(pipeline, trigger_dir=os.path.join(temp_dir, "triggers"), poll_interval=0.01)
+        thread = threading.Thread(target=daemon.run, daemon=True)
+        thread.start()
+        try:
+            _wait_until(lambda: daemon.cycles == 1)
+            open(os.path.join(daemon.trigger_dir, "refresh"), "w").close()
+            _wait_until(lambda: daemon.cycles == 2 and not daemon.running)
+            assert daemon.last_cycle["reason"] == "file"
+            assert os.listdir(daemon.trigger_dir) == []
+
+            daemon.trigger()
+            _wait_until(lambda: daemon.cycles == 3 and not daemon.running)
+            assert daemon.last_cycle["reason"] == "request"
+        finally:
+            daemon.stop()
+            thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert (pipeline.full_runs, len(pipeline.increments)) == (1, 2)
+
+
+def test_scheduled_cycles():
+    daemon = PipelineDaemon(FakePipeline(), interval=0.05, poll_interval=0.01)
+
+    daemon.run(max_cycles=3)
+
+    assert daemon.last_cycle["reason"] == "schedule"
+
+
+def test_http_health_stats_and_trigger():
+    pipeline = FakePipeline(fail=True)
+    daemon = PipelineDaemon(pipeline)
+    daemon.run_cycle("startup")
+    server = daemon.serve(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base_url}/health") as response:
+            assert json.loads(response.read())["status"] == "ok"
+
+        daemon.run_cycle()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base_url}/health")
+        assert error.value.code == 503
+        with urllib.request.urlopen(f"{base_url}/stats") as response:
+            last_cycle = json.loads(response.read())["last_cycle"]
+        assert (last_cycle["status"], last_cycle["error"]) == ("failed", "API unavailable")
+
+        request = urllib.request.Request(f"{base_url}/trigger", method="POST")
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 202
+        assert daemon._triggered.is_set()
+    finally:
+        server.shutdown()
+        server.server_close()
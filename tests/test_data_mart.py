@@ -0,0 +1,282 @@
+import os
+import numpy as np
+import pytest
+import pandas as pd
+from tempfile import TemporaryDirectory
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+from services.io_manager.parquet_io import ParquetIO
+from services.egress.data_mart import DataMart
+from services.cache.disk_cache import DiskCache
+from services.transform.geo import grid_cells, haversine_km
+from services.transform.sketches import PersonSketches
+
+
+intermediate_data = pd.DataFrame({
+    'id': [1, 2, 3, 4, 5],
+    'unique_id': ['a', 'b', 'c', 'd', 'e'],
+    'age_group': ['60-69', '30-39', '70-79', '20-29', '60-69'],
+    'email_provider': ['gmail.com', 'gmail.com', 'gmail.com', 'yahoo.com', 'gmail.com'],
+    'country': ['Germany', 'France', 'Germany', 'Germany', 'Spain'],
+})
+
+
+def _create_mart(temp_dir):
+    input_dir = os.path.join(temp_dir, "intermediate/")
+    output_dir = os.path.join(temp_dir, "mart/")
+    os.makedirs(input_dir)
+    intermediate_data.to_parquet(os.path.join(input_dir, "part.parquet"))
+    return DataMart(input_dir, output_dir, ParquetIO())
+
+
+def test_calculate_metrics():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        assert data_mart.calculate_percentage_gmail_users_in_germany()['percentage'].tolist() == [40.0]
+        assert data_mart.calculate_gmail_users_over_age_60()['users_count'].tolist() == [3]
+
+        top_countries = data_mart.calculate_top_three_countries_using_gmail()
+        assert top_countries.sort_values('rank')['country'].tolist()[0] == 'Germany'
+
+
+def test_run_all_runs_metrics_concurrently_and_saves_them():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        results = dict(data_mart.run_all(max_workers=3))
+
+        assert set(results) == set(DataMart.METRIC_FILES)
+        assert results['percentage_gmail_users_in_germany']['percentage'].tolist() == [40.0]
+        for file_name in DataMart.METRIC_FILES.values():
+            assert os.path.exists(os.path.join(data_mart.output_dir, f"{file_name}.parquet"))
+
+
+def test_run_all_rejects_unknown_metrics():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        with pytest.raises(ValueError, match="not_a_metric"):
+            data_mart.run_all(["not_a_metric"])
+
+
+def test_results_are_served_from_cache_until_input_changes(mocker):
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+        data_mart.cache = DiskCache(os.path.join(temp_dir, "cache"), suffix=".parquet")
+        execute = mocker.spy(data_mart, "_execute")
+
+        first = data_mart.calculate_gmail_users_over_age_60()
+        second = data_mart.calculate_gmail_users_over_age_60()
+        assert execute.call_count == 1
+        pd.testing.assert_frame_equal(first, second)
+
+        # An explicit refresh bypasses the cache
+        data_mart.calculate_gmail_users_over_age_60(refresh=True)
+        assert execute.call_count == 2
+
+        # New input data invalidates the cached result
+        intermediate_data.to_parquet(os.path.join(data_mart.input_dir, "part2.parquet"))
+        assert data_mart.calculate_gmail_users_over_age_60()['users_count'].tolist() == [6]
+        assert execute.call_count == 3
+
+
+def test_result_evicted_while_being_read_is_recomputed(mocker):
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+        data_mart.cache = DiskCache(os.path.join(temp_dir, "cache"), suffix=".parquet")
+        data_mart.calculate_gmail_users_over_age_60()
+
+        # Another process evicts the entry between the lookup and the read.
+        get_path = data_mart.cache.get_path
+
+        def get_path_then_evict(key):
+            path = get_path(key)
+            if path is not None:
+                os.remove(path)
+            return path
+
+        mocker.patch.object(data_mart.cache, "get_path", side_effect=get_path_then_evict)
+        execute = mocker.spy(data_mart, "_execute")
+        assert data_mart.calculate_gmail_users_over_age_60()['users_count'].tolist() == [3]
+        assert execute.call_count == 1
+
+
+def test_approximate_metrics_from_sketches():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        with pytest.raises(ValueError):
+            data_mart.approximate_distinct_users()
+
+        sketches = PersonSketches()
+        sketches.update(intermediate_data, pd.Series([65, 35, 75, 25, 61]))
+        data_mart.sketch_path = os.path.join(temp_dir, "sketches.json")
+        sketches.save(data_mart.sketch_path)
+
+        distinct_users = data_mart.approximate_distinct_users()
+        assert distinct_users['distinct_users'].tolist() == [5]
+        assert distinct_users['lower_bound'][0] <= 5 <= distinct_users['upper_bound'][0]
+
+        top_countries = data_mart.approximate_top_countries_using_gmail(k=1)
+        assert top_countries[['country', 'gmail_users', 'rank']].values.tolist() == [['Germany', 2, 1]]
+
+        median = data_mart.approximate_age_quantiles([0.5]).iloc[0]
+        assert median['lower_bound'] <= 61 <= median['upper_bound']
+
+
+def test_metrics_read_only_the_columns_and_rows_they_need(mocker):
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+        read_table = mocker.spy(data_mart.io_handler, "read_table")
+
+        assert data_mart.calculate_gmail_users_over_age_60()['users_count'].tolist() == [3]
+
+        read_table.assert_called_once_with(
+            data_mart.input_dir,
+            columns=["age_group", "email_provider"],
+            filters=[("email_provider", "==", "gmail.com")],
+        )
+
+
+def _create_large_mart(temp_dir, io_handler):
+    input_dir = os.path.join(temp_dir, "intermediate/")
+    os.makedirs(input_dir)
+    rows = 50000
+    io_handler.write(input_dir, pd.DataFrame({
+        'age_group': (['60-69', '30-39', '70-79', '20-29'] * rows)[:rows],
+        'email_provider': (['gmail.com', 'gmail.com', 'yahoo.com'] * rows)[:rows],
+        'country': (['Germany', 'France', 'Germany', 'Spain', 'Italy'] * rows)[:rows],
+    }))
+    return DataMart(input_dir, os.path.join(temp_dir, "mart/"), io_handler)
+
+
+@pytest.mark.parametrize("io_handler", [ParquetIO(), ArrowIPCIO()])
+def test_sampled_metrics_bracket_the_exact_values(io_handler):
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_large_mart(temp_dir, io_handler)
+
+        exact_percentage = data_mart.calculate_percentage_gmail_users_in_germany()['percentage'].iloc[0]
+        percentage = data_mart.calculate_percentage_gmail_users_in_germany(approximate=True, sample=0.1, seed=7)
+        assert 4000 < percentage['sample_rows'].iloc[0] < 6000
+        assert percentage['lower_bound'].iloc[0] <= exact_percentage <= percentage['upper_bound'].iloc[0]
+
+        exact_count = data_mart.calculate_gmail_users_over_age_60()['users_count'].iloc[0]
+        count = data_mart.calculate_gmail_users_over_age_60(approximate=True, sample=0.1, seed=7).iloc[0]
+        assert count['lower_bound'] <= exact_count <= count['upper_bound']
+
+        exact_top = data_mart.calculate_top_three_countries_using_gmail().set_index('country')['gmail_users']
+        top = data_mart.calculate_top_three_countries_using_gmail(approximate=True, sample=0.1, seed=7)
+        assert list(top.columns) == ['country', 'gmail_users', 'lower_bound', 'upper_bound', 'rank']
+        assert top['country'].iloc[0] == 'Germany'
+        for row in top.itertuples():
+            assert row.lower_bound <= exact_top[row.country] <= row.upper_bound
+
+
+def test_full_sample_gives_exact_values():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        count = data_mart.calculate_gmail_users_over_age_60(approximate=True, sample=1.0).iloc[0]
+        assert (count['users_count'], count['lower_bound'], count['upper_bound']) == (3, 3, 3)
+        percentage = data_mart.calculate_percentage_gmail_users_in_germany(approximate=True, sample=1.0)
+        assert percentage['percentage'].tolist() == [40.0]
+        # Sampled results are not saved to the mart.
+        assert not os.path.exists(data_mart.output_dir)
+
+
+def test_invalid_sample_fraction_is_rejected():
+    with TemporaryDirectory() as temp_dir:
+        data_mart = _create_mart(temp_dir)
+
+        with pytest.raises(ValueError, match="sample"):
+            data_mart.calculate_gmail_users_over_age_60(approximate=True, sample=0)
+
+
+@pytest.mark.parametrize("io_handler", [ParquetIO(), ArrowIPCIO()])
+def test_partitioned_metrics_are_computed_per_partition(io_handler):
+    with TemporaryDirectory() as temp_dir:
+        partitions = {
+            "_gender=female": os.path.join(temp_dir, "intermediate/config=a/"),
+            "_gender=male": os.path.join(temp_dir, "intermediate/config=b/"),
+            "_gender=other": os.path.join(temp_dir, "intermediate/config=c/"),
+        }
+        for path in partitions.values():
+            os.makedirs(path)
+        io_handler.write(partitions["_gender=female"], intermediate_data)
+        io_handler.write(partitions["_gender=male"], intermediate_data.iloc[:3])
+        # The third configuration produced no rows.
+        data_mart = DataMart(
+            os.path.join(temp_dir, "intermediate/"), os.path.join(temp_dir, "mart/"), io_handler,
+            partitions=partitions,
+        )
+
+        percentage = data_mart.calculate_percentage_gmail_users_in_germany()
+        assert percentage["config"].tolist() == ["_gender=female", "_gender=male"]
+        assert percentage["percentage"].tolist() == pytest.approx([40.0, 66.67])
+        over_60 = data_mart.calculate_gmail_users_over_age_60()
+        assert dict(zip(over_60["config"], over_60["users_count"])) == {"_gender=female": 3, "_gender=male": 2}
+        top = data_mart.calculate_top_three_countries_using_gmail()
+        assert list(top.columns) == ["config", "country", "gmail_users", "rank"]
+        assert top[top["rank"] == 1].set_index("config")["country"].to_dict() == {
+            "_gender=female": "Germany", "_gender=male": "Germany",
+        }
+
+        sampled = data_mart.calculate_top_three_countries_using_gmail(approximate=True, sample=1.0)
+        assert sampled[["config", "country", "gmail_users", "rank"]].sort_values(["config", "rank", "country"]).to_dict(
+            "records"
+        ) == top.sort_values(["config", "rank", "country"]).to_dict("records")
+        sampled_percentage = data_mart.calculate_percentage_gmail_users_in_germany(approximate=True, sample=1.0)
+        assert sampled_percentage["percentage"].tolist() == [40.0, 66.67]
+
+
+def _create_geo_mart(temp_dir, io_handler):
+    input_dir = os.path.join(temp_dir, "intermediate/")
+    os.makedirs(input_dir)
+    rng = np.random.default_rng(7)
+    rows = 5000
+    data = pd.DataFrame({
+        'id': range(rows),
+        'latitude': rng.uniform(-60, 70, rows),
+        'longitude': rng.uniform(-180, 180, rows),
+        'country': 'Germany',
+    })
+    data.loc[:9, ['latitude', 'longitude']] = np.nan
+    data['geo_cell'] = grid_cells(data['latitude'], data['longitude'])
+    io_handler.write(input_dir, data.sort_values('geo_cell', ignore_index=True))
+    return DataMart(input_dir, os.path.join(temp_dir, "mart/"), io_handler), data
+
+
+@pytest.mark.parametrize("io_handler", [ParquetIO(row_group_size=250), ArrowIPCIO()])
+def test_bounding_box_query_pushes_the_grid_cells_down(io_handler, mocker):
+    with TemporaryDirectory() as temp_dir:
+        data_mart, data = _create_geo_mart(temp_dir, io_handler)
+        read_table = mocker.spy(data_mart.io_handler, "read_table")
+
+        result = data_mart.users_in_bounding_box(40, -10, 55, 20, columns=['id'])
+
+        expected = data[data['latitude'].between(40, 55) & data['longitude'].between(-10, 20)]
+        assert sorted(result['id']) == sorted(expected['id'])
+        assert list(result.columns) == ['id', 'latitude', 'longitude']
+        filters = read_table.call_args.kwargs['filters']
+        assert all([column for column, _, _ in conjunction[:2]] == ['geo_cell', 'geo_cell'] for conjunction in filters)
+
+
+def test_invalid_bounding_box_is_rejected():
+    with TemporaryDirectory() as temp_dir:
+        data_mart, _ = _create_geo_mart(temp_dir, ParquetIO())
+        with pytest.raises(ValueError, match="bounding box"):
+            data_mart.users_in_bounding_box(55, -10, 40, 20)
+
+
+def test_nearest_users_widen_the_search_until_k_users_are_found():
+    with TemporaryDirectory() as temp_dir:
+        data_mart, data = _create_geo_mart(temp_dir, ParquetIO(row_group_size=250))
+
+        nearest = data_mart.nearest_users(52.52, 13.40, k=5, radius_km=1)
+
+        distances = haversine_km(52.52, 13.40, data['latitude'], data['longitude'])
+        expected = data.assign(distance_km=distances).dropna().nsmallest(5, 'distance_km')
+        assert nearest['id'].tolist() == expected['id'].tolist()
+        assert nearest['distance_km'].tolist() == pytest.approx(expected['distance_km'].tolist())
+        # Asking for more users than there are returns them all.
+        assert len(data_mart.nearest_users(0, 0, k=10000, columns=['id'])) == len(data) - 10
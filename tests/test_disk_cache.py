@@ -0,0 +1,57 @@
+import os
+import time
+from tempfile import TemporaryDirectory
+from services.cache.disk_cache import DiskCache
+
+
+def test_put_and_get():
+    with TemporaryDirectory() as temp_dir:
+        cache = DiskCache(temp_dir, suffix=".bin")
+        key = DiskCache.make_key("SELECT 1", "fingerprint")
+
+        assert cache.get(key) is None
+        cache.put(key, b"payload")
+
+        assert cache.get(key) == b"payload"
+        assert cache.get_path(key).endswith(".bin")
+
+
+def test_make_key_depends_on_every_part():
+    assert DiskCache.make_key("a", "b") != DiskCache.make_key("a", "c")
+    assert DiskCache.make_key("ab", "c") != DiskCache.make_key("a", "bc")
+
+
+def test_expired_entries_are_misses():
+    with TemporaryDirectory() as temp_dir:
+        cache = DiskCache(temp_dir, max_age_seconds=60)
+        cache.put("old", b"1")
+        stored_at = time.time() - 120
+        os.utime(cache.path_for("old"), (stored_at, stored_at))
+
+        assert cache.get("old") is None
+        assert not os.path.exists(cache.path_for("old"))
+
+
+def test_least_recently_used_entries_are_evicted():
+    with TemporaryDirectory() as temp_dir:
+        cache = DiskCache(temp_dir, max_entries=2)
+        for age, key in [(30, "a"), (20, "b")]:
+            cache.put(key, b"x")
+            os.utime(cache.path_for(key), (time.time() - age, time.time() - age))
+
+        # Reading "a" makes "b" the least recently used entry
+        cache.get("a")
+        cache.put("c", b"x")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == b"x"
+        assert cache.get("c") == b"x"
+
+
+def test_size_limit():
+    with TemporaryDirectory() as temp_dir:
+        cache = DiskCache(temp_dir, max_bytes=10)
+        cache.put("a", b"12345678")
+        cache.put("b", b"12345678")
+
+        assert len(os.listdir(temp_dir)) == 1
@@ -0,0 +1,104 @@
+import os
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+from services.io_manager.parquet_io import ParquetIO
+from services.transform.batch_processor import BatchProcessor
+from services.transform.sketches import PersonSketches
+
+
+def _write_raw_files(input_path, io_handler):
+    io_handler.write(input_path, pd.DataFrame({
+        'id': [1, 2, 3],
+        'unique_id': ['abc123', 'def456', 'ghi789'],
+        'firstname': ['Ann', 'Bob', None],
+        'birthday': ['1980-05-10', '1990-07-20', '2000-12-12'],
+        'email': ['user1@example.com', 'user2@gmail.com', 'not-an-email'],
+        'address': [
+            {'country': 'USA', 'city': 'Boston', 'latitude': 42.36, 'longitude': -71.06},
+            {'country': 'Canada', 'city': None, 'latitude': 95.0, 'longitude': -79.38},
+            None,
+        ],
+    }), file_name="part-1")
+    io_handler.write(input_path, pd.DataFrame({
+        'id': [4, 5],
+        'unique_id': ['jkl012', 'mno345'],
+        'firstname': ['Cid', 'Dee'],
+        'birthday': ['1955-01-01', 'not-a-date'],
+        'email': ['user4@gmail.com', 'user5@gmail.com'],
+        'address': [
+            {'country': 'Germany', 'city': 'Berlin', 'latitude': 52.52, 'longitude': 13.40},
+            {'country': 'Germany', 'city': None, 'latitude': None, 'longitude': None},
+        ],
+    }), file_name="part-2")
+
+
+def _run_engine(engine, input_path, output_path, io_handler, output_io_handler, sketch_path=None, **options):
+    os.makedirs(output_path, exist_ok=True)
+    processor = BatchProcessor(
+        input_path, output_path, io_handler, output_io_handler=output_io_handler,
+        sketch_path=sketch_path, engine=engine, **options,
+    )
+    processor.process()
+    return output_io_handler.read_all(output_path).sort_values('id').reset_index(drop=True)
+
+
+@pytest.mark.parametrize("raw_io, intermediate_io", [
+    (ParquetIO(), ParquetIO()),
+    (ParquetIO(), ArrowIPCIO()),
+    (ArrowIPCIO(), ParquetIO(profile="compact-intermediate")),
+])
+def test_duckdb_engine_matches_pandas_engine(raw_io, intermediate_io):
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "raw/")
+        os.makedirs(input_path)
+        _write_raw_files(input_path, raw_io)
+
+        expected = _run_engine("pandas", input_path, os.path.join(temp_dir, "pandas/"), raw_io, intermediate_io)
+        result = _run_engine("duckdb", input_path, os.path.join(temp_dir, "duckdb/"), raw_io, intermediate_io)
+
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_duckdb_engine_applies_pushdown_and_sketches():
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "raw/")
+        os.makedirs(input_path)
+        io_handler = ParquetIO()
+        _write_raw_files(input_path, io_handler)
+        options = {"filters": [("id", ">", 1)]}
+
+        expected = _run_engine(
+            "pandas", input_path, os.path.join(temp_dir, "pandas/"), io_handler, io_handler,
+            sketch_path=os.path.join(temp_dir, "pandas.json"), **options,
+        )
+        result = _run_engine(
+            "duckdb", input_path, os.path.join(temp_dir, "duckdb/"), io_handler, io_handler,
+            sketch_path=os.path.join(temp_dir, "duckdb.json"), **options,
+        )
+
+        assert result['id'].tolist() == [2, 3, 4, 5]
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+        expected_sketches = PersonSketches.load(os.path.join(temp_dir, "pandas.json"))
+        sketches = PersonSketches.load(os.path.join(temp_dir, "duckdb.json"))
+        assert sketches.to_dict() == expected_sketches.to_dict()
+
+
+def test_duckdb_engine_with_empty_input():
+    with TemporaryDirectory() as temp_dir:
+        input_path = os.path.join(temp_dir, "raw/")
+        output_path = os.path.join(temp_dir, "out/")
+        os.makedirs(input_path)
+        os.makedirs(output_path)
+
+        BatchProcessor(input_path, output_path, ParquetIO(), engine="duckdb").process()
+
+        assert os.listdir(output_path) == []
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unknown transform engine"):
+        BatchProcessor("in/", "out/", ParquetIO(), engine="spark")
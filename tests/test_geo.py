@@ -0,0 +1,50 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+from services.transform.geo import bounding_box, cell_ranges, grid_cell_sql, grid_cells, haversine_km
+
+
+def _random_points(rows=20000, seed=3):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-90, 90, rows), rng.uniform(-180, 180, rows)
+
+
+def test_sql_cells_match_vectorized_cells():
+    latitude, longitude = _random_points()
+    latitude[:4] = [90, -90, np.nan, 91]
+    longitude[:4] = [180, -180, 0, 0]
+    points = pd.DataFrame({"latitude": latitude, "longitude": longitude})
+
+    sql_cells = duckdb.connect().execute(
+        f"SELECT {grid_cell_sql('latitude', 'longitude')} AS cell FROM points"
+    ).df()["cell"]
+    cells = grid_cells(points["latitude"], points["longitude"])
+
+    assert cells[:4].tolist() == [2 ** 32 - 1, 0, pd.NA, pd.NA]
+    pd.testing.assert_series_equal(sql_cells.astype("Int64"), cells, check_names=False)
+
+
+@pytest.mark.parametrize("box", [(40, -10, 55, 20), (-5, -5, 5, 5), (-90, -180, 90, 180)])
+def test_cell_ranges_cover_the_bounding_box(box):
+    latitude, longitude = _random_points()
+    cells = grid_cells(latitude, longitude).to_numpy()
+    inside = (latitude >= box[0]) & (latitude <= box[2]) & (longitude >= box[1]) & (longitude <= box[3])
+
+    ranges = cell_ranges(*box, max_ranges=16)
+
+    covered = np.zeros(len(cells), dtype=bool)
+    for low, high in ranges:
+        covered |= (cells >= low) & (cells <= high)
+    assert len(ranges) <= 16
+    assert covered[inside].all()
+    # The ranges are much tighter than the whole grid for small boxes.
+    assert covered.sum() < 2 * inside.sum() + 100
+
+
+def test_bounding_box_holds_the_radius():
+    min_latitude, min_longitude, max_latitude, max_longitude = bounding_box(52.52, 13.40, 100)
+
+    corners = haversine_km(52.52, 13.40, [min_latitude, max_latitude, 52.52, 52.52], [13.40, 13.40, min_longitude, max_longitude])
+    assert corners == pytest.approx([100, 100, 100, 100], rel=0.01)
+    assert bounding_box(89.5, 0, 100)[1::2] == (-180.0, 180.0)
@@ -0,0 +1,107 @@
+import asyncio
+import pickle
+import threading
+import time
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.io_manager.arrow_ipc_io import ArrowIPCIO
+from services.io_manager.parquet_io import ParquetIO
+
+
+class SlowParquetIO(ParquetIO):
+    """ParquetIO recording how many writes run at once."""
+
+    def __init__(self, delay=0.05, **options):
+        super().__init__(**options)
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.counter_lock = threading.Lock()
+
+    def write(self, *args, **kwargs):
+        with self.counter_lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        try:
+            super().write(*args, **kwargs)
+        finally:
+            with self.counter_lock:
+                self.running -= 1
+
+
+def test_submit_write_and_flush():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        io_handler = ParquetIO()
+        for part in range(5):
+            io_handler.submit_write(temp_dir, pd.DataFrame({"id": [part]}), f"part-{part}")
+        io_handler.flush()
+
+        assert sorted(io_handler.read_all(temp_dir)["id"]) == [0, 1, 2, 3, 4]
+
+
+def test_submit_write_applies_backpressure():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        io_handler = SlowParquetIO()
+        io_handler.max_writers = 1
+        io_handler.max_pending_writes = 2
+
+        start = time.monotonic()
+        for part in range(4):
+            io_handler.submit_write(temp_dir, pd.DataFrame({"id": [part]}))
+        submitted = time.monotonic() - start
+        io_handler.flush()
+
+        # The third and fourth submissions waited for earlier writes to finish.
+        assert submitted >= 2 * io_handler.delay
+        assert io_handler.max_running == 1
+
+
+def test_flush_raises_write_errors():
+    io_handler = ParquetIO()
+    io_handler.submit_write("/missing/directory/", pd.DataFrame({"id": [1]}))
+
+    with pytest.raises(Exception):
+        io_handler.flush()
+    # Reported errors are not raised again.
+    io_handler.flush()
+
+
+def test_collected_write_errors_are_not_raised_by_flush():
+    io_handler = ParquetIO()
+    future = io_handler.submit_write("/missing/directory/", pd.DataFrame({"id": [1]}))
+
+    assert io_handler.collect(future) is not None
+    io_handler.flush()
+
+
+def test_handler_with_background_writer_is_picklable():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        io_handler = ParquetIO(profile="fast-raw")
+        io_handler.submit_write(temp_dir, pd.DataFrame({"id": [1]}))
+        io_handler.flush()
+
+        copy = pickle.loads(pickle.dumps(io_handler))
+
+        assert copy.write_options == io_handler.write_options
+        assert "_writer" not in copy.__dict__
+
+
+@pytest.mark.parametrize("io_handler", [ParquetIO(), ArrowIPCIO()])
+def test_async_write_read_and_clear(io_handler):
+    async def scenario(path):
+        await asyncio.gather(*(
+            io_handler.awrite(path, pd.DataFrame({"id": [part]}), f"part-{part}") for part in range(3)
+        ))
+        ids = [int(batch["id"].iloc[0]) async for batch in io_handler.aread(path)]
+        await io_handler.aclear(path)
+        return sorted(ids)
+
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        assert asyncio.run(scenario(temp_dir)) == [0, 1, 2]
+        assert list(io_handler.read(temp_dir)) == []
@@ -0,0 +1,69 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+from services.ingress.lease_coordinator import LeaseCoordinator
+
+
+def test_plan_splits_offset_space():
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"))
+        coordinator.plan(total_records=250, batch_size=100)
+
+        leases = []
+        while (lease := coordinator.claim("worker")) is not None:
+            leases.append(lease)
+
+        assert leases == [(0, 100), (100, 100), (200, 50)]
+
+
+def test_leases_are_claimed_once_by_concurrent_workers():
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"))
+        coordinator.plan(total_records=1000, batch_size=10)
+
+        def work(worker_id):
+            claimed = []
+            while (lease := coordinator.claim(worker_id)) is not None:
+                claimed.append(lease[0])
+                coordinator.complete(worker_id, lease[0])
+            return claimed
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(work, [f"worker-{i}" for i in range(4)]))
+
+        offsets = [offset for claimed in results for offset in claimed]
+        assert sorted(offsets) == list(range(0, 1000, 10))
+        assert coordinator.is_finished()
+        assert coordinator.progress()["done"] == 100
+
+
+def test_expired_lease_is_reassigned():
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"), lease_seconds=0.05)
+        coordinator.plan(total_records=10, batch_size=10)
+
+        assert coordinator.claim("slow-worker") == (0, 10)
+        assert coordinator.claim("other-worker") is None
+
+        time.sleep(0.1)
+        assert coordinator.claim("other-worker") == (0, 10)
+
+        # The first worker lost its lease and can no longer complete it
+        assert not coordinator.renew("slow-worker", 0)
+        assert not coordinator.complete("slow-worker", 0)
+        assert coordinator.complete("other-worker", 0)
+
+
+def test_lease_fails_after_max_attempts():
+    with TemporaryDirectory() as temp_dir:
+        coordinator = LeaseCoordinator(os.path.join(temp_dir, "leases.sqlite"), max_attempts=2)
+        coordinator.plan(total_records=10, batch_size=10)
+
+        for _ in range(2):
+            assert coordinator.claim("worker") == (0, 10)
+            coordinator.release("worker", 0)
+
+        assert coordinator.claim("worker") is None
+        assert coordinator.progress()["failed"] == 1
+        assert coordinator.is_finished()
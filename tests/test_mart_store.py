@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import urllib.request
+import duckdb
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.egress.mart_store import MartQueryService, MartStore
+
+
+def test_publish_creates_versions_and_keeps_the_latest():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir, keep_versions=2)
+        assert store.current_version() is None
+
+        for value in range(3):
+            version = store.publish({"metric": pd.DataFrame({"value": [value]})})
+
+        assert version == 3
+        assert store.current_version() == 3
+        assert sorted(f for f in os.listdir(temp_dir) if f.endswith(".duckdb")) == \
+            ["mart-v000002.duckdb", "mart-v000003.duckdb"]
+
+
+def test_concurrent_publishes_get_distinct_versions():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir, keep_versions=10)
+        versions = []
+        threads = [threading.Thread(target=lambda value=value: versions.append(
+            store.publish({"metric": pd.DataFrame({"value": [value]})}))) for value in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(versions) == [1, 2, 3, 4, 5, 6]
+        assert store.current_version() == 6
+        assert not [f for f in os.listdir(temp_dir) if f.endswith(".reserved")]
+
+
+def test_publish_rejects_invalid_table_names():
+    with TemporaryDirectory() as temp_dir:
+        with pytest.raises(ValueError):
+            MartStore(temp_dir).publish({"drop table; --": pd.DataFrame({"a": [1]})})
+
+
+def test_query_service_swaps_to_new_versions():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        service = MartQueryService(store)
+        assert service.metrics() == []
+
+        store.publish({"gmail_users_over_age_60": pd.DataFrame({"users_count": [10]})})
+        assert service.get("gmail_users_over_age_60") == [{"users_count": 10}]
+
+        store.publish({"gmail_users_over_age_60": pd.DataFrame({"users_count": [12]})})
+        assert service.get("gmail_users_over_age_60") == [{"users_count": 12}]
+        assert service.version == 2
+        assert service.query("SELECT users_count * 2 AS doubled FROM gmail_users_over_age_60")["doubled"].tolist() == [24]
+
+        with pytest.raises(KeyError):
+            service.get("unknown")
+
+
+def test_lookups_are_served_from_memory():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        store.publish({"metric": pd.DataFrame({"value": [1]})})
+        service = MartQueryService(store)
+
+        # The rows are materialised once per version instead of being queried on every lookup.
+        assert service.get("metric") is service.get("metric")
+
+
+def test_refresh_keeps_the_previous_connection_open_for_running_queries():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        store.publish({"metric": pd.DataFrame({"value": [1]})})
+        service = MartQueryService(store)
+
+        with service._reading() as snapshot:
+            store.publish({"metric": pd.DataFrame({"value": [2]})})
+            assert service.get("metric") == [{"value": 2}]
+            # The swap retired the snapshot, but the query running on it can still finish.
+            assert snapshot.connection.execute("SELECT value FROM metric").fetchall() == [(1,)]
+
+        with pytest.raises(duckdb.Error):
+            snapshot.connection.execute("SELECT 1")
+        assert service.query("SELECT value FROM metric")["value"].tolist() == [2]
+
+
+def test_refresh_opens_the_version_read_from_the_pointer(monkeypatch):
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        store.publish({"metric": pd.DataFrame({"value": [1]})})
+        service = MartQueryService(store)
+        store.publish({"metric": pd.DataFrame({"value": [2]})})
+        store.publish({"metric": pd.DataFrame({"value": [3]})})
+
+        # Version 3 is published between reading the pointer and opening the file.
+        monkeypatch.setattr(store, "current_version", lambda: 2)
+        service.refresh()
+        assert service.version == 2
+        assert service.get("metric") == [{"value": 2}]
+
+
+def test_refresh_keeps_the_snapshot_when_the_version_was_removed(monkeypatch):
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        store.publish({"metric": pd.DataFrame({"value": [1]})})
+        service = MartQueryService(store)
+        assert service.get("metric") == [{"value": 1}]
+
+        monkeypatch.setattr(store, "current_version", lambda: 7)
+        service.refresh()
+        assert service.version == 1
+        assert service.get("metric") == [{"value": 1}]
+
+
+def test_http_service():
+    with TemporaryDirectory() as temp_dir:
+        store = MartStore(temp_dir)
+        store.publish({"metric": pd.DataFrame({"value": [1]})})
+        server = MartQueryService(store).serve(port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics/metric") as response:
+                body = json.loads(response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert body == {"version": 1, "metric": "metric", "rows": [{"value": 1}]}
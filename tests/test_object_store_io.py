@@ -0,0 +1,205 @@
+import math
+import threading
+import time
+import uuid
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.scheduler.task_graph import TaskGraph
+from services.transform.batch_processor import BatchProcessor
+
+fsspec = pytest.importorskip("fsspec")
+from fsspec.implementations.memory import MemoryFileSystem
+from services.io_manager.object_store_io import ObjectStoreIO
+from services.egress.data_mart import DataMart
+
+
+@pytest.fixture
+def prefix():
+    # The memory filesystem is shared by the whole process, so every test uses its own bucket.
+    url = f"memory://bucket-{uuid.uuid4().hex}/raw/"
+    yield url
+    fs, path = fsspec.core.url_to_fs(url)
+    if fs.exists(path):
+        fs.rm(path, recursive=True)
+
+
+def _sample(rows=1000):
+    return pd.DataFrame({
+        "id": range(rows),
+        "country": ["Germany", "France"] * (rows // 2),
+        "notes": [uuid.uuid4().hex for _ in range(rows)],
+    })
+
+
+def _count_fetched_bytes(mocker):
+    fs = fsspec.filesystem("memory")
+    return mocker.spy(type(fs), "cat_file")
+
+
+def test_write_and_read(prefix):
+    io_handler = ObjectStoreIO(block_size=512)
+    io_handler.write(prefix, _sample(), "part-1")
+    io_handler.write(prefix, _sample(10), "part-2")
+
+    assert [len(df) for df in io_handler.read(prefix)] == [1000, 10]
+    germany = io_handler.read_all(prefix, filters=[("country", "==", "Germany")])
+    assert len(germany) == 505
+    assert set(germany["country"]) == {"Germany"}
+
+
+def test_projection_only_fetches_needed_column_chunks(prefix, mocker):
+    io_handler = ObjectStoreIO(block_size=256, row_group_size=100)
+    io_handler.write(prefix, _sample(), "part-1")
+    spy = _count_fetched_bytes(mocker)
+
+    def fetched_bytes():
+        return sum(len(result) for result in spy.spy_return_list)
+
+    io_handler.read_all(prefix)
+    all_columns = fetched_bytes()
+    spy.spy_return_list.clear()
+
+    result = io_handler.read_all(prefix, columns=["id"])
+
+    assert result["id"].tolist() == list(range(1000))
+    assert fetched_bytes() < all_columns
+
+
+def test_block_cache_serves_unchanged_objects(prefix, mocker):
+    with TemporaryDirectory() as cache_dir:
+        io_handler = ObjectStoreIO(block_size=512, cache_dir=cache_dir)
+        io_handler.write(prefix, _sample(), "part-1")
+        expected = io_handler.read_all(prefix)
+        spy = _count_fetched_bytes(mocker)
+
+        pd.testing.assert_frame_equal(io_handler.read_all(prefix), expected)
+        assert spy.call_count == 0
+
+        # A rewritten object has a new version, so its blocks are fetched again.
+        io_handler.write(prefix, _sample(10), "part-1")
+        assert len(io_handler.read_all(prefix)) == 10
+        assert spy.call_count > 0
+
+
+class MultipartMemoryFileSystem(MemoryFileSystem):
+    """
+    Memory filesystem answering the S3 multipart calls of s3fs, recording the uploaded parts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploads = {}
+        self.part_numbers = []
+        self.max_parts_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def split_path(self, path):
+        bucket, _, key = self._strip_protocol(path).lstrip("/").partition("/")
+        return bucket, key, None
+
+    def call_s3(self, method, **kwargs):
+        if method == "create_multipart_upload":
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {}
+            return {"UploadId": upload_id}
+        if method == "upload_part":
+            with self._lock:
+                self._in_flight += 1
+                self.max_parts_in_flight = max(self.max_parts_in_flight, self._in_flight)
+            time.sleep(0.01)
+            with self._lock:
+                self._in_flight -= 1
+                self.part_numbers.append(kwargs["PartNumber"])
+                self.uploads[kwargs["UploadId"]][kwargs["PartNumber"]] = kwargs["Body"]
+            return {"ETag": str(kwargs["PartNumber"])}
+        if method == "complete_multipart_upload":
+            parts = self.uploads.pop(kwargs["UploadId"])
+            body = b"".join(parts[part["PartNumber"]] for part in kwargs["MultipartUpload"]["Parts"])
+            self.pipe_file(f"/{kwargs['Bucket']}/{kwargs['Key']}", body)
+            return {}
+        raise NotImplementedError(method)
+
+
+def test_large_objects_are_uploaded_in_concurrent_parts(prefix, mocker):
+    io_handler = ObjectStoreIO(part_size=1024, max_concurrency=4)
+    fs = MultipartMemoryFileSystem(skip_instance_cache=True)
+    path = fs._strip_protocol(prefix)
+    mocker.patch.object(io_handler, "_filesystem", return_value=(fs, path))
+    data = _sample()
+    io_handler.write(prefix, data, "part-1")
+    size = fs.size(f"{path}/part-1.parquet")
+
+    assert sorted(fs.part_numbers) == list(range(1, math.ceil(size / 1024) + 1))
+    assert fs.max_parts_in_flight > 1
+    mocker.stopall()
+    pd.testing.assert_frame_equal(io_handler.read_all(prefix), data)
+
+
+def test_clear_and_fingerprint(prefix):
+    io_handler = ObjectStoreIO()
+    io_handler.write(prefix, _sample(10), "part-1")
+    before = io_handler.fingerprint(prefix)
+
+    io_handler.clear(prefix)
+
+    assert io_handler.fingerprint(prefix) != before
+    assert list(io_handler.read(prefix)) == []
+    with pytest.raises(FileNotFoundError):
+        io_handler.read_all(prefix)
+
+
+def test_task_graph_lists_remote_paths_with_the_storage_options(prefix, mocker):
+    ObjectStoreIO().write(prefix, _sample(10), "part-1")
+    url_to_fs = mocker.spy(fsspec.core, "url_to_fs")
+    graph = TaskGraph(storage_options={"skip_instance_cache": True})
+    graph.add_task("transform", lambda: None, inputs=[prefix])
+
+    graph.run()
+
+    assert url_to_fs.call_args_list
+    assert all(call.kwargs == {"skip_instance_cache": True} for call in url_to_fs.call_args_list)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "duckdb"])
+def test_batch_processor_between_object_store_layers(prefix, engine):
+    io_handler = ObjectStoreIO()
+    output_prefix = prefix.replace("/raw/", "/intermediate/")
+    io_handler.write(prefix, pd.DataFrame({
+        "id": [1, 2],
+        "unique_id": ["abc", "def"],
+        "birthday": ["1980-05-10", "1990-07-20"],
+        "email": ["a@gmail.com", "b@example.com"],
+        "address": [{"country": "Germany"}, {"country": "France"}],
+    }))
+
+    BatchProcessor(prefix, output_prefix, io_handler, engine=engine).process()
+
+    result = io_handler.read_all(output_prefix).sort_values("id")
+    assert result["email_provider"].tolist() == ["gmail.com", "example.com"]
+    assert result["country"].tolist() == ["Germany", "France"]
+
+
+def test_sampled_mart_metric_on_an_object_store_layer(prefix):
+    ObjectStoreIO().write(prefix, pd.DataFrame({
+        "age_group": ["60-69", "30-39"] * 50,
+        "email_provider": ["gmail.com"] * 100,
+        "country": ["Germany"] * 100,
+    }), "part-1")
+
+    with TemporaryDirectory() as temp_dir:
+        data_mart = DataMart(prefix, temp_dir + "/mart/", ObjectStoreIO())
+        count = data_mart.calculate_gmail_users_over_age_60(approximate=True, sample=1.0).iloc[0]
+
+    assert count["users_count"] == 50
+
+
+def test_list_files_and_read_selected_files(prefix):
+    io_handler = ObjectStoreIO(block_size=512)
+    io_handler.write(prefix, _sample(10), "part-1")
+    io_handler.write(prefix, _sample(20), "part-2")
+
+    assert io_handler.list_files(prefix) == ["part-1.parquet", "part-2.parquet"]
+    assert [len(df) for df in io_handler.read(prefix, files=["part-2.parquet"])] == [20]
+    assert io_handler.read_table(prefix, files=["part-1.parquet"]).num_rows == 10
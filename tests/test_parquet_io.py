@@ -1,7 +1,10 @@
 import pytest
 import pandas as pd
 import os
+import duckdb
+import pyarrow.parquet as pq
 from tempfile import TemporaryDirectory
+from services.io_manager.io_handler import filters_to_sql
 from services.io_manager.parquet_io import ParquetIO
 
 
@@ -94,3 +97,81 @@ def test_clear_folder_invalid_path():
     invalid_path = "/non/existent/folder/"
     with pytest.raises(Exception):
         handler.clear(invalid_path)
+
+
+def test_read_with_column_projection_and_filters():
+    data = pd.DataFrame({
+        "id": range(100),
+        "country": ["Germany", "France"] * 50,
+        "email_provider": ["gmail.com"] * 50 + ["yahoo.com"] * 50,
+    })
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ParquetIO(row_group_size=10)
+        handler.write(temp_dir + '/', data, file_name="data")
+
+        result = handler.read_all(temp_dir, columns=["id", "country"], filters=[("email_provider", "==", "yahoo.com")])
+        assert result.columns.tolist() == ["id", "country"]
+        assert result["id"].tolist() == list(range(50, 100))
+
+        table = handler.read_table(temp_dir, columns=["id"], filters=[("id", "<", 5)])
+        assert table.column_names == ["id"]
+        assert table.num_rows == 5
+
+        batches = list(handler.read(temp_dir, columns=["country"], filters=[("country", "==", "France")]))
+        assert batches[0]["country"].unique().tolist() == ["France"]
+
+
+def test_read_streams_batches_and_write_overrides_the_row_group_size():
+    data = pd.DataFrame({"id": range(100), "country": ["Germany", "France"] * 50})
+
+    with TemporaryDirectory() as temp_dir:
+        handler = ParquetIO(row_group_size=64)
+        handler.write(temp_dir + '/', data, file_name="a", row_group_size=30)
+        handler.write(temp_dir + '/', data, file_name="b")
+
+        assert pq.ParquetFile(os.path.join(temp_dir, "a.parquet")).metadata.num_row_groups == 4
+        assert pq.ParquetFile(os.path.join(temp_dir, "b.parquet")).metadata.num_row_groups == 2
+
+        batches = list(handler.read(temp_dir, batch_size=25))
+        assert max(len(batch) for batch in batches) == 25
+        assert sum(len(batch) for batch in batches) == 200
+        assert pd.concat(batches)["id"].tolist() == list(range(100)) * 2
+
+
+def test_filters_are_translated_to_sql():
+    assert filters_to_sql([("country", "==", "O'Hara"), ("age", ">=", 60)]) == \
+        "(\"country\" = 'O''Hara' AND \"age\" >= 60)"
+    assert filters_to_sql([[("id", "in", [1, 2])], [("id", "not in", [3])]]) == \
+        "(\"id\" IN (1, 2)) OR (\"id\" NOT IN (3))"
+    with pytest.raises(ValueError):
+        filters_to_sql([("id", "like", "1%")])
+
+
+def test_duckdb_source_filters_in_the_scan_and_reads_a_sample_of_the_row_groups():
+    rows = 100000
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        handler = ParquetIO(row_group_size=1000)
+        handler.write(temp_dir, pd.DataFrame({
+            "id": range(rows),
+            "email_provider": ["gmail.com", "yahoo.com"] * (rows // 2),
+        }))
+        connection = duckdb.connect()
+
+        full = handler.duckdb_source(connection, temp_dir, "full", filters=[("email_provider", "==", "gmail.com")])
+        assert "WHERE" in full and "full" not in full
+        assert connection.execute(f"SELECT COUNT(*) FROM {full}").fetchone()[0] == rows // 2
+
+        sampled = handler.duckdb_source(
+            connection, temp_dir, "sampled", filters=[("email_provider", "==", "gmail.com")], sample=0.05, seed=1
+        )
+        # Only about 4 x 5% of the 100 row groups are read
+        read_rows = connection.execute("SELECT COUNT(*) FROM sampled").fetchone()[0]
+        assert 5000 <= read_rows <= 40000
+        assert read_rows % 1000 == 0
+        count, providers = connection.execute(
+            f"SELECT COUNT(*), LIST(DISTINCT email_provider) FROM {sampled}"
+        ).fetchone()
+        assert 1000 < count < 4500
+        assert providers == ["gmail.com"]
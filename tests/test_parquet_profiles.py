@@ -0,0 +1,100 @@
+import os
+import duckdb
+import pytest
+import pandas as pd
+from tempfile import TemporaryDirectory
+from services.io_manager.parquet_io import ParquetIO
+from services.io_manager.parquet_profiles import (
+    WRITE_PROFILES,
+    benchmark_profiles,
+    duckdb_supports_bloom_filters,
+    get_write_profile,
+    recommend_profile,
+)
+
+
+sample_data = pd.DataFrame({
+    "id": range(1000),
+    "unique_id": [f"{i:032x}" for i in range(1000)],
+    "country": ["Germany", "France", "Spain", "Italy"] * 250,
+    "address": [{"country": "Germany", "city": "Berlin"}] * 1000,
+})
+
+
+def test_get_write_profile_with_overrides():
+    options = get_write_profile("compact-mart", row_group_size=500)
+
+    assert options["compression"] == "zstd"
+    assert options["row_group_size"] == 500
+    # The shared profile itself is not modified
+    assert "row_group_size" not in WRITE_PROFILES["compact-mart"]
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        ParquetIO(profile="does-not-exist")
+
+
+@pytest.mark.parametrize("profile", list(WRITE_PROFILES))
+def test_profiles_round_trip(profile):
+    with TemporaryDirectory() as temp_dir:
+        handler = ParquetIO(profile=profile)
+        handler.write(temp_dir + "/", sample_data, file_name="sample")
+
+        read_data = pd.read_parquet(os.path.join(temp_dir, "sample.parquet"))
+        pd.testing.assert_frame_equal(read_data, sample_data, check_dtype=False)
+
+
+def test_row_group_size_is_applied():
+    with TemporaryDirectory() as temp_dir:
+        ParquetIO(profile="fast-raw", row_group_size=100).write(temp_dir + "/", sample_data, file_name="sample")
+
+        metadata = duckdb.sql(
+            f"SELECT DISTINCT row_group_id FROM parquet_metadata('{temp_dir}/sample.parquet')"
+        ).fetchall()
+        assert len(metadata) == 10
+
+
+@pytest.mark.skipif(not duckdb_supports_bloom_filters(), reason="DuckDB cannot write Bloom filters")
+def test_bloom_filters_are_written():
+    with TemporaryDirectory() as temp_dir:
+        ParquetIO(profile="compact-intermediate").write(temp_dir + "/", sample_data, file_name="sample")
+        file_path = os.path.join(temp_dir, "sample.parquet")
+
+        def excluded(column, value):
+            return duckdb.sql(
+                f"SELECT bloom_filter_excludes FROM parquet_bloom_probe('{file_path}', '{column}', '{value}')"
+            ).fetchone()[0]
+
+        assert excluded("country", "Atlantis")
+        assert not excluded("country", "Spain")
+        # The all-distinct unique_id gets one as well
+        bloom_filter_length = duckdb.sql(
+            f"SELECT bloom_filter_length FROM parquet_metadata('{file_path}') WHERE path_in_schema = 'unique_id'"
+        ).fetchone()[0]
+        assert bloom_filter_length > 0
+        assert excluded("unique_id", f"{5000:032x}")
+        assert not excluded("unique_id", f"{500:032x}")
+
+
+@pytest.mark.skipif(not duckdb_supports_bloom_filters(), reason="DuckDB cannot write Bloom filters")
+def test_bloom_filter_profiles_reject_options_duckdb_cannot_honour():
+    with pytest.raises(ValueError, match="write_page_index"):
+        ParquetIO(profile="compact-intermediate", write_page_index=True)
+    with pytest.raises(ValueError, match="use_dictionary"):
+        ParquetIO(profile="compact-intermediate", use_dictionary=["country"])
+
+
+def test_recommend_profile():
+    profile, results = recommend_profile(sample_data, profiles=["default", "compact-mart"], repeat=1)
+
+    assert profile in ("default", "compact-mart")
+    assert set(results["profile"]) == {"default", "compact-mart"}
+    assert {"file_size_bytes", "write_seconds", "read_seconds", "score"} <= set(results.columns)
+
+
+def test_benchmark_profiles_smaller_with_compact_profile():
+    results = benchmark_profiles(sample_data, profiles=["uncompressed", "compact-mart"], repeat=1)
+    sizes = results.set_index("profile")["file_size_bytes"]
+
+    assert sizes["compact-mart"] < sizes["uncompressed"]
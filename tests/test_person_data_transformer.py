@@ -109,3 +109,24 @@ def test_transform():
     assert transformed_data['age_group'].tolist() == expected_age_groups
     assert transformed_data['email_provider'].tolist() == ['hotmail.com', 'hotmail.com', 'hotmail.com']
     assert transformed_data['country'].tolist() == ['Djibouti', 'South Korea', 'Niue']
+
+
+def test_extract_coordinates_and_grid_cell():
+    transformer = PersonDataTransformer(pd.DataFrame({
+        "id": [1, 2, 3],
+        "birthday": ["1954-02-12", "1935-02-03", "1987-07-09"],
+        "email": ["a@gmail.com", "b@gmail.com", "c@gmail.com"],
+        "address": [
+            {"country": "Germany", "latitude": 52.52, "longitude": 13.4},
+            {"country": "France", "latitude": "48.85", "longitude": "2.35"},
+            {"country": "Niue"},
+        ],
+    }))
+
+    transformed_data = transformer.transform()
+
+    assert transformed_data["latitude"].tolist()[:2] == [52.52, 48.85]
+    assert transformed_data["longitude"].tolist()[:2] == [13.4, 2.35]
+    assert transformed_data[["latitude", "longitude"]].iloc[2].isna().all()
+    assert transformed_data["geo_cell"].iloc[:2].notna().all()
+    assert pd.isna(transformed_data["geo_cell"].iloc[2])
@@ -0,0 +1,84 @@
+import os
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.io_manager.parquet_io import ParquetIO
+from services.io_manager.point_index import PointIndex
+
+
+def _write_dataset(temp_dir):
+    io_handler = ParquetIO(index_columns=("unique_id", "id"), row_group_size=10)
+    for part in range(3):
+        ids = list(range(part * 30, (part + 1) * 30))
+        io_handler.write(temp_dir, pd.DataFrame({
+            "id": ids,
+            "unique_id": [f"uid-{i}" for i in ids],
+            "country": ["Germany" if i % 2 else "France" for i in ids],
+        }), file_name=f"part-{part}")
+    return io_handler
+
+
+def test_lookup_reads_only_matching_row_groups():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        io_handler = _write_dataset(temp_dir)
+        index = io_handler.point_index(temp_dir)
+
+        result = index.lookup(["uid-5", "uid-47", "uid-missing"])
+
+        assert sorted(result["unique_id"]) == ["uid-47", "uid-5"]
+        positions = dict(zip(result["unique_id"], zip(result["_file"], result["_row_group"])))
+        assert positions == {"uid-5": ("part-0.parquet", 0), "uid-47": ("part-1.parquet", 1)}
+
+
+def test_lookup_by_id_with_column_selection():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        index = _write_dataset(temp_dir).point_index(temp_dir)
+
+        result = index.lookup([89, "61"], column="id", columns=["country"])
+
+        assert list(result.columns) == ["country", "_file", "_row_group"]
+        assert sorted(result["_file"]) == ["part-2.parquet", "part-2.parquet"]
+        assert set(result["country"]) == {"Germany"}
+
+
+def test_locate_does_not_read_data_files():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        index = _write_dataset(temp_dir).point_index(temp_dir)
+        os.remove(os.path.join(temp_dir, "part-0.parquet"))
+
+        located = index.locate(["uid-12"])
+
+        assert located.to_dict("records") == [{"key": "uid-12", "file": "part-0.parquet", "row_group": 1}]
+        # The file is gone, so there is nothing to return.
+        assert index.lookup(["uid-12"]).empty
+
+
+def test_compact_merges_segments():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        index = _write_dataset(temp_dir).point_index(temp_dir)
+        expected = index.lookup(["uid-1", "uid-31", "uid-88"]).sort_values("id", ignore_index=True)
+
+        index.compact()
+
+        assert len(index._segments("unique_id")) == 1
+        result = index.lookup(["uid-1", "uid-31", "uid-88"]).sort_values("id", ignore_index=True)
+        pd.testing.assert_frame_equal(result, expected)
+
+
+def test_clear_removes_the_index():
+    with TemporaryDirectory() as temp_dir:
+        temp_dir += "/"
+        io_handler = _write_dataset(temp_dir)
+
+        io_handler.clear(temp_dir)
+
+        assert io_handler.point_index(temp_dir).locate(["uid-1"]).empty
+
+
+def test_unindexed_column_is_rejected():
+    with pytest.raises(ValueError, match="not indexed"):
+        PointIndex("unused/", columns=("unique_id",)).locate([1], column="id")
@@ -0,0 +1,71 @@
+import os
+import pytest
+from tempfile import TemporaryDirectory
+from unittest.mock import MagicMock
+from services.ingress.api_handler import ApiHandler
+from services.ingress.response_cache import ResponseCache
+
+
+response_body = {"status": "OK", "data": [{"id": 1}]}
+
+
+def test_keys_are_normalised():
+    assert ResponseCache.make_key("https://example.com", {"_offset": 0, "_quantity": 10}) == \
+        ResponseCache.make_key("https://example.com", {"_quantity": "10", "_offset": "0"})
+    assert ResponseCache.make_key("https://example.com", {"_offset": 0}) != \
+        ResponseCache.make_key("https://example.com", {"_offset": 10})
+
+
+def test_record_and_get():
+    with TemporaryDirectory() as temp_dir:
+        cache = ResponseCache(temp_dir)
+        assert cache.get("https://example.com", {"_offset": 0}) is None
+
+        cache.put("https://example.com", {"_offset": 0}, response_body)
+
+        assert cache.get("https://example.com", {"_offset": 0}) == response_body
+        assert os.listdir(temp_dir)[0].endswith(".json.gz")
+
+
+def test_replay_keeps_expired_responses():
+    with TemporaryDirectory() as temp_dir:
+        ResponseCache(temp_dir).put("https://example.com", {"_offset": 0}, response_body)
+        (file_name,) = os.listdir(temp_dir)
+        os.utime(os.path.join(temp_dir, file_name), (0, 0))
+
+        replay = ResponseCache(temp_dir, mode="replay", ttl_seconds=60)
+        assert replay.get("https://example.com", {"_offset": 0}) == response_body
+        assert os.listdir(temp_dir) == [file_name]
+
+        assert ResponseCache(temp_dir, ttl_seconds=60).get("https://example.com", {"_offset": 0}) is None
+
+
+def test_unknown_mode():
+    with TemporaryDirectory() as temp_dir:
+        with pytest.raises(ValueError):
+            ResponseCache(temp_dir, mode="write-only")
+
+
+def test_api_handler_replays_recorded_responses(mocker):
+    mock_response = MagicMock()
+    mock_response.json.return_value = response_body
+    mock_get = mocker.patch("services.ingress.api_handler.requests.get", return_value=mock_response)
+
+    with TemporaryDirectory() as temp_dir:
+        params = {"_quantity": 1, "_offset": 0}
+        recorder = ApiHandler(None, "https://example.com/api", dict(params), "/output/path",
+                              response_cache=ResponseCache(temp_dir))
+        assert recorder._fetch_with_retries() == response_body
+        assert recorder._fetch_with_retries() == response_body
+        assert mock_get.call_count == 1
+
+        replayer = ApiHandler(None, "https://example.com/api", dict(params), "/output/path",
+                              response_cache=ResponseCache(temp_dir, mode="replay"))
+        assert replayer._fetch_with_retries() == response_body
+        assert mock_get.call_count == 1
+
+        # A response that was never recorded is an error in replay mode
+        replayer.params["_offset"] = 1
+        with pytest.raises(RuntimeError):
+            replayer._fetch_with_retries()
+        assert mock_get.call_count == 1
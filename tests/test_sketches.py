@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pandas as pd
+from tempfile import TemporaryDirectory
+from services.transform.sketches import DDSketch, HyperLogLog, PersonSketches, SpaceSaving
+
+
+def test_hyperloglog_estimate_within_error():
+    sketch = HyperLogLog()
+    values = pd.Series([f"user-{i}" for i in range(50000)])
+    sketch.update(values)
+    # Duplicates do not change the estimate
+    sketch.update(values.head(1000))
+
+    assert abs(sketch.estimate() - 50000) / 50000 < 3 * sketch.relative_error
+
+
+def test_hyperloglog_small_cardinality_and_merge():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.update(pd.Series(["a", "b", "c"]))
+    right.update(pd.Series(["c", "d"]))
+    left.merge(right)
+
+    assert round(left.estimate()) == 4
+
+
+def test_space_saving_exact_when_under_capacity():
+    sketch = SpaceSaving(capacity=10)
+    sketch.update(pd.Series(["DE"] * 5 + ["FR"] * 3 + ["ES"]))
+
+    assert sketch.top(2) == [("DE", 5, 0), ("FR", 3, 0)]
+
+
+def test_space_saving_bounds_and_merge():
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.zipf(1.5, 20000) % 500).astype(str)
+    left, right = SpaceSaving(capacity=50), SpaceSaving(capacity=50)
+    left.update(values[:10000])
+    right.update(values[10000:])
+    left.merge(right)
+
+    true_counts = values.value_counts()
+    assert left.total == len(values)
+    for item, count, error in left.top(3):
+        assert count - error <= true_counts[item] <= count
+    assert [item for item, _, _ in left.top(3)] == true_counts.index[:3].tolist()
+
+
+def test_ddsketch_quantiles_within_relative_accuracy():
+    ages = pd.Series(np.random.default_rng(0).integers(1, 100, 10000))
+    sketch = DDSketch(relative_accuracy=0.01)
+    sketch.update(ages.iloc[:5000])
+    other = DDSketch(relative_accuracy=0.01)
+    other.update(ages.iloc[5000:])
+    sketch.merge(other)
+
+    for q in (0.1, 0.5, 0.9):
+        expected = np.quantile(ages, q, method="lower")
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * expected + 1
+
+
+def test_person_sketches_round_trip():
+    transformed = pd.DataFrame({
+        "unique_id": ["a", "b", "c"],
+        "email_provider": ["gmail.com", "gmail.com", "yahoo.com"],
+        "country": ["Germany", "Germany", "France"],
+    })
+    sketches = PersonSketches()
+    sketches.update(transformed, pd.Series([30, 40, 50]))
+
+    with TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "sketches.json")
+        sketches.save(path)
+        loaded = PersonSketches.load(path)
+
+    assert loaded.rows == 3
+    assert round(loaded.distinct_users.estimate()) == 3
+    assert loaded.gmail_countries.top(1) == [("Germany", 2, 0)]
+    assert loaded.age.quantile(0.5) == sketches.age.quantile(0.5)
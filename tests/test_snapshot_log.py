@@ -0,0 +1,144 @@
+import os
+import threading
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+from services.egress.data_mart import DataMart
+from services.io_manager.parquet_io import ParquetIO
+from services.io_manager.snapshot_log import SnapshotLog
+from services.transform.batch_processor import BatchProcessor
+
+
+def _commit(log, io_handler, ids, append=False):
+    staging_path = log.begin(append=append)
+    io_handler.write(staging_path, pd.DataFrame({"id": ids, "unique_id": [f"uid-{i}" for i in ids]}))
+    return log.commit(staging_path)
+
+
+def test_pinned_reader_keeps_its_snapshot():
+    with TemporaryDirectory() as temp_dir:
+        log = SnapshotLog(os.path.join(temp_dir, "raw", ""))
+        io_handler = ParquetIO()
+        assert log.pin() == log.dataset_dir
+
+        _commit(log, io_handler, [1, 2])
+        pinned = log.pin()
+        _commit(log, io_handler, [3])
+
+        assert sorted(io_handler.read_all(pinned)["id"]) == [1, 2]
+        assert sorted(io_handler.read_all(log.pin())["id"]) == [3]
+        assert log.versions() == [1, 2]
+
+
+def test_append_links_the_current_files_and_index():
+    with TemporaryDirectory() as temp_dir:
+        log = SnapshotLog(os.path.join(temp_dir, "raw", ""))
+        io_handler = ParquetIO(index_columns=("unique_id",))
+        _commit(log, io_handler, [1, 2])
+        _commit(log, io_handler, [3], append=True)
+
+        first, second = log.version_path(1), log.version_path(2)
+        assert sorted(io_handler.read_all(second)["id"]) == [1, 2, 3]
+        (file_name,) = io_handler.list_files(first)
+        assert os.path.samefile(os.path.join(first, file_name), os.path.join(second, file_name))
+        assert sorted(io_handler.point_index(second).lookup(["uid-1", "uid-3"])["id"]) == [1, 3]
+        # The older snapshot and its index are unchanged.
+        assert io_handler.point_index(first).lookup(["uid-3"]).empty
+
+
+def test_concurrent_commits_get_distinct_versions():
+    with TemporaryDirectory() as temp_dir:
+        log = SnapshotLog(os.path.join(temp_dir, "raw", ""), keep_versions=10)
+        staging_paths = [log.begin() for _ in range(8)]
+        versions = []
+        threads = [threading.Thread(target=lambda path=path: versions.append(log.commit(path))) for path in staging_paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(versions) == list(range(1, 9))
+        assert log.versions() == list(range(1, 9))
+
+
+def test_garbage_collection_keeps_recent_and_retained_versions():
+    with TemporaryDirectory() as temp_dir:
+        dataset_dir = os.path.join(temp_dir, "raw", "")
+        io_handler = ParquetIO()
+        retained = SnapshotLog(dataset_dir, keep_versions=1, retention_seconds=3600)
+        for i in range(3):
+            _commit(retained, io_handler, [i])
+        assert retained.versions() == [1, 2, 3]
+
+        expired = SnapshotLog(dataset_dir, keep_versions=2, retention_seconds=0)
+        assert expired.garbage_collect() == [1]
+        assert expired.versions() == [2, 3]
+
+
+def test_abort_and_stale_staging_directories_are_removed():
+    with TemporaryDirectory() as temp_dir:
+        log = SnapshotLog(os.path.join(temp_dir, "raw", ""), retention_seconds=0)
+        aborted = log.begin()
+        log.abort(aborted)
+        log.begin(name="crashed")
+
+        log.garbage_collect()
+
+        assert not os.path.exists(aborted)
+        assert os.listdir(log.dataset_dir) == []
+
+
+def test_batch_processor_commits_a_snapshot_and_reads_a_pinned_input():
+    with TemporaryDirectory() as temp_dir:
+        raw_log = SnapshotLog(os.path.join(temp_dir, "raw", ""))
+        intermediate_log = SnapshotLog(os.path.join(temp_dir, "intermediate", ""))
+        io_handler = ParquetIO()
+        staging_path = raw_log.begin()
+        io_handler.write(staging_path, pd.DataFrame({
+            "id": [1], "firstname": ["Ann"], "lastname": ["Lee"], "email": ["ann@gmail.com"],
+            "phone": ["1"], "birthday": ["1950-01-01"], "gender": ["female"],
+            "address": [{"country": "Germany", "city": "Berlin"}],
+        }))
+        raw_log.commit(staging_path)
+        processor = BatchProcessor(
+            raw_log.dataset_dir, intermediate_log.dataset_dir, io_handler, snapshot_log=intermediate_log
+        )
+
+        assert processor.process() == 1
+        assert processor.process() == 1
+
+        assert intermediate_log.versions() == [1, 2]
+        assert len(io_handler.read_all(intermediate_log.pin())) == 1
+
+
+def test_batch_processor_aborts_the_snapshot_on_failure():
+    with TemporaryDirectory() as temp_dir:
+        intermediate_log = SnapshotLog(os.path.join(temp_dir, "intermediate", ""))
+        processor = BatchProcessor(
+            os.path.join(temp_dir, "missing", ""), intermediate_log.dataset_dir, ParquetIO(),
+            snapshot_log=intermediate_log
+        )
+
+        with pytest.raises(ValueError, match="not a valid directory"):
+            processor.process()
+
+        assert intermediate_log.versions() == []
+        assert os.listdir(intermediate_log.dataset_dir) == []
+
+
+def test_data_mart_reads_the_directory_in_place_when_snapshots_are_disabled():
+    with TemporaryDirectory() as temp_dir:
+        log = SnapshotLog(os.path.join(temp_dir, "intermediate", ""))
+        io_handler = ParquetIO()
+        rows = pd.DataFrame({"age_group": ["60-69"], "email_provider": ["gmail.com"]})
+        # A version left over from a run with snapshots, then a run rewriting the layer in place.
+        staging_path = log.begin()
+        io_handler.write(staging_path, rows)
+        log.commit(staging_path)
+        io_handler.write(log.dataset_dir, pd.concat([rows] * 3))
+
+        with_snapshots = DataMart(log.dataset_dir, os.path.join(temp_dir, "mart", ""), io_handler)
+        without_snapshots = DataMart(log.dataset_dir, os.path.join(temp_dir, "mart", ""), io_handler, snapshots=False)
+
+        assert with_snapshots.calculate_gmail_users_over_age_60()["users_count"].tolist() == [1]
+        assert without_snapshots.calculate_gmail_users_over_age_60()["users_count"].tolist() == [3]
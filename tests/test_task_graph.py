@@ -0,0 +1,119 @@
+import os
+import threading
+import pytest
+from tempfile import TemporaryDirectory
+from services.scheduler.task_graph import TaskGraph
+
+
+def test_run_respects_dependencies():
+    order = []
+    graph = TaskGraph()
+    graph.add_task("c", lambda: order.append("c"), depends_on=["a", "b"])
+    graph.add_task("a", lambda: order.append("a"))
+    graph.add_task("b", lambda: order.append("b"), depends_on=["a"])
+
+    graph.run()
+
+    assert order == ["a", "b", "c"]
+    assert graph.last_run == {"a": "success", "b": "success", "c": "success"}
+
+
+def test_independent_tasks_run_concurrently():
+    # Both tasks wait for each other; this only completes if they run at the same time.
+    barrier = threading.Barrier(2, timeout=5)
+    graph = TaskGraph(max_workers=2)
+    graph.add_task("left", barrier.wait)
+    graph.add_task("right", barrier.wait)
+
+    results = graph.run()
+
+    assert set(results) == {"left", "right"}
+
+
+def test_unchanged_tasks_are_skipped():
+    calls = []
+    with TemporaryDirectory() as temp_dir:
+        input_file = os.path.join(temp_dir, "input.txt")
+        with open(input_file, "w") as f:
+            f.write("v1")
+
+        def build():
+            graph = TaskGraph(state_path=os.path.join(temp_dir, "state.json"))
+            graph.add_task("load", lambda: calls.append("load"), inputs=[input_file])
+            graph.add_task("report", lambda: calls.append("report"), depends_on=["load"])
+            return graph
+
+        build().run()
+        graph = build()
+        graph.run()
+        assert calls == ["load", "report"]
+        assert graph.last_run == {"load": "skipped", "report": "skipped"}
+
+        # Changing the input reruns the task and everything downstream of it
+        with open(input_file, "w") as f:
+            f.write("version 2")
+        build().run()
+        assert calls == ["load", "report", "load", "report"]
+
+        # force reruns everything
+        build().run(force=True)
+        assert len(calls) == 6
+
+
+def test_failed_tasks_are_retried_without_rerunning_the_graph():
+    calls = []
+    should_fail = {"transform": True}
+
+    def transform():
+        calls.append("transform")
+        if should_fail["transform"]:
+            raise ValueError("boom")
+
+    with TemporaryDirectory() as temp_dir:
+        def build():
+            graph = TaskGraph(state_path=os.path.join(temp_dir, "state.json"))
+            graph.add_task("ingest", lambda: calls.append("ingest"))
+            graph.add_task("transform", transform, depends_on=["ingest"])
+            graph.add_task("mart", lambda: calls.append("mart"), depends_on=["transform"])
+            return graph
+
+        graph = build()
+        with pytest.raises(RuntimeError, match="transform"):
+            graph.run()
+        assert graph.last_run == {"ingest": "success", "transform": "failed", "mart": "blocked"}
+
+        should_fail["transform"] = False
+        graph = build()
+        graph.run()
+
+        assert calls == ["ingest", "transform", "transform", "mart"]
+        assert graph.last_run == {"ingest": "skipped", "transform": "success", "mart": "success"}
+
+
+def test_task_retries_within_a_run():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("temporary failure")
+        return "done"
+
+    graph = TaskGraph()
+    graph.add_task("flaky", flaky, retries=2)
+
+    assert graph.run() == {"flaky": "done"}
+    assert len(attempts) == 3
+
+
+def test_invalid_graphs_are_rejected():
+    graph = TaskGraph()
+    graph.add_task("a", lambda: None, depends_on=["missing"])
+    with pytest.raises(ValueError):
+        graph.run()
+
+    graph = TaskGraph()
+    graph.add_task("a", lambda: None, depends_on=["b"])
+    graph.add_task("b", lambda: None, depends_on=["a"])
+    with pytest.raises(ValueError):
+        graph.run()
@@ -1,7 +1,7 @@
 # data_validation.py
 
 from pydantic import BaseModel, ValidationError, EmailStr, HttpUrl, condecimal
-from typing import Any, Dict, List, Type
+from typing import Any, Dict, List, Tuple, Type
 from collections.abc import Iterable
 import pandas as pd
 
@@ -83,4 +83,41 @@ def validate_api_response_to_dataframe(data: dict) -> pd.DataFrame:
     # Use pandas.json_normalize to retain the nested structure
     df = pd.DataFrame(nested_data)
     
-    return df
\ No newline at end of file
+    return df
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    """Summarise a pydantic ValidationError as "field: message" pairs."""
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc'])) or 'record'}: {detail['msg']}" for detail in error.errors()
+    )
+
+
+def partition_api_response(data: dict, model: Type[BaseModel] = ApiResponseItem) -> Tuple[List[dict], List[dict]]:
+    """
+    Validate each record of an API response individually instead of the page as a whole.
+
+    Args:
+        data (dict): The JSON data returned by the API.
+        model (Type[BaseModel]): The pydantic model every record is validated against.
+
+    Returns:
+        Tuple[List[dict], List[dict]]: The valid records, unchanged, and the rejected records as
+        dictionaries with the original "record", its "index" in the page and the rejection "reason".
+
+    Raises:
+        ValueError: If the response does not contain a list of records.
+    """
+    records = data.get('data') if isinstance(data, dict) else None
+    if not isinstance(records, list):
+        raise ValueError("Data validation failed: the response has no 'data' list.")
+
+    valid, rejected = [], []
+    for index, record in enumerate(records):
+        try:
+            model.model_validate(record)
+            valid.append(record)
+        except ValidationError as e:
+            rejected.append({"record": record, "index": index, "reason": describe_validation_error(e)})
+
+    return valid, rejected